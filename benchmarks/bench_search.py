@@ -0,0 +1,81 @@
+"""
+Module: bench_search.py
+Purpose: Measure /api/search query latency on a large article table
+
+Usage:
+    python benchmarks/bench_search.py [--articles 1000000] [--repeat 20]
+
+A fresh database is filled with synthetic articles (the FTS triggers index
+them as they are inserted), then a mix of rare and common words is timed
+through search_articles (query_words drops `*`, so there are no prefix
+queries). Seeding a million articles takes a few
+minutes; the database is kept in a temporary directory and removed after.
+"""
+import argparse
+import logging
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+# Add project root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db.connection import connect, close_connections
+from db.database import initialize_database
+from ranking.search import search_articles
+
+WORDS = ("election market storm court energy health football climate budget strike vaccine trade "
+         "minister summit flood inflation bank satellite museum festival border merger protest").split()
+
+QUERIES = ("election", "market storm", "satellite museum festival", "inflation", "rareword0007", "minister budget",
+           "rareword0007 election")
+
+def seed(db_name, count, batch=50000):
+    """Insert `count` articles published over the last year, oldest first."""
+    rng = random.Random(1)
+    now = int(time.time())
+    conn = connect(db_name)
+    for start in range(0, count, batch):
+        rows = []
+        for i in range(start, min(start + batch, count)):
+            words = rng.sample(WORDS, 6)
+            rows.append((f"Story {i}: {' '.join(words[:3])}", " ".join(rng.choices(WORDS, k=40)),
+                         f"https://seed{i % 50}/rss", f"http://seed/{i}",
+                         now - (count - i) * 31536000 // count, ", ".join(words[3:]),
+                         f"rareword{i % 10000:04d}"))
+        with conn:
+            conn.executemany('''
+                INSERT INTO parsed_articles (title, description, source, link, published_ts, keywords, derived_summary)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', rows)
+        print(f"  seeded {start + len(rows)}", end="\r", flush=True)
+    print()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--articles", type=int, default=1000000, help="Articles seeded before measuring")
+    parser.add_argument("--repeat", type=int, default=20, help="Runs per query")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_name = os.path.join(tmp, "bench.db")
+        initialize_database(db_name)
+        seed(db_name, args.articles)
+
+        print(f"{args.articles} articles, {args.repeat} runs per query")
+        for query in QUERIES:
+            timings = []
+            for page in range(1, args.repeat + 1):
+                start = time.perf_counter()
+                result = search_articles(query, page=page % 3 + 1, db_name=db_name)
+                timings.append((time.perf_counter() - start) * 1000)
+            print(f"{query!r:<30} median {statistics.median(timings):7.2f} ms   "
+                  f"max {max(timings):7.2f} ms   ({len(result['results'])} results on last page)")
+        close_connections()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Module: bench_stream_parser.py
+Purpose: Compare the streaming feed parser against feedparser for entry-limited ingestion
+
+Usage:
+    python benchmarks/bench_stream_parser.py [feed.xml] [--limit 2] [--runs 5]
+
+Without a file, a synthetic PRNewswire-sized feed is generated.
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+# Add project root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import feedparser
+from ingestion.stream_parser import parse_feed_document
+
+def build_synthetic_feed(items=1000, paragraph_repeats=20):
+    """Build an RSS document with large HTML descriptions, like press-release feeds."""
+    paragraph = "<p>Lorem ipsum dolor sit amet, consectetur adipiscing elit &amp; more.</p>" * paragraph_repeats
+    parts = ['<?xml version="1.0" encoding="UTF-8"?>',
+             '<rss version="2.0"><channel><title>Synthetic</title><link>http://example.com</link>']
+    for i in range(items):
+        parts.append(
+            f"<item><title>Press release {i}</title>"
+            f"<link>http://example.com/news/{i}</link>"
+            f"<description><![CDATA[{paragraph}]]></description>"
+            f"<pubDate>Mon, 16 Dec 2024 10:{i % 60:02d}:00 GMT</pubDate></item>"
+        )
+    parts.append("</channel></rss>")
+    return "".join(parts).encode("utf-8")
+
+def measure(label, func, runs):
+    """Time a parse function and record its peak traced memory."""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    best = min(timings)
+    print(f"{label:<28} best {best * 1000:9.2f} ms   peak {peak / 1024:10.1f} KiB")
+    return best, peak
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("feed", nargs="?", help="Path to a saved feed document")
+    parser.add_argument("--limit", type=int, default=2, help="Entries needed per feed")
+    parser.add_argument("--runs", type=int, default=5, help="Timed runs per parser")
+    args = parser.parse_args()
+
+    if args.feed:
+        with open(args.feed, "rb") as f:
+            body = f.read()
+    else:
+        body = build_synthetic_feed()
+
+    print(f"Document: {len(body) / 1024:.1f} KiB, limit={args.limit}, runs={args.runs}")
+    full_time, full_peak = measure("feedparser (full parse)", lambda: feedparser.parse(body).entries[:args.limit], args.runs)
+    stream_time, stream_peak = measure("stream parser (limited)", lambda: parse_feed_document(body, args.limit, mode="stream"), args.runs)
+    print(f"Speedup: {full_time / stream_time:.1f}x time, {full_peak / max(stream_peak, 1):.1f}x peak memory")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Module: bench_web_during_refresh.py
+Purpose: Measure requests per second for / while a refresh is writing to the database
+
+Usage:
+    python benchmarks/bench_web_during_refresh.py [--articles 2000] [--seconds 5] [--clients 4]
+
+For each journal mode (WAL, then the old rollback journal) a fresh database
+is seeded with articles, the web app is served on a local port, and client
+threads request / as fast as they can: first with the database idle, then
+while a separate process runs refresh cycles that store new articles, as
+the scheduler or ingest workers would.
+"""
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+# Add project root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.serving import make_server
+from config.settings import Config
+from db.connection import close_connections
+from db.database import initialize_database
+from parsing.parse_data import store_parsed_articles
+from pipeline.rss_manager import refresh_rss_feeds
+
+def seed(db_name, count):
+    """Store `count` articles published over the last few days."""
+    now = int(time.time())
+    articles = [
+        {"title": f"Seed story {i}", "description": "Body " * 40, "source": f"https://seed{i % 10}/rss",
+         "link": f"http://seed/{i}", "published_ts": now - i * 60, "keywords": "news",
+         "importance": "medium", "derived_summary": f"Summary {i}"}
+        for i in range(count)
+    ]
+    asyncio.run(store_parsed_articles(articles, db_name=db_name))
+
+def make_fetcher(feeds, entries_per_feed):
+    """Fetcher that hands every feed a fresh set of entries each cycle."""
+    cycle = {"n": 0}
+    published = time.strftime("%a, %d %b %Y %H:%M:%S +0000", time.gmtime())
+
+    async def fetcher(rss_sources, db_name=None, stats=None, entry_limit=None, on_feed=None):
+        cycle["n"] += 1
+        for url in rss_sources:
+            entries = [{"title": f"Cycle {cycle['n']} story {i} from {url}", "link": f"{url}/{cycle['n']}/{i}",
+                        "description": "Fresh body " * 40, "pubDate": published}
+                       for i in range(entries_per_feed)]
+            await on_feed(url, entries)
+
+    return fetcher, [f"https://bench{i}/rss" for i in range(feeds)]
+
+def run_refreshes(db_name, journal_mode, stop, cycles):
+    """Writer process: refresh until told to stop."""
+    logging.disable(logging.INFO)
+    Config.SQLITE_JOURNAL_MODE = journal_mode
+    fetcher, urls = make_fetcher(feeds=20, entries_per_feed=50)
+
+    async def loop():
+        while not stop.is_set():
+            await refresh_rss_feeds(None, rss_sources=urls, fetcher=fetcher, db_name=db_name,
+                                    entry_limit=None, trigger="bench")
+            cycles.value += 1
+
+    asyncio.run(loop())
+
+def load(url, seconds, clients):
+    """Request `url` from several threads; returns (requests per second, errors)."""
+    counts, errors = [0] * clients, [0] * clients
+    deadline = time.perf_counter() + seconds
+
+    def client(index):
+        while time.perf_counter() < deadline:
+            try:
+                with urllib.request.urlopen(url, timeout=30) as response:
+                    response.read()
+                counts[index] += 1
+            except (urllib.error.URLError, OSError):
+                errors[index] += 1
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(counts) / seconds, sum(errors)
+
+def bench_mode(journal_mode, args):
+    Config.SQLITE_JOURNAL_MODE = journal_mode
+    with tempfile.TemporaryDirectory() as tmp:
+        db_name = os.path.join(tmp, "bench.db")
+        initialize_database(db_name)
+        seed(db_name, args.articles)
+        close_connections()
+
+        from frontend.app import create_app
+        server = make_server("127.0.0.1", 0, create_app(db_name), threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_port}/"
+
+        idle_rps, _ = load(url, args.seconds, args.clients)
+
+        stop, cycles = multiprocessing.Event(), multiprocessing.Value("i", 0)
+        writer = multiprocessing.Process(target=run_refreshes, args=(db_name, journal_mode, stop, cycles))
+        writer.start()
+        busy_rps, errors = load(url, args.seconds, args.clients)
+        stop.set()
+        writer.join()
+        server.shutdown()
+
+        print(f"{journal_mode:<8} idle {idle_rps:8.1f} req/s   during refresh {busy_rps:8.1f} req/s   "
+              f"({cycles.value} refreshes, {errors} failed requests)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--articles", type=int, default=2000, help="Articles seeded before measuring")
+    parser.add_argument("--seconds", type=float, default=5, help="Measurement time per phase")
+    parser.add_argument("--clients", type=int, default=4, help="Concurrent client threads")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    print(f"{args.articles} articles, {args.clients} clients, {args.seconds}s per phase")
+    for journal_mode in ("WAL", "DELETE"):
+        bench_mode(journal_mode, args)
+
+if __name__ == "__main__":
+    main()
@@ -13,4 +13,42 @@ class Config:
     RSS_FEED_URL = config('RSS_FEED_URL', default='https://rss.nytimes.com/services/xml/rss/nyt/HomePage.xml')  # Example RSS feed URL
     DB_NAME = os.getenv("DB_NAME", "news_ingestion.db")  # Default if not set
     ADMIN_USERNAME = os.getenv("ADMIN_USERNAME", "admin")
-    ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD", "password")
\ No newline at end of file
+    ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD", "password")
+
+    # RSS fetcher tuning
+    FETCH_CONNECT_TIMEOUT = float(os.getenv("FETCH_CONNECT_TIMEOUT", "10"))  # Seconds to establish a connection
+    FETCH_READ_TIMEOUT = float(os.getenv("FETCH_READ_TIMEOUT", "30"))  # Seconds between reads of the body
+    FETCH_MAX_CONNECTIONS = int(os.getenv("FETCH_MAX_CONNECTIONS", "100"))  # Concurrent connections across all hosts
+    FETCH_MAX_PER_HOST = int(os.getenv("FETCH_MAX_PER_HOST", "4"))  # Concurrent connections to a single host
+    FETCH_KEEPALIVE_SECONDS = float(os.getenv("FETCH_KEEPALIVE_SECONDS", "60"))  # Idle time before pooled connections close
+    FETCH_RETRY_ATTEMPTS = int(os.getenv("FETCH_RETRY_ATTEMPTS", "3"))  # Attempts per feed before giving up
+    FEED_PARSER_MODE = os.getenv("FEED_PARSER_MODE", "stream")  # 'stream' stops after the entries we need, 'feedparser' parses everything
+    PARSE_EXECUTOR = os.getenv("PARSE_EXECUTOR", "thread")  # 'inline', 'thread' or 'process'
+    PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", str(os.cpu_count() or 2)))  # Workers in the parse pool
+    PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "16"))  # Items buffered between refresh stages
+    STORE_BATCH_SIZE = int(os.getenv("STORE_BATCH_SIZE", "100"))  # Articles per storage commit
+    STORE_FLUSH_SECONDS = float(os.getenv("STORE_FLUSH_SECONDS", "0.5"))  # Commit a partial batch after this idle time
+    BACKFILL_COMMIT_SIZE = int(os.getenv("BACKFILL_COMMIT_SIZE", "1000"))  # Articles per backfill transaction and checkpoint
+    INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "20"))  # Sources an ingest worker claims at once
+    SOURCE_LEASE_SECONDS = int(os.getenv("SOURCE_LEASE_SECONDS", "300"))  # Time an ingest worker holds claimed sources
+    SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")  # 'WAL' lets readers and the writer run together; 'DELETE' for network filesystems
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "30000"))  # Wait for the write lock before failing
+    SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")  # 'NORMAL' is durable per checkpoint in WAL mode; 'FULL' per commit
+    SQLITE_CACHE_KB = int(os.getenv("SQLITE_CACHE_KB", "16384"))  # Page cache per connection
+    SQLITE_MMAP_MB = int(os.getenv("SQLITE_MMAP_MB", "256"))  # Memory-mapped I/O per connection (0 disables)
+    ARCHIVE_DIR = os.getenv("ARCHIVE_DIR")  # Monthly article archives (default: archive/ next to the database)
+    RETENTION_BATCH_SIZE = int(os.getenv("RETENTION_BATCH_SIZE", "1000"))  # Articles archived per transaction
+    RETENTION_INTERVAL_HOURS = float(os.getenv("RETENTION_INTERVAL_HOURS", "24"))  # How often the scheduler archives and compacts
+    VACUUM_STEP_PAGES = int(os.getenv("VACUUM_STEP_PAGES", "256"))  # Pages freed per incremental vacuum step
+    RAW_ARCHIVE_ENABLED = os.getenv("RAW_ARCHIVE_ENABLED", "true").lower() == "true"  # Keep compressed copies of fetched feeds
+
+    # LLM enrichment tuning
+    ANTHROPIC_BASE_URL = os.getenv("ANTHROPIC_BASE_URL")  # Override the API endpoint (e.g. a local stub)
+    LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))  # Enrichment requests in flight at once
+    LLM_REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "50"))  # Provider request limit
+    LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "50000"))  # Provider token limit (estimated)
+    LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))  # Retries on 429, 5xx and connection errors
+    LLM_BATCH_SIZE = int(os.getenv("LLM_BATCH_SIZE", "10"))  # Articles packed into one enrichment request (1 disables)
+    ENRICHMENT_LEASE_SECONDS = int(os.getenv("ENRICHMENT_LEASE_SECONDS", "300"))  # Time a worker holds a queued job
+    ENRICHMENT_MAX_ATTEMPTS = int(os.getenv("ENRICHMENT_MAX_ATTEMPTS", "5"))  # Attempts before a job is dead-lettered
+    LLM_BATCH_ATTEMPTS = int(os.getenv("LLM_BATCH_ATTEMPTS", "2"))  # Batch requests before falling back to single calls
@@ -10,7 +10,7 @@ def clear_database(db_name="news_ingestion.db"):
     cursor = conn.cursor()
 
     # List of tables to clear
-    tables = ["parsed_articles", "raw_feed"]
+    tables = ["parsed_articles", "raw_feed", "raw_feed_blob"]
 
     for table in tables:
         try:
@@ -0,0 +1,109 @@
+"""
+Module: connection.py
+Purpose: Shared SQLite connections with WAL mode and tuned pragmas
+
+Every module gets its connections from connect() instead of calling
+sqlite3.connect itself. Connections are cached per thread and per database,
+so repeated helpers in the same thread reuse one connection and its page
+cache instead of reopening the file, and each is set up once with:
+
+    journal_mode = WAL      readers never block the writer, nor it them
+                            (SQLITE_JOURNAL_MODE; DELETE on network filesystems)
+    synchronous  = NORMAL   durable at each checkpoint; safe with WAL
+    busy_timeout            wait for the write lock instead of failing
+    cache_size, mmap_size   keep hot pages in memory
+    temp_store   = MEMORY
+
+Readers such as the web tier ask for readonly=True and get a separate
+query_only connection, so a page render can never take the write lock and
+always reads the last committed snapshot while ingestion is writing.
+
+Use the connection as a context manager (`with connect(db) as conn:`) to
+commit or roll back, and never close it; close_connections() does that.
+Files that are only opened now and then, such as the monthly article
+archives, use open_connection() instead and close it when done, so their
+handles are not kept for the life of the thread.
+Asyncio tasks on one thread share its connection, so do not hold a
+transaction open across an await.
+"""
+import logging
+import os
+import sqlite3
+import threading
+from config.settings import Config
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+def _configure(conn, readonly):
+    conn.execute(f"PRAGMA busy_timeout = {Config.SQLITE_BUSY_TIMEOUT_MS}")
+    if not readonly:
+        # Lets retention hand freed pages back in steps; only a new, empty
+        # database takes it (see db/retention.py for existing ones)
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        mode = conn.execute(f"PRAGMA journal_mode = {Config.SQLITE_JOURNAL_MODE}").fetchone()[0]
+        if mode.lower() != Config.SQLITE_JOURNAL_MODE.lower():
+            logger.warning(f"Could not set journal mode {Config.SQLITE_JOURNAL_MODE}; it is {mode}")
+    conn.execute(f"PRAGMA synchronous = {Config.SQLITE_SYNCHRONOUS}")
+    conn.execute(f"PRAGMA cache_size = {-Config.SQLITE_CACHE_KB}")
+    conn.execute(f"PRAGMA mmap_size = {Config.SQLITE_MMAP_MB * 1024 * 1024}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    if readonly:
+        conn.execute("PRAGMA query_only = ON")
+
+def open_connection(db_name, readonly=False):
+    """
+    A new, uncached connection configured like connect()'s.
+
+    Args:
+        db_name: Path to the database file
+        readonly: Make the connection query_only
+
+    Returns:
+        sqlite3.Connection: Configured connection; the caller closes it
+    """
+    conn = sqlite3.connect(db_name, timeout=Config.SQLITE_BUSY_TIMEOUT_MS / 1000)
+    try:
+        _configure(conn, readonly)
+    except Exception:
+        conn.close()
+        raise
+    return conn
+
+def connect(db_name="news_ingestion.db", readonly=False):
+    """
+    This thread's shared connection to a database.
+
+    Args:
+        db_name: Path to the database file
+        readonly: Return the query_only reader connection instead of the writer
+
+    Returns:
+        sqlite3.Connection: Configured connection; do not close it
+    """
+    connections = getattr(_local, "connections", None)
+    # A forked worker process must not reuse its parent's connections
+    if connections is None or _local.pid != os.getpid():
+        connections = _local.connections = {}
+        _local.pid = os.getpid()
+
+    key = (os.path.abspath(db_name), readonly)
+    conn = connections.get(key)
+    if conn is None:
+        conn = connections[key] = open_connection(db_name, readonly)
+    return conn
+
+def close_connections(db_name=None):
+    """
+    Close this thread's shared connections.
+
+    Args:
+        db_name: Only close connections to this database (None for all)
+    """
+    connections = getattr(_local, "connections", None)
+    if not connections or _local.pid != os.getpid():
+        return
+    path = os.path.abspath(db_name) if db_name else None
+    for key in [key for key in connections if path is None or key[0] == path]:
+        connections.pop(key).close()
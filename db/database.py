@@ -1,7 +1,10 @@
-import sqlite3
 import logging
 import os
+from datetime import datetime, timezone
+from dateutil.parser import parse as dateutil_parse
 from db.populate_rss_sources import populate_rss_sources
+from db.connection import connect
+from db.migrations import migrate
 
 logger = logging.getLogger(__name__)
 
@@ -11,7 +14,7 @@ def check_database_exists(db_name="news_ingestion.db"):
         return False
     
     try:
-        with sqlite3.connect(db_name) as conn:
+        with connect(db_name) as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 SELECT count(name) FROM sqlite_master 
@@ -32,11 +35,42 @@ def setup_database(db_name="news_ingestion.db"):
         logger.info("Populating RSS sources...")
         populate_rss_sources(db_name)
         return True
+
+    # Bring an existing database up to the current schema
+    initialize_database(db_name)
     return False
 
+def _add_missing_columns(cursor, table, columns):
+    """
+    Add columns that are missing from an existing table.
+
+    Args:
+        cursor: Open database cursor
+        table: Table name
+        columns: List of (column_name, column_definition) tuples
+    """
+    cursor.execute(f"PRAGMA table_info({table})")
+    existing = {row[1] for row in cursor.fetchall()}
+    for name, definition in columns:
+        if name not in existing:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+            logger.info(f"Added column {table}.{name}")
+
 def initialize_database(db_name="news_ingestion.db"):
-    # Connect to SQLite database
-    connection = sqlite3.connect(db_name)
+    """Create the baseline schema and defaults, then apply pending migrations."""
+    connection = connect(db_name)
+    try:
+        _create_baseline_schema(connection)
+    except Exception:
+        # The connection is shared; do not leave a half-done transaction on it
+        connection.rollback()
+        raise
+
+    # Schema changes made after versioning was introduced are migrations
+    migrate(db_name)
+    logger.info(f"Database '{db_name}' initialized successfully!")
+
+def _create_baseline_schema(connection):
     cursor = connection.cursor()
 
     # Add config table
@@ -54,16 +88,32 @@ def initialize_database(db_name="news_ingestion.db"):
     # Insert default configurations if they don't exist
     default_configs = [
         ('log_level', 'INFO', 'Logging level', 'select', '["DEBUG", "INFO", "WARNING", "ERROR"]'),
-        ('llm_provider', 'anthropic', 'LLM Provider', 'select', '["anthropic", "openai"]'),
+        ('llm_provider', 'anthropic', 'LLM Provider', 'select', '["anthropic", "openai", "local"]'),
         ('summary_max_words', '100', 'Maximum words in article summary', 'number', None),
-        ('article_fetch_limit', '2', 'Number of articles to fetch per source', 'number', None),
+        ('article_fetch_limit', '2', 'Number of articles to fetch per source (0 = all)', 'number', None),
+        ('backfill_entry_window', '0', 'Entries taken per source in a backfill (0 = all)', 'number', None),
+        ('backfill_max_age_days', '0', 'Oldest entries taken in a backfill, in days (0 = no limit)', 'number', None),
         ('fetch_interval_minutes', '30', 'RSS fetch interval in minutes', 'number', None),
+        ('article_retention_days', '90', 'Days articles stay in the live database before moving to monthly archives (0 = keep)', 'number', None),
+        ('search_recency_half_life_days', '7', 'Age at which a search match counts half as much (0 = relevance only)', 'number', None),
+        ('raw_archive_retention_days', '30', 'Days to keep archived raw feed documents', 'number', None),
+        ('raw_archive_max_per_feed', '200', 'Archived fetches kept per feed', 'number', None),
+        ('enrichment_cache_max_entries', '50000', 'Cached enrichment results kept', 'number', None),
+        ('llm_budget_calls_per_hour', '0', 'LLM requests allowed per hour (0 = unlimited)', 'number', None),
+        ('llm_budget_tokens_per_hour', '0', 'LLM tokens allowed per hour (0 = unlimited)', 'number', None),
+        ('llm_budget_calls_per_run', '0', 'LLM requests allowed per refresh (0 = unlimited)', 'number', None),
+        ('llm_budget_tokens_per_run', '0', 'LLM tokens allowed per refresh (0 = unlimited)', 'number', None),
+        ('llm_budget_overflow', 'local', 'Articles over the LLM budget', 'select', '["local", "defer"]'),
     ]
 
     cursor.executemany('''
         INSERT OR IGNORE INTO app_config (key, value, description, type, options)
         VALUES (?, ?, ?, ?, ?)
     ''', default_configs)
+    # Keep select options current on existing databases
+    cursor.executemany('''
+        UPDATE app_config SET options = ? WHERE key = ? AND options IS NOT ?
+    ''', [(options, key, options) for key, _, _, config_type, options in default_configs if config_type == 'select'])
 
     # Create rss_sources table with feed_type
     cursor.execute('''
@@ -74,17 +124,55 @@ def initialize_database(db_name="news_ingestion.db"):
             category TEXT,
             feed_type TEXT DEFAULT 'RSS',
             last_fetched TIMESTAMP,
-            status TEXT DEFAULT 'active'
+            status TEXT DEFAULT 'active',
+            etag TEXT,
+            last_modified TEXT,
+            content_hash TEXT,
+            poll_interval_minutes REAL,
+            publish_interval_minutes REAL,
+            next_fetch_at TIMESTAMP,
+            priority INTEGER DEFAULT 0,  -- Higher gets LLM enrichment sooner
+            lease_owner TEXT,            -- Ingest worker currently fetching this source
+            lease_expires_at INTEGER     -- Epoch seconds; expired leases can be reclaimed
         )
     ''')
+
+    # Older databases predate the conditional GET and polling columns
+    _add_missing_columns(cursor, 'rss_sources', [
+        ('etag', 'TEXT'),
+        ('last_modified', 'TEXT'),
+        ('content_hash', 'TEXT'),
+        ('poll_interval_minutes', 'REAL'),
+        ('publish_interval_minutes', 'REAL'),
+        ('next_fetch_at', 'TIMESTAMP'),
+        ('priority', 'INTEGER DEFAULT 0'),
+        ('lease_owner', 'TEXT'),
+        ('lease_expires_at', 'INTEGER'),
+    ])
     
-    # Create raw_feed table
+    # Create raw_feed table: one row per fetch event. fetched_data holds the
+    # body for legacy rows only; archived bodies live in raw_feed_blob.
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS raw_feed (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             feed_url TEXT NOT NULL,
             fetched_data TEXT NOT NULL,
-            fetched_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            fetched_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            content_hash TEXT
+        )
+    ''')
+    _add_missing_columns(cursor, 'raw_feed', [('content_hash', 'TEXT')])
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_raw_feed_url_time ON raw_feed(feed_url, fetched_at)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_raw_feed_hash ON raw_feed(content_hash)')
+
+    # Create raw_feed_blob table: compressed bodies stored once per content hash
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS raw_feed_blob (
+            content_hash TEXT PRIMARY KEY,
+            data BLOB NOT NULL,
+            raw_size INTEGER NOT NULL,
+            stored_size INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
     ''')
 
@@ -101,26 +189,226 @@ def initialize_database(db_name="news_ingestion.db"):
             derived_summary TEXT,
             keywords TEXT,
             importance TEXT,
+            published_ts INTEGER,  -- Publish time as UTC epoch seconds
+            simhash INTEGER,       -- SimHash of title and description (signed 64-bit)
+            canonical_id INTEGER,  -- Set on near-duplicates to the story they repeat
+            enrichment_status TEXT DEFAULT 'done',  -- 'pending', 'done' or 'failed'
             UNIQUE(title, source)
         )
     ''')
+    _add_missing_columns(cursor, 'parsed_articles', [
+        ('published_ts', 'INTEGER'),
+        ('simhash', 'INTEGER'),
+        ('canonical_id', 'INTEGER'),
+        ('enrichment_status', "TEXT DEFAULT 'done'"),
+    ])
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_parsed_articles_published_ts ON parsed_articles(published_ts)')
+    _backfill_published_ts(cursor)
+
+    # Create enrichment_cache table: results keyed by content and prompt version
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS enrichment_cache (
+            cache_key TEXT PRIMARY KEY,
+            provider TEXT NOT NULL,
+            namespace TEXT NOT NULL,
+            keywords TEXT,
+            importance TEXT,
+            derived_summary TEXT,
+            hits INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_used_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_enrichment_cache_last_used ON enrichment_cache(last_used_at)')
+
+    # Create article_fingerprints table: SimHash bands for near-duplicate lookup
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS article_fingerprints (
+            band INTEGER NOT NULL,
+            band_value INTEGER NOT NULL,
+            article_id INTEGER NOT NULL,
+            simhash INTEGER NOT NULL,
+            PRIMARY KEY (band, band_value, article_id)
+        ) WITHOUT ROWID
+    ''')
+
+    # Create enrichment_jobs table: queue of articles waiting for enrichment
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS enrichment_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            article_id INTEGER NOT NULL UNIQUE,
+            priority INTEGER NOT NULL DEFAULT 0,      -- Higher is leased first
+            status TEXT NOT NULL DEFAULT 'queued',    -- 'queued', 'leased' or 'dead'
+            attempts INTEGER NOT NULL DEFAULT 0,
+            available_at INTEGER NOT NULL DEFAULT 0,  -- UTC epoch before which a retry waits
+            lease_owner TEXT,
+            lease_expires_at INTEGER,
+            last_error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_enrichment_jobs_ready ON enrichment_jobs(status, priority DESC, id)')
+
+    # Create llm_spend table: LLM requests and tokens per enrichment batch
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS llm_spend (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            provider TEXT NOT NULL,
+            requests INTEGER NOT NULL,
+            input_tokens INTEGER NOT NULL,
+            output_tokens INTEGER NOT NULL,
+            spent_at INTEGER NOT NULL  -- UTC epoch seconds
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_llm_spend_spent_at ON llm_spend(spent_at)')
+
+    # Create pipeline_runs table: one row per refresh with stage timings and counters
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS pipeline_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            trigger TEXT,
+            started_at REAL NOT NULL,   -- UTC epoch seconds
+            finished_at REAL,
+            duration_seconds REAL,
+            status TEXT NOT NULL,       -- 'running', 'ok' or 'error'
+            error TEXT,
+            fetch_seconds REAL DEFAULT 0,   -- Busy time per stage; stages overlap
+            parse_seconds REAL DEFAULT 0,
+            dedup_seconds REAL DEFAULT 0,
+            enrich_seconds REAL DEFAULT 0,
+            store_seconds REAL DEFAULT 0,
+            sources INTEGER DEFAULT 0,
+            feeds_fetched INTEGER DEFAULT 0,
+            feeds_not_modified INTEGER DEFAULT 0,
+            feeds_unchanged INTEGER DEFAULT 0,
+            feeds_failed INTEGER DEFAULT 0,
+            entries INTEGER DEFAULT 0,
+            articles_parsed INTEGER DEFAULT 0,
+            duplicates INTEGER DEFAULT 0,
+            articles_stored INTEGER DEFAULT 0,
+            articles_enriched INTEGER DEFAULT 0,
+            articles_enriched_locally INTEGER DEFAULT 0,
+            enrich_errors INTEGER DEFAULT 0,
+            llm_requests INTEGER DEFAULT 0,
+            llm_input_tokens INTEGER DEFAULT 0,
+            llm_output_tokens INTEGER DEFAULT 0
+        )
+    ''')
+
+    # Create pipeline_run_feeds table: per-feed fetch outcome within a run
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS pipeline_run_feeds (
+            run_id INTEGER NOT NULL,
+            feed_url TEXT NOT NULL,
+            http_status INTEGER,
+            latency_ms REAL,
+            bytes INTEGER,
+            entries INTEGER,
+            error TEXT
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_pipeline_run_feeds_run ON pipeline_run_feeds(run_id)')
+
+    # Create backfill_progress table: how far each source's backfill got
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS backfill_progress (
+            feed_url TEXT PRIMARY KEY,
+            status TEXT NOT NULL,              -- 'running' or 'done'
+            entries_total INTEGER DEFAULT 0,   -- Entries in the backfill window
+            entries_done INTEGER DEFAULT 0,    -- Entries committed so far
+            articles_stored INTEGER DEFAULT 0,
+            started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
 
-    # Commit and close
     connection.commit()
-    connection.close()
-    logger.info(f"Database '{db_name}' initialized successfully!")
+
+def _legacy_date_to_epoch(published_date):
+    """
+    Convert a stored published_date string to UTC epoch seconds.
+
+    Older rows hold display strings like "16 Dec 2024 10:00" with the zone
+    dropped; those are treated as UTC.
+    """
+    try:
+        parsed = datetime.strptime(published_date, "%d %b %Y %H:%M")
+    except ValueError:
+        try:
+            parsed = dateutil_parse(published_date)
+        except (ValueError, OverflowError):
+            return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp())
+
+def _backfill_published_ts(cursor):
+    """Fill published_ts for rows stored before the column existed."""
+    cursor.execute('''
+        SELECT id, published_date FROM parsed_articles
+        WHERE published_ts IS NULL AND published_date IS NOT NULL AND published_date != 'Unknown Date'
+    ''')
+    updates = [
+        (timestamp, article_id)
+        for article_id, published_date in cursor.fetchall()
+        if (timestamp := _legacy_date_to_epoch(str(published_date))) is not None
+    ]
+    if updates:
+        cursor.executemany('UPDATE parsed_articles SET published_ts = ? WHERE id = ?', updates)
+        logger.info(f"Backfilled published_ts for {len(updates)} articles")
 
 def get_rss_sources(db_name="news_ingestion.db"):
-    with sqlite3.connect(db_name) as connection:
+    with connect(db_name) as connection:
         cursor = connection.cursor()
         cursor.execute("SELECT feed_url FROM rss_sources WHERE status = 'active'")
         sources = cursor.fetchall()
         return [source[0] for source in sources]
 
+def get_feed_fetch_states(db_name="news_ingestion.db"):
+    """
+    Get the conditional GET state for every feed.
+
+    Returns:
+        dict: feed_url -> {'etag', 'last_modified', 'content_hash'}
+    """
+    try:
+        with connect(db_name) as connection:
+            cursor = connection.cursor()
+            cursor.execute("SELECT feed_url, etag, last_modified, content_hash FROM rss_sources")
+            return {
+                row[0]: {'etag': row[1], 'last_modified': row[2], 'content_hash': row[3]}
+                for row in cursor.fetchall()
+            }
+    except Exception as e:
+        logger.error(f"Error fetching feed fetch states: {e}")
+        return {}
+
+def update_feed_fetch_state(feed_url, etag=None, last_modified=None, content_hash=None, db_name="news_ingestion.db"):
+    """
+    Record the validators and body hash from the latest fetch of a feed.
+
+    Values left as None keep whatever is already stored.
+    """
+    try:
+        with connect(db_name) as connection:
+            cursor = connection.cursor()
+            cursor.execute('''
+                UPDATE rss_sources
+                SET etag = COALESCE(?, etag),
+                    last_modified = COALESCE(?, last_modified),
+                    content_hash = COALESCE(?, content_hash),
+                    last_fetched = CURRENT_TIMESTAMP
+                WHERE feed_url = ?
+            ''', (etag, last_modified, content_hash, feed_url))
+            connection.commit()
+    except Exception as e:
+        logger.error(f"Error updating fetch state for {feed_url}: {e}")
+
 def get_config_value(key: str, db_name="news_ingestion.db"):
     """Fetch a configuration value from the app_config table."""
     try:
-        with sqlite3.connect(db_name) as conn:
+        with connect(db_name) as conn:
             cursor = conn.cursor()
             cursor.execute('SELECT value FROM app_config WHERE key = ?', (key,))
             result = cursor.fetchone()
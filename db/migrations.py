@@ -0,0 +1,179 @@
+"""
+Module: migrations.py
+Purpose: Versioned schema migrations applied in order at startup
+
+initialize_database creates the baseline schema: every table and column
+that existed before versioning was introduced, created idempotently with
+CREATE TABLE IF NOT EXISTS and _add_missing_columns so databases from any
+earlier release are brought level. Schema changes made since then are
+numbered migrations registered here with @migration; they depend on the
+baseline's tables and columns, so new changes are never added to the
+baseline itself. migrate() runs the pending ones in version order and
+records each in schema_migrations.
+
+Migrations run inside one BEGIN IMMEDIATE transaction, so when the web tier
+and several ingestion workers start together only one of them applies the
+migrations; the others wait for the write lock, see the new version and do
+nothing. A failing migration rolls the whole upgrade back. A database that
+is newer than this code (a rolling deploy) is left alone.
+
+To add one, append a function with the next version number:
+
+    @migration(5, "Add parsed_articles.word_count")
+    def _add_word_count(cursor):
+        cursor.execute("ALTER TABLE parsed_articles ADD COLUMN word_count INTEGER")
+"""
+import logging
+from db.connection import connect
+
+logger = logging.getLogger(__name__)
+
+# (version, description, function), in version order
+MIGRATIONS = []
+
+def migration(version, description):
+    """Register a migration function that takes a cursor."""
+    def register(func):
+        if MIGRATIONS and version <= MIGRATIONS[-1][0]:
+            raise ValueError(f"Migration {version} is out of order")
+        MIGRATIONS.append((version, description, func))
+        return func
+    return register
+
+@migration(1, "Indexes for the article read paths")
+def _read_path_indexes(cursor):
+    # Ranking: live stories (canonical_id IS NULL) in a publish-time range;
+    # also serves lookups of a story's near-duplicates by canonical_id
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_parsed_articles_canonical_published
+        ON parsed_articles(canonical_id, published_ts)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_parsed_articles_source_published
+        ON parsed_articles(source, published_ts)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_parsed_articles_importance_published
+        ON parsed_articles(importance, published_ts)
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_parsed_articles_link ON parsed_articles(link)')
+    # Publish-time index from the baseline, for databases that predate it
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_parsed_articles_published_ts ON parsed_articles(published_ts)')
+
+@migration(2, "Count updated articles in pipeline_runs")
+def _pipeline_runs_articles_updated(cursor):
+    cursor.execute('ALTER TABLE pipeline_runs ADD COLUMN articles_updated INTEGER DEFAULT 0')
+
+# Text columns indexed for search, in articles_fts column order
+FTS_COLUMNS = ("title", "description", "derived_summary", "keywords")
+
+@migration(3, "Full-text search index over articles")
+def _articles_fts(cursor):
+    # External-content index: the text lives only in parsed_articles, and the
+    # triggers below keep the index in step with every insert, upsert,
+    # enrichment update and retention delete
+    columns = ", ".join(FTS_COLUMNS)
+    old = ", ".join(f"old.{column}" for column in FTS_COLUMNS)
+    new = ", ".join(f"new.{column}" for column in FTS_COLUMNS)
+    cursor.execute(f'''
+        CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5(
+            {columns}, content='parsed_articles', content_rowid='id',
+            tokenize='porter unicode61'
+        )
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS parsed_articles_fts_insert AFTER INSERT ON parsed_articles BEGIN
+            INSERT INTO articles_fts (rowid, {columns}) VALUES (new.id, {new});
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS parsed_articles_fts_delete AFTER DELETE ON parsed_articles BEGIN
+            INSERT INTO articles_fts (articles_fts, rowid, {columns}) VALUES ('delete', old.id, {old});
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS parsed_articles_fts_update AFTER UPDATE OF {columns} ON parsed_articles BEGIN
+            INSERT INTO articles_fts (articles_fts, rowid, {columns}) VALUES ('delete', old.id, {old});
+            INSERT INTO articles_fts (rowid, {columns}) VALUES (new.id, {new});
+        END
+    ''')
+    # Index the articles already stored
+    cursor.execute("INSERT INTO articles_fts (articles_fts) VALUES ('rebuild')")
+
+@migration(4, "Checkpoint backfills on the last committed entry")
+def _backfill_last_entry_key(cursor):
+    # Entry offsets shift as a feed gains and drops items between runs
+    cursor.execute('ALTER TABLE backfill_progress ADD COLUMN last_entry_key TEXT')
+
+@migration(5, "Index undated live articles by parse time")
+def _undated_parse_time_index(cursor):
+    # Ranking reads undated stories in a branch of their own (published_ts IS
+    # NULL and a parsed_at range); with parsed_at last, both branches are
+    # index range scans. The old two-column index is a prefix of this one
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_parsed_articles_canonical_published_parsed
+        ON parsed_articles(canonical_id, published_ts, parsed_at)
+    ''')
+    cursor.execute('DROP INDEX IF EXISTS idx_parsed_articles_canonical_published')
+
+def _create_version_table(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+def get_schema_version(db_name="news_ingestion.db"):
+    """Latest applied migration version (0 for a baseline or unmigrated database)."""
+    cursor = connect(db_name).cursor()
+    exists = cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_migrations'"
+    ).fetchone()
+    if not exists:
+        return 0
+    return cursor.execute('SELECT COALESCE(MAX(version), 0) FROM schema_migrations').fetchone()[0]
+
+def latest_version():
+    """Version the schema reaches once every known migration is applied."""
+    return MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+def migrate(db_name="news_ingestion.db"):
+    """
+    Apply pending migrations in version order.
+
+    Args:
+        db_name: Path to the database file (its baseline schema must exist)
+
+    Returns:
+        list: Versions applied by this call (empty if already current)
+    """
+    conn = connect(db_name)
+    cursor = conn.cursor()
+    try:
+        cursor.execute('BEGIN IMMEDIATE')
+        _create_version_table(cursor)
+        current = cursor.execute('SELECT COALESCE(MAX(version), 0) FROM schema_migrations').fetchone()[0]
+        if current > latest_version():
+            logger.warning(f"Database schema version {current} is newer than this code ({latest_version()})")
+
+        applied = []
+        for version, description, func in MIGRATIONS:
+            if version <= current:
+                continue
+            logger.info(f"Applying migration {version}: {description}")
+            func(cursor)
+            cursor.execute('INSERT INTO schema_migrations (version, description) VALUES (?, ?)',
+                           (version, description))
+            applied.append(version)
+        cursor.execute('COMMIT')
+    except Exception:
+        if conn.in_transaction:
+            cursor.execute('ROLLBACK')
+        logger.error(f"Schema migration failed for {db_name}; nothing was applied")
+        raise
+
+    if applied:
+        logger.info(f"Database '{db_name}' migrated to schema version {applied[-1]}")
+    return applied
@@ -1,4 +1,5 @@
 import sqlite3
+from db.connection import connect
 
 def populate_rss_sources(db_name="news_ingestion.db"):
     # Define RSS feeds to insert
@@ -9,7 +10,7 @@ def populate_rss_sources(db_name="news_ingestion.db"):
     ]
 
     # Connect to SQLite database
-    connection = sqlite3.connect(db_name)
+    connection = connect(db_name)
     cursor = connection.cursor()
 
     # Insert or update feeds
@@ -30,9 +31,8 @@ def populate_rss_sources(db_name="news_ingestion.db"):
             ''', (source_name, category, feed_type, status, feed_url))
             print(f"Updated existing feed: {feed_url}")
 
-    # Commit changes and close connection
+    # Commit changes
     connection.commit()
-    connection.close()
     print("RSS sources populated successfully!")
 
 if __name__ == "__main__":
@@ -0,0 +1,163 @@
+"""
+Module: raw_archive.py
+Purpose: Content-addressed, compressed archive of fetched raw feed documents
+
+Every fetch is recorded as a row in raw_feed that references its body by
+SHA-256 hash. Bodies are zlib-compressed into raw_feed_blob and stored only
+once, so an unchanged feed polled a hundred times costs one blob.
+prune_raw_archive runs with the retention job (db/retention.py).
+"""
+import hashlib
+import logging
+import zlib
+from db.database import get_config_value
+from db.connection import connect
+
+logger = logging.getLogger(__name__)
+
+COMPRESSION_LEVEL = 9  # Each unique body is compressed once, so favour size
+
+def archive_feed_body(feed_url, body, content_hash=None, db_name="news_ingestion.db"):
+    """
+    Record a fetch of a feed, storing its body if this payload is new.
+
+    Args:
+        feed_url: URL the body was fetched from
+        body: Raw document as bytes
+        content_hash: SHA-256 hex digest of body, if already computed
+        db_name: Path to the database file
+
+    Returns:
+        str: Content hash of the archived body, or None on error
+    """
+    content_hash = content_hash or hashlib.sha256(body).hexdigest()
+    try:
+        with connect(db_name) as connection:
+            cursor = connection.cursor()
+
+            # Only compress payloads we have not seen before
+            cursor.execute('SELECT 1 FROM raw_feed_blob WHERE content_hash = ?', (content_hash,))
+            if cursor.fetchone() is None:
+                data = zlib.compress(body, COMPRESSION_LEVEL)
+                cursor.execute('''
+                    INSERT OR IGNORE INTO raw_feed_blob (content_hash, data, raw_size, stored_size)
+                    VALUES (?, ?, ?, ?)
+                ''', (content_hash, data, len(body), len(data)))
+
+            cursor.execute('''
+                INSERT INTO raw_feed (feed_url, fetched_data, content_hash)
+                VALUES (?, '', ?)
+            ''', (feed_url, content_hash))
+            connection.commit()
+        return content_hash
+    except Exception as e:
+        logger.error(f"Error archiving raw feed for {feed_url}: {e}")
+        return None
+
+def iter_archived_feeds(feed_url=None, since=None, latest_only=False, db_name="news_ingestion.db"):
+    """
+    Stream archived fetches in fetch order, decompressing one body at a time.
+
+    Args:
+        feed_url: Only yield fetches of this feed
+        since: Only yield fetches at or after this 'YYYY-MM-DD HH:MM:SS' UTC timestamp
+        latest_only: Only yield the most recent fetch of each feed
+        db_name: Path to the database file
+
+    Yields:
+        tuple: (feed_url, fetched_at, body bytes)
+    """
+    conditions, params = [], []
+    if feed_url:
+        conditions.append("r.feed_url = ?")
+        params.append(feed_url)
+    if since:
+        conditions.append("r.fetched_at >= ?")
+        params.append(since)
+    if latest_only:
+        conditions.append("r.id IN (SELECT MAX(id) FROM raw_feed GROUP BY feed_url)")
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    connection = connect(db_name, readonly=True)
+    cursor = connection.execute(f'''
+        SELECT r.feed_url, r.fetched_at, r.fetched_data, b.data
+        FROM raw_feed r
+        LEFT JOIN raw_feed_blob b ON b.content_hash = r.content_hash
+        {where}
+        ORDER BY r.id
+    ''', params)
+    for url, fetched_at, fetched_data, data in cursor:
+        if data is not None:
+            yield url, fetched_at, zlib.decompress(data)
+        elif fetched_data:
+            # Legacy row with the body stored inline as text
+            yield url, fetched_at, fetched_data.encode("utf-8")
+
+def prune_raw_archive(max_age_days=None, max_per_feed=None, db_name="news_ingestion.db"):
+    """
+    Apply retention limits to the archive and drop bodies nothing references.
+
+    Args:
+        max_age_days: Delete fetch events older than this (defaults to app_config)
+        max_per_feed: Keep at most this many recent events per feed (defaults to app_config)
+        db_name: Path to the database file
+
+    Returns:
+        dict: Counts of deleted 'events' and 'blobs'
+    """
+    if max_age_days is None:
+        max_age_days = int(get_config_value("raw_archive_retention_days", db_name) or 30)
+    if max_per_feed is None:
+        max_per_feed = int(get_config_value("raw_archive_max_per_feed", db_name) or 200)
+
+    try:
+        with connect(db_name) as connection:
+            cursor = connection.cursor()
+
+            cursor.execute(
+                "DELETE FROM raw_feed WHERE fetched_at < datetime('now', ?)",
+                (f"-{int(max_age_days)} days",)
+            )
+            deleted_events = cursor.rowcount
+
+            cursor.execute('''
+                DELETE FROM raw_feed WHERE id IN (
+                    SELECT id FROM (
+                        SELECT id, ROW_NUMBER() OVER (PARTITION BY feed_url ORDER BY id DESC) AS position
+                        FROM raw_feed
+                    ) WHERE position > ?
+                )
+            ''', (int(max_per_feed),))
+            deleted_events += cursor.rowcount
+
+            cursor.execute('''
+                DELETE FROM raw_feed_blob WHERE NOT EXISTS (
+                    SELECT 1 FROM raw_feed WHERE raw_feed.content_hash = raw_feed_blob.content_hash
+                )
+            ''')
+            deleted_blobs = cursor.rowcount
+            connection.commit()
+
+        if deleted_events or deleted_blobs:
+            logger.info(f"Pruned raw archive: {deleted_events} fetch events, {deleted_blobs} bodies")
+        return {"events": deleted_events, "blobs": deleted_blobs}
+    except Exception as e:
+        logger.error(f"Error pruning raw archive: {e}")
+        return {"events": 0, "blobs": 0}
+
+def get_archive_stats(db_name="news_ingestion.db"):
+    """
+    Summarise archive size.
+
+    Returns:
+        dict: 'events', 'blobs', 'raw_bytes' (uncompressed size of every event)
+            and 'stored_bytes' (compressed size of unique bodies)
+    """
+    with connect(db_name) as connection:
+        cursor = connection.cursor()
+        cursor.execute("SELECT COUNT(*), COALESCE(SUM(b.raw_size), 0) FROM raw_feed r "
+                       "LEFT JOIN raw_feed_blob b ON b.content_hash = r.content_hash")
+        events, raw_bytes = cursor.fetchone()
+        cursor.execute("SELECT COUNT(*), COALESCE(SUM(stored_size), 0) FROM raw_feed_blob")
+        blobs, stored_bytes = cursor.fetchone()
+    return {"events": events, "blobs": blobs, "raw_bytes": raw_bytes, "stored_bytes": stored_bytes}
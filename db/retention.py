@@ -0,0 +1,303 @@
+"""
+Module: retention.py
+Purpose: Keep the live database small by archiving old articles and compacting free space
+
+Articles published more than article_retention_days ago move to monthly
+archive databases (archive/articles_YYYY_MM.db next to the live database,
+or under ARCHIVE_DIR), where get_archived_articles can still query them.
+Each batch is first committed to its archive file and only then deleted
+from the live database, so an interrupted run loses nothing and the next
+run picks up where it stopped (archived ids are inserted with OR IGNORE).
+
+The raw feed archive is pruned to its own retention limits, and freed pages
+are returned to the filesystem with incremental vacuum in small steps, so
+readers and writers are never locked out for long. Databases created before
+incremental vacuum was enabled need one full VACUUM first
+(enable_incremental_vacuum, or --enable-incremental-vacuum).
+
+    python db/retention.py [--db news_ingestion.db] [--days 90]
+"""
+import argparse
+import glob
+import logging
+import os
+import re
+import sys
+import time
+from datetime import datetime, timezone
+
+# Add project root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.settings import Config
+from db.connection import connect, open_connection, close_connections
+from db.database import get_config_value, _add_missing_columns
+from db.raw_archive import prune_raw_archive
+from enrichment.job_queue import enqueue_enrichments, job_priority
+from parsing.near_duplicates import settle_new_duplicates
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_PATTERN = "articles_{month}.db"
+
+def archive_dir_for(db_name):
+    """Directory holding a database's monthly article archives."""
+    return Config.ARCHIVE_DIR or os.path.join(os.path.dirname(os.path.abspath(db_name)), "archive")
+
+def archive_path(month, archive_dir):
+    """Archive file for a 'YYYY_MM' month."""
+    return os.path.join(archive_dir, ARCHIVE_PATTERN.format(month=month))
+
+def _ensure_archive_table(archive, columns):
+    """Create or widen the archive's parsed_articles to hold the live columns."""
+    cursor = archive.cursor()
+    cursor.execute('CREATE TABLE IF NOT EXISTS parsed_articles (id INTEGER PRIMARY KEY)')
+    _add_missing_columns(cursor, 'parsed_articles', columns)
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_archived_published_ts ON parsed_articles(published_ts)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_archived_source ON parsed_articles(source, published_ts)')
+
+def _enqueue_orphans(cursor, article_ids):
+    """Queue enrichment jobs for pending articles whose canonical story was archived."""
+    if not article_ids:
+        return
+    source_priorities = dict(cursor.execute('SELECT feed_url, priority FROM rss_sources WHERE priority != 0'))
+    jobs = []
+    for article_id in article_ids:
+        title, description, source, published_ts = cursor.execute(
+            'SELECT title, description, source, published_ts FROM parsed_articles WHERE id = ?', (article_id,)
+        ).fetchone()
+        article = {"title": title, "description": description, "published_ts": published_ts}
+        jobs.append((article_id, job_priority(article, source_priorities.get(source, 0))))
+    enqueue_enrichments(cursor, jobs)
+    logger.info(f"Queued {len(jobs)} duplicates of archived stories for enrichment")
+
+def archive_old_articles(max_age_days=None, db_name="news_ingestion.db", archive_dir=None, batch_size=None):
+    """
+    Move articles older than the retention period into monthly archive databases.
+
+    Args:
+        max_age_days: Retention period (defaults to article_retention_days; 0 keeps everything)
+        db_name: Path to the live database
+        archive_dir: Where archive files go (defaults to archive_dir_for(db_name))
+        batch_size: Articles moved per transaction (defaults to Config.RETENTION_BATCH_SIZE)
+
+    Returns:
+        dict: Articles archived per 'YYYY_MM' month
+    """
+    if max_age_days is None:
+        max_age_days = int(get_config_value("article_retention_days", db_name) or 0)
+    if not max_age_days:
+        return {}
+    archive_dir = archive_dir or archive_dir_for(db_name)
+    batch_size = batch_size or Config.RETENTION_BATCH_SIZE
+    cutoff = int(time.time()) - int(max_age_days) * 86400
+    cutoff_text = datetime.fromtimestamp(cutoff, tz=timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+    live = connect(db_name)
+    columns = [(row[1], row[2]) for row in live.execute('PRAGMA table_info(parsed_articles)') if row[1] != "id"]
+    names = ["id"] + [name for name, _ in columns]
+    archived = {}
+
+    while True:
+        # Undated articles age out by the time they were parsed
+        rows = live.execute(f'''
+            SELECT {", ".join(names)},
+                   COALESCE(strftime('%Y_%m', published_ts, 'unixepoch'), strftime('%Y_%m', parsed_at), 'undated')
+            FROM parsed_articles
+            WHERE published_ts < ? OR (published_ts IS NULL AND parsed_at < ?)
+            ORDER BY id
+            LIMIT ?
+        ''', (cutoff, cutoff_text, batch_size)).fetchall()
+        if not rows:
+            break
+
+        by_month = {}
+        for row in rows:
+            by_month.setdefault(row[-1], []).append(row[:-1])
+
+        # Commit to the archive first; deleting from the live database comes second
+        os.makedirs(archive_dir, exist_ok=True)
+        for month, month_rows in by_month.items():
+            archive = open_connection(archive_path(month, archive_dir))
+            try:
+                with archive:
+                    _ensure_archive_table(archive, columns)
+                    archive.executemany(
+                        f'INSERT OR IGNORE INTO parsed_articles ({", ".join(names)}) '
+                        f'VALUES ({", ".join("?" * len(names))})',
+                        month_rows
+                    )
+            finally:
+                archive.close()
+            archived[month] = archived.get(month, 0) + len(month_rows)
+
+        ids = [(row[0],) for row in rows]
+        with live:
+            cursor = live.cursor()
+            cursor.executemany('DELETE FROM parsed_articles WHERE id = ?', ids)
+            cursor.executemany('DELETE FROM article_fingerprints WHERE article_id = ?', ids)
+            cursor.executemany('DELETE FROM enrichment_jobs WHERE article_id = ?', ids)
+            # Repeats of an archived story become stories in their own right.
+            # Those still waiting to inherit its enrichment never will, so
+            # they are queued for their own, as when a duplicate is stored
+            # after its canonical was archived
+            repeats = [article_id for (canonical_id,) in ids for (article_id,) in cursor.execute(
+                'SELECT id FROM parsed_articles WHERE canonical_id = ?', (canonical_id,)
+            ).fetchall()]
+            orphaned = settle_new_duplicates(cursor, repeats)
+            cursor.executemany('UPDATE parsed_articles SET canonical_id = NULL WHERE canonical_id = ?', ids)
+            _enqueue_orphans(cursor, orphaned)
+
+    if archived:
+        logger.info(f"Archived {sum(archived.values())} articles older than {max_age_days} days: {archived}")
+    return archived
+
+def _months_between(since_ts, until_ts):
+    """'YYYY_MM' keys of the months a time range touches (None for all)."""
+    if since_ts is None or until_ts is None:
+        return None
+    months, current = [], datetime.fromtimestamp(since_ts, tz=timezone.utc).replace(day=1)
+    end = datetime.fromtimestamp(until_ts, tz=timezone.utc)
+    while current <= end:
+        months.append(current.strftime("%Y_%m"))
+        current = current.replace(year=current.year + current.month // 12, month=current.month % 12 + 1)
+    return months
+
+def list_archives(archive_dir):
+    """'YYYY_MM' months that have an archive file, oldest first."""
+    months = []
+    for path in glob.glob(os.path.join(archive_dir, ARCHIVE_PATTERN.format(month="*"))):
+        match = re.search(r"articles_(\d{4}_\d{2}|undated)\.db$", path)
+        if match:
+            months.append(match.group(1))
+    return sorted(months)
+
+def get_archived_articles(since_ts=None, until_ts=None, source=None, limit=100, db_name="news_ingestion.db",
+                          archive_dir=None):
+    """
+    Query archived articles, newest first.
+
+    Only the archive files for the months in [since_ts, until_ts) are opened
+    (every file when either bound is missing).
+
+    Args:
+        since_ts: Only articles published at or after this UTC epoch
+        until_ts: Only articles published before this UTC epoch
+        source: Only articles from this feed URL
+        limit: Maximum articles returned
+        db_name: Live database whose archives are searched
+        archive_dir: Archive directory (defaults to archive_dir_for(db_name))
+
+    Returns:
+        list: Article dicts with the archived columns
+    """
+    archive_dir = archive_dir or archive_dir_for(db_name)
+    available = list_archives(archive_dir)
+    wanted = _months_between(since_ts, until_ts)
+    months = [month for month in available if wanted is None or month in wanted]
+
+    conditions, params = [], []
+    if since_ts is not None:
+        conditions.append('published_ts >= ?')
+        params.append(int(since_ts))
+    if until_ts is not None:
+        conditions.append('published_ts < ?')
+        params.append(int(until_ts))
+    if source:
+        conditions.append('source = ?')
+        params.append(source)
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    articles = []
+    for month in reversed(months):
+        archive = open_connection(archive_path(month, archive_dir), readonly=True)
+        try:
+            cursor = archive.execute(
+                f'SELECT * FROM parsed_articles{where} ORDER BY published_ts DESC LIMIT ?', (*params, limit)
+            )
+            rows = cursor.fetchall()
+            names = [column[0] for column in cursor.description]
+        finally:
+            archive.close()
+        articles.extend(dict(zip(names, row)) for row in rows)
+    articles.sort(key=lambda article: article.get("published_ts") or 0, reverse=True)
+    return articles[:limit]
+
+def enable_incremental_vacuum(db_name="news_ingestion.db"):
+    """
+    Switch an existing database to incremental auto-vacuum.
+
+    This needs one full VACUUM, which rewrites the whole file and blocks
+    writers while it runs; do it once during a quiet period.
+    """
+    conn = connect(db_name)
+    if conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2:
+        return
+    logger.info(f"Enabling incremental vacuum on {db_name} (full VACUUM)")
+    conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+    conn.execute('VACUUM')
+
+def compact_database(db_name="news_ingestion.db", step_pages=None, max_steps=None, pause_seconds=0.05):
+    """
+    Return free pages to the filesystem in small incremental-vacuum steps.
+
+    Args:
+        db_name: Path to the database file
+        step_pages: Pages freed per step (defaults to Config.VACUUM_STEP_PAGES)
+        max_steps: Stop after this many steps (None until no free pages are left)
+        pause_seconds: Pause between steps so other connections get the lock
+
+    Returns:
+        int: Pages freed
+    """
+    step_pages = step_pages or Config.VACUUM_STEP_PAGES
+    conn = connect(db_name)
+    if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+        logger.info(f"Incremental vacuum is not enabled on {db_name}; skipping compaction")
+        return 0
+
+    freed, steps = 0, 0
+    while max_steps is None or steps < max_steps:
+        free = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        if not free:
+            break
+        conn.execute(f'PRAGMA incremental_vacuum({step_pages})').fetchall()
+        freed += free - conn.execute('PRAGMA freelist_count').fetchone()[0]
+        steps += 1
+        time.sleep(pause_seconds)
+
+    # Fold the WAL back into the database file and truncate it
+    conn.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchall()
+    if freed:
+        logger.info(f"Compacted {db_name}: freed {freed} pages in {steps} steps")
+    return freed
+
+def run_retention(db_name="news_ingestion.db", max_age_days=None, archive_dir=None):
+    """
+    Archive old articles, prune the raw archive and compact the database.
+
+    Returns:
+        dict: 'archived' per month, raw archive 'pruned' counts and 'pages_freed'
+    """
+    archived = archive_old_articles(max_age_days, db_name=db_name, archive_dir=archive_dir)
+    pruned = prune_raw_archive(db_name=db_name)
+    return {"archived": archived, "pruned": pruned, "pages_freed": compact_database(db_name)}
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive old articles and compact the database")
+    parser.add_argument("--db", default="news_ingestion.db", help="Database file")
+    parser.add_argument("--days", type=int, default=None, help="Retention period in days (default: app_config)")
+    parser.add_argument("--archive-dir", default=None, help="Directory for monthly archive files")
+    parser.add_argument("--enable-incremental-vacuum", action="store_true",
+                        help="Run the one-time full VACUUM that enables incremental compaction")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.enable_incremental_vacuum:
+        enable_incremental_vacuum(args.db)
+    for key, value in run_retention(args.db, args.days, args.archive_dir).items():
+        print(f"{key}: {value}")
+    close_connections()
+
+if __name__ == "__main__":
+    main()
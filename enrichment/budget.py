@@ -0,0 +1,163 @@
+"""
+Module: budget.py
+Purpose: Cap LLM spend per hour and per run
+
+Spend is recorded per enrichment batch in the llm_spend table. Workers
+reserve a batch's estimated spend before leasing jobs and settle the actual
+cost once the batch is done, so concurrent workers cannot all pass the check
+and overshoot a limit together. Once the budget is used up, the remaining
+jobs are either enriched by the local heuristic enricher or left queued until
+the hourly window frees up (llm_budget_overflow). Because jobs are leased in
+priority order, the budget goes to the articles most likely to rank highly.
+"""
+import logging
+import sqlite3
+import threading
+import time
+from db.database import get_config_value
+from db.connection import connect
+
+logger = logging.getLogger(__name__)
+
+HOUR_SECONDS = 3600
+
+# Spend rows older than this are deleted
+SPEND_RETENTION_DAYS = 30
+
+# Tokens reserved per batch until this run has settled one to average over
+FIRST_BATCH_TOKENS = 2000
+
+def _config_int(key, db_name):
+    return int(get_config_value(key, db_name) or 0)
+
+def _exceeds(used, extra, limit):
+    """
+    True if a limit is set and used has reached it, or used plus extra would pass it.
+
+    Nothing used yet always leaves room for one batch, so an estimate larger
+    than a small limit cannot shut the provider out entirely.
+    """
+    return bool(limit) and (used >= limit or (used > 0 and used + extra > limit))
+
+class LLMBudget:
+    """Call and token limits for LLM enrichment; 0 means unlimited"""
+
+    def __init__(self, db_name="news_ingestion.db", calls_per_hour=None, tokens_per_hour=None,
+                 calls_per_run=None, tokens_per_run=None, overflow=None):
+        """
+        Args:
+            db_name: Path to the database file
+            calls_per_hour: Requests allowed in any rolling hour
+            tokens_per_hour: Input plus output tokens allowed in any rolling hour
+            calls_per_run: Requests allowed for this budget object
+            tokens_per_run: Tokens allowed for this budget object
+            overflow: 'local' to enrich the rest heuristically, 'defer' to leave it queued
+
+        Limits not given are read from the llm_budget_* keys in app_config.
+        """
+        self.db_name = db_name
+        self.calls_per_hour = calls_per_hour if calls_per_hour is not None else _config_int("llm_budget_calls_per_hour", db_name)
+        self.tokens_per_hour = tokens_per_hour if tokens_per_hour is not None else _config_int("llm_budget_tokens_per_hour", db_name)
+        self.calls_per_run = calls_per_run if calls_per_run is not None else _config_int("llm_budget_calls_per_run", db_name)
+        self.tokens_per_run = tokens_per_run if tokens_per_run is not None else _config_int("llm_budget_tokens_per_run", db_name)
+        self.overflow = overflow or get_config_value("llm_budget_overflow", db_name) or "local"
+        self.run_calls = 0
+        self.run_tokens = 0
+        self.run_batches = 0
+        self.reserved_calls = 0
+        self.reserved_tokens = 0
+        # Workers reserve and settle from their own threads
+        self._lock = threading.Lock()
+
+    @property
+    def limited(self):
+        return any((self.calls_per_hour, self.tokens_per_hour, self.calls_per_run, self.tokens_per_run))
+
+    def spent_last_hour(self):
+        """
+        Returns:
+            tuple: (requests, tokens) recorded in the last hour
+        """
+        with connect(self.db_name) as conn:
+            row = conn.execute('''
+                SELECT COALESCE(SUM(requests), 0), COALESCE(SUM(input_tokens + output_tokens), 0)
+                FROM llm_spend WHERE spent_at >= ?
+            ''', (int(time.time()) - HOUR_SECONDS,)).fetchone()
+        return row
+
+    def exhausted(self):
+        """True once any configured limit has been reached, counting reserved spend."""
+        with self._lock:
+            return self._over(0, 0)
+
+    def _over(self, calls, tokens):
+        """True if spent plus reserved spend, plus calls and tokens more, would pass a limit."""
+        if not self.limited:
+            return False
+        if _exceeds(self.run_calls + self.reserved_calls, calls, self.calls_per_run):
+            return True
+        if _exceeds(self.run_tokens + self.reserved_tokens, tokens, self.tokens_per_run):
+            return True
+        if self.calls_per_hour or self.tokens_per_hour:
+            hour_calls, hour_tokens = self.spent_last_hour()
+            if _exceeds(hour_calls + self.reserved_calls, calls, self.calls_per_hour):
+                return True
+            if _exceeds(hour_tokens + self.reserved_tokens, tokens, self.tokens_per_hour):
+                return True
+        return False
+
+    def reserve(self):
+        """
+        Set aside the estimated spend of one batch before it is leased.
+
+        The estimate is this run's average calls and tokens per settled batch
+        (one call and FIRST_BATCH_TOKENS before the first). Reserved spend
+        counts against every limit until settle() or release().
+
+        Returns:
+            tuple: (calls, tokens) reservation, or None if the budget cannot cover it
+        """
+        with self._lock:
+            if self.run_batches:
+                calls = max(1, round(self.run_calls / self.run_batches))
+                tokens = round(self.run_tokens / self.run_batches)
+            else:
+                calls, tokens = 1, FIRST_BATCH_TOKENS
+            if self._over(calls, tokens):
+                return None
+            self.reserved_calls += calls
+            self.reserved_tokens += tokens
+            return calls, tokens
+
+    def release(self, reservation):
+        """Return a reservation that was not spent."""
+        calls, tokens = reservation
+        with self._lock:
+            self.reserved_calls -= calls
+            self.reserved_tokens -= tokens
+
+    def settle(self, reservation, provider, requests, input_tokens, output_tokens):
+        """Record a batch's actual spend in place of its reservation."""
+        self.record(provider, requests, input_tokens, output_tokens)
+        with self._lock:
+            self.run_batches += 1
+        self.release(reservation)
+
+    def record(self, provider, requests, input_tokens, output_tokens):
+        """Add spend to this run's totals and to the llm_spend table."""
+        if not requests:
+            return
+        with self._lock:
+            self.run_calls += requests
+            self.run_tokens += input_tokens + output_tokens
+        now = int(time.time())
+        try:
+            with connect(self.db_name) as conn:
+                conn.execute('''
+                    INSERT INTO llm_spend (provider, requests, input_tokens, output_tokens, spent_at)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (provider, requests, input_tokens, output_tokens, now))
+                conn.execute('DELETE FROM llm_spend WHERE spent_at < ?', (now - SPEND_RETENTION_DAYS * 24 * HOUR_SECONDS,))
+                conn.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Error recording LLM spend: {e}")
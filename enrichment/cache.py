@@ -0,0 +1,179 @@
+"""
+Module: cache.py
+Purpose: Persistent cache of enrichment results keyed by content and prompt version
+
+Keys hash the normalized title and description together with the enricher's
+cache namespace (provider, model and prompt template hash) and summary
+length, so re-ingested or replayed articles cost nothing and a prompt or
+model change invalidates old results automatically.
+"""
+import hashlib
+import logging
+import re
+from db.database import get_config_value
+from db.connection import connect
+
+logger = logging.getLogger(__name__)
+
+TAG_PATTERN = re.compile(r"<[^>]+>")
+SPACE_PATTERN = re.compile(r"\s+")
+
+# Evict down to this fraction of max_entries, so eviction runs rarely
+EVICT_TO = 0.9
+
+# Cache hits held in memory before their last-used times are written
+TOUCH_BATCH = 100
+
+def normalize_text(text):
+    """Lowercase, strip HTML tags and collapse whitespace."""
+    return SPACE_PATTERN.sub(" ", TAG_PATTERN.sub(" ", text or "")).strip().lower()
+
+class EnrichmentCache:
+    """Enrichment results stored in the enrichment_cache table"""
+
+    def __init__(self, db_name="news_ingestion.db", max_entries=None):
+        """
+        Args:
+            db_name: Path to the database file
+            max_entries: Rows kept before least recently used ones are evicted
+                (defaults to enrichment_cache_max_entries in app_config)
+        """
+        self.db_name = db_name
+        self.max_entries = max_entries or int(get_config_value("enrichment_cache_max_entries", db_name) or 50000)
+        self.hits = 0
+        self.misses = 0
+        self._purged = set()
+        # Rows in the table: counted on the first put, then kept up to date
+        self._entries = None
+        # Cache key -> hits not yet written to the table
+        self._touched = {}
+
+    def make_key(self, title, description, enricher):
+        """Build the cache key for an article under an enricher's current prompt."""
+        self._purge_stale(enricher)
+        parts = [
+            normalize_text(title),
+            normalize_text(description),
+            enricher.cache_namespace(),
+            str(getattr(enricher, "max_summary_words", "")),
+        ]
+        return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """
+        Look up a cached enrichment.
+
+        Hits are tallied in memory and written by flush(), so a lookup never
+        writes to the database.
+
+        Returns:
+            tuple: (keyword, importance, summary), or None on a miss
+        """
+        try:
+            with connect(self.db_name, readonly=True) as conn:
+                row = conn.execute(
+                    'SELECT keywords, importance, derived_summary FROM enrichment_cache WHERE cache_key = ?',
+                    (key,)
+                ).fetchone()
+        except Exception as e:
+            logger.error(f"Error reading enrichment cache: {e}")
+            row = None
+
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._touched[key] = self._touched.get(key, 0) + 1
+        if len(self._touched) >= TOUCH_BATCH:
+            self.flush()
+        return row
+
+    def flush(self):
+        """Record the hit counts and last-used times of recent hits in one transaction."""
+        if not self._touched:
+            return
+        touched, self._touched = self._touched, {}
+        try:
+            with connect(self.db_name) as conn:
+                conn.executemany('''
+                    UPDATE enrichment_cache
+                    SET hits = hits + ?, last_used_at = CURRENT_TIMESTAMP
+                    WHERE cache_key = ?
+                ''', [(count, key) for key, count in touched.items()])
+                conn.commit()
+        except Exception as e:
+            logger.error(f"Error recording enrichment cache hits: {e}")
+
+    def put(self, key, enricher, result):
+        """
+        Store an enrichment result and evict old rows if the cache is full.
+
+        The table is counted once per instance; after that a running count
+        (an overestimate when a key is replaced) decides when to recount.
+        """
+        keyword, importance, summary = result
+        try:
+            with connect(self.db_name) as conn:
+                cursor = conn.cursor()
+                if self._entries is None:
+                    self._entries = cursor.execute('SELECT COUNT(*) FROM enrichment_cache').fetchone()[0]
+                cursor.execute('''
+                    INSERT OR REPLACE INTO enrichment_cache
+                    (cache_key, provider, namespace, keywords, importance, derived_summary)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (key, type(enricher).__name__, enricher.cache_namespace(), keyword, importance, summary))
+                conn.commit()
+                self._entries += 1
+
+            if self._entries > self.max_entries:
+                # Eviction goes by last use, so pending hits are written first
+                self.flush()
+                with connect(self.db_name) as conn:
+                    cursor = conn.cursor()
+                    self._entries = cursor.execute('SELECT COUNT(*) FROM enrichment_cache').fetchone()[0]
+                    if self._entries > self.max_entries:
+                        self._evict(cursor)
+                        self._entries -= cursor.rowcount
+                    conn.commit()
+        except Exception as e:
+            logger.error(f"Error writing enrichment cache: {e}")
+
+    def _evict(self, cursor):
+        """Drop least recently used rows down to EVICT_TO of max_entries."""
+        keep = int(self.max_entries * EVICT_TO)
+        cursor.execute('''
+            DELETE FROM enrichment_cache WHERE cache_key IN (
+                SELECT cache_key FROM enrichment_cache
+                ORDER BY last_used_at DESC, created_at DESC
+                LIMIT -1 OFFSET ?
+            )
+        ''', (keep,))
+        logger.info(f"Evicted {cursor.rowcount} enrichment cache entries")
+
+    def _purge_stale(self, enricher):
+        """Once per provider, delete rows written under an older model or prompt."""
+        provider = type(enricher).__name__
+        if provider in self._purged:
+            return
+        self._purged.add(provider)
+        try:
+            with connect(self.db_name) as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    'DELETE FROM enrichment_cache WHERE provider = ? AND namespace != ?',
+                    (provider, enricher.cache_namespace())
+                )
+                if cursor.rowcount:
+                    logger.info(f"Invalidated {cursor.rowcount} cached enrichments from an older {provider} prompt")
+                conn.commit()
+        except Exception as e:
+            logger.error(f"Error purging enrichment cache: {e}")
+
+    def stats(self):
+        """Hit/miss counters for this cache instance."""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else None,
+        }
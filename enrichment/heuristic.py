@@ -0,0 +1,179 @@
+"""
+Module: heuristic.py
+Purpose: Local enrichment with no network calls, using keyword TF-IDF scoring
+
+Categories come from the cosine similarity between an article's TF-IDF
+vector and seed-term vectors for each category, importance from weighted cue
+terms, and summaries from the highest scoring sentences of the description.
+Document frequencies are learned from the articles seen so far, so common
+words weigh less as the enricher is used.
+"""
+import math
+import re
+from collections import Counter
+from enrichment.llm_enrichment import LLMEnricher
+from db.database import get_config_value
+
+TAG_PATTERN = re.compile(r"<[^>]+>")
+WORD_PATTERN = re.compile(r"[a-z][a-z'-]+")
+SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\"'])")
+
+# Bump when the lexicons change so cached results are invalidated
+MODEL_VERSION = "1"
+
+STOP_WORDS = frozenset("""
+    a about after all also an and any are as at be been but by can could did do does for from had has
+    have he her his how i if in into is it its just more most new no not of on one or our out over said
+    says she so some than that the their them there they this to up was we were what when which who will
+    with would you your
+""".split())
+
+CATEGORY_TERMS = {
+    "politics": "election vote voters parliament government minister president senate congress party campaign "
+                "policy law bill labour conservative democrat republican mp referendum coalition",
+    "world": "war ukraine russia china israel gaza iran un nato embassy foreign border refugees troops ceasefire "
+             "diplomatic sanctions summit military",
+    "business": "market markets shares stock stocks company companies profit profits revenue economy economic "
+                "inflation interest rates bank banks investors deal merger earnings trade jobs",
+    "technology": "tech technology ai software app apps apple google microsoft meta amazon chip chips cyber data "
+                  "internet online startup smartphone computer robot",
+    "science": "science scientists research study space nasa planet physics species discovery researchers "
+               "telescope fossil experiment",
+    "health": "health hospital hospitals nhs doctors patients disease virus vaccine cancer covid medical drug "
+              "drugs mental treatment",
+    "sport": "football match league cup team win wins goal season player players coach tennis cricket rugby "
+             "olympics championship tournament",
+    "entertainment": "film films movie music album star actor actress singer tv show series festival award awards "
+                     "celebrity netflix",
+    "environment": "climate weather storm flood floods wildfire emissions energy carbon environment pollution "
+                   "heatwave renewable",
+    "crime": "police court trial murder arrested charged crime prison judge sentenced shooting fraud investigation",
+}
+
+# Cue terms and their weight towards a higher importance level
+IMPORTANCE_TERMS = {
+    "breaking": 3, "killed": 3, "dead": 3, "dies": 3, "died": 3, "war": 3, "attack": 3, "earthquake": 3,
+    "emergency": 3, "crisis": 2, "explosion": 3, "evacuate": 3, "resigns": 3, "resign": 2, "election": 2,
+    "outbreak": 2, "warning": 2, "record": 1, "deal": 1, "announces": 1, "launches": 1, "report": 1,
+    "rise": 1, "falls": 1, "plans": 1, "strike": 2, "urgent": 2, "first": 1, "billion": 1, "million": 1,
+}
+HIGH_IMPORTANCE_SCORE = 4
+MEDIUM_IMPORTANCE_SCORE = 1
+
+def tokenize(text):
+    """Lowercase words with HTML tags and stop words removed."""
+    return [word for word in WORD_PATTERN.findall(TAG_PATTERN.sub(" ", text or "").lower())
+            if word not in STOP_WORDS]
+
+def _normalize(vector):
+    norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+    return {term: weight / norm for term, weight in vector.items()} if norm else {}
+
+def _dot(a, b):
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(weight * b.get(term, 0.0) for term, weight in a.items())
+
+class HeuristicEnricher(LLMEnricher):
+    """Keyword/TF-IDF enricher that runs locally in well under a millisecond per article"""
+
+    DEFAULT_CATEGORY = "general"
+
+    def __init__(self, max_summary_words: int = None, db_name="news_ingestion.db"):
+        """
+        Args:
+            max_summary_words: Summary length (defaults to summary_max_words in app_config)
+            db_name: Path to the database file holding app_config
+        """
+        self.max_summary_words = max_summary_words or int(get_config_value("summary_max_words", db_name) or 100)
+        self.doc_freq = Counter()
+        self.doc_count = 0
+        self.categories = {
+            category: _normalize(dict.fromkeys(terms.split(), 1.0))
+            for category, terms in CATEGORY_TERMS.items()
+        }
+
+    def cache_namespace(self) -> str:
+        return f"{type(self).__name__}:{MODEL_VERSION}"
+
+    def idf(self, term):
+        """Smoothed inverse document frequency over the articles seen so far."""
+        return math.log((1 + self.doc_count) / (1 + self.doc_freq[term])) + 1.0
+
+    def tfidf(self, terms):
+        """Normalized TF-IDF vector (term -> weight) for a list of terms."""
+        return _normalize({term: count * self.idf(term) for term, count in Counter(terms).items()})
+
+    def observe(self, terms):
+        """Count an article's terms towards the document frequencies."""
+        self.doc_count += 1
+        self.doc_freq.update(set(terms))
+
+    def categorize(self, vector):
+        best, best_score = self.DEFAULT_CATEGORY, 0.0
+        for category, seed in self.categories.items():
+            score = _dot(vector, seed)
+            if score > best_score:
+                best, best_score = category, score
+        return best
+
+    def importance_score(self, title_terms, description_terms):
+        """Weighted cue terms, counting title words twice."""
+        return (2 * sum(IMPORTANCE_TERMS.get(term, 0) for term in set(title_terms))
+                + sum(IMPORTANCE_TERMS.get(term, 0) for term in set(description_terms)))
+
+    def prescore(self, title: str, description: str) -> float:
+        """
+        Cheap estimate (0 to 1) of how important an article is, for deciding
+        which articles are worth an LLM call.
+        """
+        score = self.importance_score(tokenize(title), tokenize(description))
+        return min(score / (2 * HIGH_IMPORTANCE_SCORE), 1.0)
+
+    def summarize(self, description, title, max_words):
+        """Highest scoring sentences, in their original order, within max_words."""
+        text = " ".join(TAG_PATTERN.sub(" ", description or "").split()) or (title or "")
+        sentences = SENTENCE_PATTERN.split(text)
+        if len(text.split()) <= max_words:
+            return text
+
+        scored = []
+        for index, sentence in enumerate(sentences):
+            terms = tokenize(sentence)
+            if terms:
+                score = sum(self.idf(term) for term in terms) / math.sqrt(len(terms))
+                scored.append((score, index, sentence))
+
+        chosen, words = [], 0
+        for _, index, sentence in sorted(scored, reverse=True):
+            length = len(sentence.split())
+            if words + length <= max_words:
+                chosen.append((index, sentence))
+                words += length
+        if not chosen:
+            return " ".join(text.split()[:max_words]) + "..."
+        return " ".join(sentence for _, sentence in sorted(chosen))
+
+    def enrich_sync(self, title: str, description: str, max_words: int = None) -> tuple[str, str, str]:
+        """Synchronous enrich_content for callers outside an event loop."""
+        max_words = max_words or self.max_summary_words
+        title_terms = tokenize(title)
+        description_terms = tokenize(description)
+        terms = title_terms * 2 + description_terms  # Titles are the stronger signal
+        self.observe(title_terms + description_terms)
+
+        keyword = self.categorize(self.tfidf(terms))
+        score = self.importance_score(title_terms, description_terms)
+        if score >= HIGH_IMPORTANCE_SCORE:
+            importance = "high"
+        elif score >= MEDIUM_IMPORTANCE_SCORE:
+            importance = "medium"
+        else:
+            importance = "low"
+        return keyword, importance, self.summarize(description, title, max_words)
+
+    async def enrich_content(self, title: str, description: str, max_words: int = None) -> tuple[str, str, str]:
+        return self.enrich_sync(title, description, max_words)
+
+    async def enrich_batch(self, items: list, max_words: int = None) -> list:
+        return [self.enrich_sync(title, description, max_words) for title, description in items]
@@ -0,0 +1,383 @@
+"""
+Module: job_queue.py
+Purpose: SQLite-backed queue of articles waiting for LLM enrichment
+
+Articles are stored as soon as they are parsed with enrichment_status
+'pending', and a job row is queued for each canonical one. Workers lease
+jobs in priority order, enrich them and write the results back. A lease
+that is not completed in time (e.g. the worker crashed) lets another
+worker pick the job up, failed jobs are retried with backoff, and jobs
+that keep failing are dead-lettered so they stop costing requests.
+
+Priority is the publish time, moved forward for high-priority sources and
+for articles the heuristic pre-score expects to rank highly.
+"""
+import asyncio
+import logging
+import os
+import socket
+import time
+from config.settings import Config
+from enrichment.budget import LLMBudget
+from enrichment.cache import EnrichmentCache
+from enrichment.heuristic import HeuristicEnricher
+from enrichment.llm_enrichment import enrich_articles
+from db.connection import connect
+
+logger = logging.getLogger(__name__)
+
+# Seconds before a failed job is retried, doubled on each further attempt
+RETRY_BASE_SECONDS = 30
+
+# How long an idle worker sleeps before checking the queue again
+IDLE_POLL_SECONDS = 5
+
+# Priority boost per point of source priority or pre-score, as if the
+# article had been published this much later
+PRIORITY_BOOST_SECONDS = 6 * 3600
+
+# Backfilled articles are queued this far below live ones, so workers only
+# reach them once live articles are done
+BACKFILL_PRIORITY_OFFSET = 10 ** 10
+
+_prescorer = HeuristicEnricher(max_summary_words=1)
+
+def job_priority(article, source_priority=0, backfill=False):
+    """
+    Priority for an article's enrichment job: higher runs first.
+
+    Args:
+        article: Parsed article dict (title, description, published_ts)
+        source_priority: The source's rss_sources.priority
+        backfill: Queue in the backfill lane, below every live article
+
+    Returns:
+        int: Publish time in UTC epoch seconds plus boosts
+    """
+    published_ts = article.get("published_ts") or int(time.time())
+    prescore = _prescorer.prescore(article.get("title"), article.get("description"))
+    priority = int(published_ts + (source_priority + prescore) * PRIORITY_BOOST_SECONDS)
+    return priority - BACKFILL_PRIORITY_OFFSET if backfill else priority
+
+def enqueue_enrichment(cursor, article_id, priority=None):
+    """
+    Queue an article for enrichment inside the caller's transaction.
+
+    Args:
+        cursor: Open database cursor (the article's insert is in the same transaction)
+        article_id: parsed_articles id
+        priority: Higher runs first (see job_priority; defaults to now)
+    """
+    enqueue_enrichments(cursor, [(article_id, priority)])
+
+def enqueue_enrichments(cursor, jobs):
+    """Queue several (article_id, priority) jobs in one statement; see enqueue_enrichment."""
+    now = int(time.time())
+    cursor.executemany('''
+        INSERT OR REPLACE INTO enrichment_jobs (article_id, priority, status, attempts, available_at)
+        VALUES (?, ?, 'queued', 0, 0)
+    ''', [(article_id, now if priority is None else priority) for article_id, priority in jobs])
+
+class EnrichmentQueue:
+    """Lease, complete and retry jobs in the enrichment_jobs table"""
+
+    def __init__(self, db_name="news_ingestion.db", lease_seconds=None, max_attempts=None):
+        """
+        Args:
+            db_name: Path to the database file
+            lease_seconds: Time a worker has to finish a leased job
+            max_attempts: Attempts before a job is dead-lettered
+        """
+        self.db_name = db_name
+        self.lease_seconds = lease_seconds or Config.ENRICHMENT_LEASE_SECONDS
+        self.max_attempts = max_attempts or Config.ENRICHMENT_MAX_ATTEMPTS
+
+    def lease(self, owner, limit=1):
+        """
+        Claim up to `limit` ready jobs for a worker.
+
+        Ready jobs are queued ones whose retry delay has passed and leased
+        ones whose lease expired. Jobs already tried max_attempts times are
+        dead-lettered instead of being leased again.
+
+        Args:
+            owner: Identifier of the leasing worker
+            limit: Maximum jobs to claim
+
+        Returns:
+            list: Job dicts with id, article_id, attempts, title and description
+        """
+        now = int(time.time())
+        conn = connect(self.db_name)
+        try:
+            cursor = conn.cursor()
+            # Take the write lock up front so two workers cannot pick the same jobs
+            cursor.execute('BEGIN IMMEDIATE')
+
+            # Articles replaced or deleted since they were queued leave orphaned jobs
+            cursor.execute('''
+                DELETE FROM enrichment_jobs
+                WHERE status != 'dead'
+                AND NOT EXISTS (SELECT 1 FROM parsed_articles p WHERE p.id = enrichment_jobs.article_id)
+            ''')
+
+            cursor.execute('''
+                SELECT id, attempts FROM enrichment_jobs
+                WHERE (status = 'queued' AND available_at <= ?)
+                OR (status = 'leased' AND lease_expires_at < ?)
+                ORDER BY priority DESC, id
+                LIMIT ?
+            ''', (now, now, limit))
+            ready = cursor.fetchall()
+
+            exhausted = [job_id for job_id, attempts in ready if attempts >= self.max_attempts]
+            if exhausted:
+                self._dead_letter(cursor, exhausted, "lease expired after final attempt")
+            job_ids = [job_id for job_id, attempts in ready if attempts < self.max_attempts]
+            if not job_ids:
+                cursor.execute('COMMIT')
+                return []
+
+            placeholders = ", ".join("?" * len(job_ids))
+            cursor.execute(f'''
+                UPDATE enrichment_jobs
+                SET status = 'leased', lease_owner = ?, lease_expires_at = ?,
+                    attempts = attempts + 1, updated_at = CURRENT_TIMESTAMP
+                WHERE id IN ({placeholders})
+            ''', (owner, now + self.lease_seconds, *job_ids))
+
+            cursor.execute(f'''
+                SELECT j.id, j.article_id, j.attempts, p.title, p.description
+                FROM enrichment_jobs j JOIN parsed_articles p ON p.id = j.article_id
+                WHERE j.id IN ({placeholders})
+                ORDER BY j.priority DESC, j.id
+            ''', job_ids)
+            jobs = [
+                {"id": row[0], "article_id": row[1], "attempts": row[2], "title": row[3], "description": row[4] or ""}
+                for row in cursor.fetchall()
+            ]
+            cursor.execute('COMMIT')
+            return jobs
+        except Exception:
+            if conn.in_transaction:
+                cursor.execute('ROLLBACK')
+            raise
+
+    def complete(self, job, result):
+        """
+        Store a job's enrichment and remove it from the queue.
+
+        Near-duplicates still waiting on this article receive the same result.
+        """
+        keyword, importance, summary = result
+        with connect(self.db_name) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE parsed_articles
+                SET keywords = ?, importance = ?, derived_summary = ?, enrichment_status = 'done'
+                WHERE id = ? OR (canonical_id = ? AND enrichment_status = 'pending')
+            ''', (keyword, importance, summary, job["article_id"], job["article_id"]))
+            cursor.execute('DELETE FROM enrichment_jobs WHERE id = ?', (job["id"],))
+            conn.commit()
+
+    def fail(self, job, error):
+        """
+        Record a failed attempt: retry later with backoff, or dead-letter the
+        job once it has used max_attempts.
+        """
+        with connect(self.db_name) as conn:
+            cursor = conn.cursor()
+            if job["attempts"] >= self.max_attempts:
+                self._dead_letter(cursor, [job["id"]], error)
+            else:
+                delay = RETRY_BASE_SECONDS * 2 ** (job["attempts"] - 1)
+                cursor.execute('''
+                    UPDATE enrichment_jobs
+                    SET status = 'queued', available_at = ?, lease_owner = NULL, lease_expires_at = NULL,
+                        last_error = ?, updated_at = CURRENT_TIMESTAMP
+                    WHERE id = ?
+                ''', (int(time.time()) + delay, str(error), job["id"]))
+            conn.commit()
+
+    def _dead_letter(self, cursor, job_ids, error):
+        """Stop retrying jobs and give their articles a plain fallback summary."""
+        placeholders = ", ".join("?" * len(job_ids))
+        cursor.execute(f'''
+            UPDATE enrichment_jobs
+            SET status = 'dead', lease_owner = NULL, lease_expires_at = NULL,
+                last_error = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE id IN ({placeholders})
+        ''', (str(error), *job_ids))
+        cursor.execute(f'''
+            UPDATE parsed_articles
+            SET keywords = 'uncategorized', importance = 'low',
+                derived_summary = substr(COALESCE(description, ''), 1, 100) || '...',
+                enrichment_status = 'failed'
+            WHERE enrichment_status = 'pending' AND (
+                id IN (SELECT article_id FROM enrichment_jobs WHERE id IN ({placeholders}))
+                OR canonical_id IN (SELECT article_id FROM enrichment_jobs WHERE id IN ({placeholders}))
+            )
+        ''', (*job_ids, *job_ids))
+        logger.warning(f"Dead-lettered {len(job_ids)} enrichment jobs: {error}")
+
+    def requeue_dead(self):
+        """
+        Give dead-lettered jobs a fresh set of attempts (e.g. after an outage).
+
+        Returns:
+            int: Number of jobs requeued
+        """
+        with connect(self.db_name) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE parsed_articles SET enrichment_status = 'pending'
+                WHERE enrichment_status = 'failed' AND (
+                    id IN (SELECT article_id FROM enrichment_jobs WHERE status = 'dead')
+                    OR canonical_id IN (SELECT article_id FROM enrichment_jobs WHERE status = 'dead')
+                )
+            ''')
+            cursor.execute('''
+                UPDATE enrichment_jobs
+                SET status = 'queued', attempts = 0, available_at = 0, updated_at = CURRENT_TIMESTAMP
+                WHERE status = 'dead'
+            ''')
+            conn.commit()
+            return cursor.rowcount
+
+    def stats(self):
+        """Job counts by status."""
+        with connect(self.db_name) as conn:
+            rows = conn.execute('SELECT status, COUNT(*) FROM enrichment_jobs GROUP BY status').fetchall()
+        counts = {"queued": 0, "leased": 0, "dead": 0}
+        counts.update(dict(rows))
+        return counts
+
+def _finish_jobs(queue, jobs, articles):
+    """
+    Complete each leased job with its enrichment, or fail it if the provider returned none.
+
+    Returns:
+        int: Jobs failed
+    """
+    failed = 0
+    for job, article in zip(jobs, articles):
+        if article.get("enrichment_failed"):
+            queue.fail(job, "provider returned no usable enrichment")
+            failed += 1
+        else:
+            queue.complete(job, (article["keywords"], article["importance"], article["derived_summary"]))
+    return failed
+
+def worker_id(index=0):
+    """Lease owner name unique to this host, process and worker."""
+    return f"{socket.gethostname()}:{os.getpid()}:{index}"
+
+async def run_enrichment_workers(enricher, db_name="news_ingestion.db", workers=None, batch_size=None,
+                                 stop_when_empty=False, queue=None, budget=None, stop_event=None,
+                                 idle_seconds=IDLE_POLL_SECONDS):
+    """
+    Drain the enrichment queue with a pool of workers.
+
+    Each worker leases batch_size jobs at a time and enriches them through
+    enrich_articles, so the enrichment cache and batched requests apply.
+    Once the LLM budget is used up, jobs are enriched by the local heuristic
+    enricher or left queued, depending on the budget's overflow setting.
+
+    Args:
+        enricher: LLM enrichment service instance
+        db_name: Path to the database file
+        workers: Concurrent workers (defaults to Config.LLM_MAX_CONCURRENCY)
+        batch_size: Jobs leased per worker at a time (defaults to Config.LLM_BATCH_SIZE)
+        stop_when_empty: Return once no job is ready instead of waiting for more
+        queue: EnrichmentQueue to use (defaults to one on db_name)
+        budget: LLMBudget limiting spend (defaults to the app_config budget)
+        stop_event: asyncio.Event set once no more jobs will be added; workers
+            return when it is set and the queue is empty
+        idle_seconds: Sleep between checks of an empty queue
+
+    Returns:
+        dict: Counts of jobs enriched, enriched locally over budget, and
+            failed, plus busy 'seconds' and the enricher's LLM usage
+    """
+    workers = workers or getattr(enricher, "max_concurrency", None) or Config.LLM_MAX_CONCURRENCY
+    batch_size = batch_size or Config.LLM_BATCH_SIZE
+    queue = queue or EnrichmentQueue(db_name)
+    cache = EnrichmentCache(db_name)
+    counts = {"enriched": 0, "local": 0, "failed": 0, "seconds": 0.0}
+
+    # Only enrichers that report usage (i.e. paid providers) are budgeted
+    usage = getattr(enricher, "usage", None)
+    usage_at_start = dict(usage) if usage is not None else None
+    budget = budget or (LLMBudget(db_name) if usage is not None else None)
+    recorded = dict(usage) if usage is not None else None
+    fallback = None
+
+    async def settle_spend(reservation):
+        # Workers share the enricher, so record the change since the last call
+        delta = {key: usage[key] - recorded[key] for key in usage}
+        recorded.update(usage)
+        await asyncio.to_thread(budget.settle, reservation, type(enricher).__name__, delta["requests"],
+                                delta["input_tokens"], delta["output_tokens"])
+
+    async def worker(index):
+        nonlocal fallback
+        owner = worker_id(index)
+        while True:
+            # Checked before leasing, so jobs added just before the event are not missed
+            finished = stop_when_empty or (stop_event is not None and stop_event.is_set())
+
+            # Queue and budget calls are blocking SQLite work, so they run in threads.
+            # The batch's spend is reserved before leasing, so concurrent
+            # workers cannot all pass the check and overshoot the budget
+            reservation = await asyncio.to_thread(budget.reserve) if budget is not None else None
+            over_budget = budget is not None and reservation is None
+            if over_budget and budget.overflow == "defer":
+                if finished:
+                    return
+                await asyncio.sleep(idle_seconds)
+                continue
+
+            jobs = []
+            try:
+                jobs = await asyncio.to_thread(queue.lease, owner, batch_size)
+            finally:
+                if reservation is not None and not jobs:
+                    await asyncio.to_thread(budget.release, reservation)
+            if not jobs:
+                if finished:
+                    return
+                await asyncio.sleep(idle_seconds)
+                continue
+
+            active = enricher
+            if over_budget:
+                fallback = fallback or HeuristicEnricher(db_name=db_name)
+                active = fallback
+
+            articles = [{"title": job["title"], "description": job["description"]} for job in jobs]
+            start = time.perf_counter()
+            try:
+                await enrich_articles(articles, active, concurrency=1, cache=cache, batch_size=batch_size)
+            finally:
+                counts["seconds"] += time.perf_counter() - start
+                if reservation is not None:
+                    await settle_spend(reservation)
+
+            failed = await asyncio.to_thread(_finish_jobs, queue, jobs, articles)
+            counts["failed"] += failed
+            counts["local" if over_budget else "enriched"] += len(jobs) - failed
+
+    await asyncio.gather(*(worker(index) for index in range(workers)))
+    if usage is not None:
+        counts["llm_requests"] = usage["requests"] - usage_at_start["requests"]
+        counts["input_tokens"] = usage["input_tokens"] - usage_at_start["input_tokens"]
+        counts["output_tokens"] = usage["output_tokens"] - usage_at_start["output_tokens"]
+    if counts["local"]:
+        logger.warning(f"LLM budget used up; {counts['local']} articles enriched locally instead")
+    queue_stats = await asyncio.to_thread(queue.stats)
+    logger.info(f"Enrichment workers finished: {counts}, cache {cache.stats()}, queue {queue_stats}")
+    return counts
+
+async def drain_enrichment_queue(enricher, db_name="news_ingestion.db", **kwargs):
+    """Enrich every job that is ready now, then return."""
+    return await run_enrichment_workers(enricher, db_name, stop_when_empty=True, **kwargs)
@@ -3,12 +3,47 @@ Module: llm_enrichment.py
 Purpose: Enrich articles with keywords and summaries using LLM
 """
 from abc import ABC, abstractmethod
+import asyncio
+import hashlib
+import json
 import logging
-from anthropic import Client  # Import the Client class from the Anthropic library
+import os
+import random
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from anthropic import AsyncAnthropic, RateLimitError, APIConnectionError, InternalServerError
 from db.database import get_config_value
+from config.settings import Config
+from enrichment.rate_limit import RateLimiter
 
 logger = logging.getLogger(__name__)
 
+def retry_after_seconds(value):
+    """
+    Seconds to wait from a retry-after header.
+
+    The header is either a number of seconds or an HTTP-date (RFC 9110).
+
+    Args:
+        value: Header value (may be None)
+
+    Returns:
+        float: Seconds to wait, or None if the header is missing or unparseable
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
 class LLMEnricher(ABC):
     """Abstract base class for LLM enrichment services"""
     
@@ -23,14 +58,152 @@ class LLMEnricher(ABC):
             max_words: Maximum words for summary
             
         Returns:
-            tuple: (keyword, importance, summary)
+            tuple: (keyword, importance, summary), or None if the provider
+            could not enrich the article
         """
         pass
 
+    def cache_namespace(self) -> str:
+        """
+        Identify the model and prompt behind this enricher's results.
+
+        Cached enrichments are only reused under the same namespace, so
+        changing the model or prompt invalidates them automatically.
+        """
+        return type(self).__name__
+
+    async def enrich_batch(self, items: list, max_words: int = None) -> list:
+        """
+        Get keyword, importance, and summary for several articles
+
+        The default makes one enrich_content call per article; providers that
+        can pack many articles into a single request override this.
+
+        Args:
+            items: List of (title, description) tuples
+            max_words: Maximum words for each summary
+
+        Returns:
+            list: (keyword, importance, summary) tuples in the order of items,
+            with None for articles that could not be enriched
+        """
+        return list(await asyncio.gather(
+            *(self.enrich_content(title, description, max_words) for title, description in items)
+        ))
+
 class AnthropicEnricher(LLMEnricher):
-    def __init__(self, api_key: str):
-        self.client = Client(api_key=api_key)  # Initialize the client with the API key
-        self.max_summary_words = int(get_config_value("summary_max_words") or 100)  # Default to 100 if not found
+    MODEL = "claude-3-haiku-20240307"
+    MAX_TOKENS = 300
+
+    SYSTEM_PROMPT = "You are a summarizer. Only provide a keyword, importance, and a short summary."
+    USER_PROMPT_TEMPLATE = (
+        "Analyze the following article and provide three things:\n"
+        "1. A single category keyword\n"
+        "2. Importance level ('high', 'medium', 'low')\n"
+        "3. A concise summary in {max_words} words or less\n\n"
+        "Title: {title}\n"
+        "Description: {description}\n\n"
+        "Respond in exactly 3 lines:\n"
+        "Line 1: just the keyword\n"
+        "Line 2: just the importance level\n"
+        "Line 3: the summary"
+    )
+
+    IMPORTANCE_LEVELS = ("high", "medium", "low")
+
+    BATCH_SYSTEM_PROMPT = "You are a summarizer. Respond only with a JSON array."
+    BATCH_PROMPT_TEMPLATE = (
+        "For each article in the JSON array below provide three things:\n"
+        "1. A single category keyword\n"
+        "2. Importance level ('high', 'medium', 'low')\n"
+        "3. A concise summary in {max_words} words or less\n\n"
+        "Articles:\n{articles}\n\n"
+        "Respond with only a JSON array holding one object per article:\n"
+        '[{{"id": <article id>, "keyword": "...", "importance": "...", "summary": "..."}}]'
+    )
+    # Output budget per article in a batch: summary words plus JSON overhead
+    BATCH_ITEM_OVERHEAD_TOKENS = 40
+    BATCH_MAX_TOKENS = 4096
+
+    def __init__(self, api_key: str, base_url: str = None, max_concurrency: int = None,
+                 requests_per_minute: int = None, tokens_per_minute: int = None, db_name="news_ingestion.db"):
+        """
+        Args:
+            api_key: Anthropic API key
+            base_url: Override the API endpoint (e.g. a local stub server)
+            max_concurrency: Requests in flight at once
+            requests_per_minute: Request rate limit
+            tokens_per_minute: Estimated token rate limit
+            db_name: Database holding the summary_max_words setting
+        """
+        # Retries are handled here so 429 backoff is shared by every in-flight request
+        self.client = AsyncAnthropic(api_key=api_key, base_url=base_url or Config.ANTHROPIC_BASE_URL, max_retries=0)
+        self.max_summary_words = int(get_config_value("summary_max_words", db_name) or 100)  # Default to 100 if not found
+        self.max_concurrency = max_concurrency or Config.LLM_MAX_CONCURRENCY
+        self.rate_limiter = RateLimiter(
+            requests_per_minute or Config.LLM_REQUESTS_PER_MINUTE,
+            tokens_per_minute or Config.LLM_TOKENS_PER_MINUTE
+        )
+        self.max_retries = Config.LLM_MAX_RETRIES
+        # Running totals of successful requests, read by the spend budget
+        self.usage = {"requests": 0, "input_tokens": 0, "output_tokens": 0}
+
+    def cache_namespace(self) -> str:
+        """Model plus a hash of the prompt templates."""
+        prompt_version = hashlib.sha256(
+            (self.SYSTEM_PROMPT + self.USER_PROMPT_TEMPLATE
+             + self.BATCH_SYSTEM_PROMPT + self.BATCH_PROMPT_TEMPLATE).encode("utf-8")
+        ).hexdigest()[:12]
+        return f"{type(self).__name__}:{self.MODEL}:{prompt_version}"
+
+    @staticmethod
+    def estimate_tokens(*texts: str) -> int:
+        """Rough token count (about four characters per token)."""
+        return sum(len(text) for text in texts) // 4 + 1
+
+    async def create_message(self, system_prompt: str, user_prompt: str, max_tokens: int = None):
+        """
+        Send one request, waiting on the rate limiter and backing off on 429s.
+
+        Raises:
+            anthropic.APIError: If the request still fails after max_retries
+        """
+        max_tokens = max_tokens or self.MAX_TOKENS
+        estimated = self.estimate_tokens(system_prompt, user_prompt) + max_tokens
+
+        for attempt in range(self.max_retries + 1):
+            await self.rate_limiter.acquire(estimated)
+            try:
+                response = await self.client.messages.create(
+                    model=self.MODEL,
+                    max_tokens=max_tokens,
+                    temperature=0.7,
+                    system=system_prompt,
+                    messages=[
+                        {
+                            "role": "user",
+                            "content": [{"type": "text", "text": user_prompt}]
+                        }
+                    ]
+                )
+                self.usage["requests"] += 1
+                self.usage["input_tokens"] += response.usage.input_tokens
+                self.usage["output_tokens"] += response.usage.output_tokens
+                return response
+            except RateLimitError as e:
+                if attempt == self.max_retries:
+                    raise
+                # Honour retry-after when given; otherwise back off exponentially
+                delay = retry_after_seconds(e.response.headers.get("retry-after"))
+                if delay is None:
+                    delay = 2 ** attempt + random.random()
+                self.rate_limiter.pause(delay)
+            except (APIConnectionError, InternalServerError) as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = 2 ** attempt + random.random()
+                logger.warning(f"Anthropic request failed ({e}); retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
     
     async def enrich_content(self, title: str, description: str, max_words: int = None) -> tuple[str, str, str]:
         """
@@ -42,43 +215,20 @@ class AnthropicEnricher(LLMEnricher):
             max_words: Maximum words for summary
             
         Returns:
-            tuple: (keyword, importance, summary)
+            tuple: (keyword, importance, summary), or None if the request
+            failed or the response was unusable
         """
         if max_words is None:
             max_words = self.max_summary_words  # Use the fetched value if not provided
+        description = description or ""
         
         try:
             # Prepare the system and user prompts
-            system_prompt = "You are a summarizer. Only provide a keyword, importance, and a short summary."
-            user_prompt = (
-                f"Analyze the following article and provide three things:\n"
-                "1. A single category keyword\n"
-                "2. Importance level ('high', 'medium', 'low')\n"
-                f"3. A concise summary in {max_words} words or less\n\n"
-                f"Title: {title}\n"
-                f"Description: {description}\n\n"
-                "Respond in exactly 3 lines:\n"
-                "Line 1: just the keyword\n"
-                "Line 2: just the importance level\n"
-                "Line 3: the summary"
-            )
+            system_prompt = self.SYSTEM_PROMPT
+            user_prompt = self.USER_PROMPT_TEMPLATE.format(max_words=max_words, title=title, description=description)
             
             logger.info("Sending request to Anthropic API")  # Log sending of prompt
-            
-            # Use messages.create() instead of completions.create()
-            response = self.client.messages.create(
-                model="claude-3-haiku-20240307",  # Specify the model you are using
-                max_tokens=300,  # Use max_tokens instead of max_tokens_to_sample
-                temperature=0.7,
-                system=system_prompt,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [{"type": "text", "text": user_prompt}]
-                    }
-                ]
-            )
-            
+            response = await self.create_message(system_prompt, user_prompt)
             logger.info("Received response from Anthropic API: %s", response)  # Log the response
             
             # Access the response content correctly
@@ -94,39 +244,199 @@ class AnthropicEnricher(LLMEnricher):
             
         except Exception as e:
             logger.error(f"Error enriching content with Anthropic: {e}")
-            return "uncategorized", "low", description[:100] + "..."
+            return None
+
+    def _validate_item(self, keyword, importance, summary):
+        """Normalize one enrichment, or return None if any part is unusable."""
+        keyword = str(keyword or "").strip().lower()
+        importance = str(importance or "").strip().lower()
+        summary = str(summary or "").strip()
+        if not keyword or importance not in self.IMPORTANCE_LEVELS or not summary:
+            return None
+        return keyword, importance, summary
+
+    def parse_batch_response(self, response_text: str, ids) -> dict:
+        """
+        Validate a batch response item by item
 
-async def enrich_articles(articles: list, enricher: LLMEnricher) -> list:
+        Objects are decoded one at a time, so a truncated array or a single
+        malformed item only loses the items affected.
+
+        Args:
+            response_text: Model output containing a JSON array of results
+            ids: Article ids that were sent
+
+        Returns:
+            dict: id -> (keyword, importance, summary) for each valid item
+        """
+        decoder = json.JSONDecoder()
+        results = {}
+        position = response_text.find("{")
+        while position != -1:
+            try:
+                item, end = decoder.raw_decode(response_text, position)
+            except ValueError:
+                position = response_text.find("{", position + 1)
+                continue
+            position = response_text.find("{", end)
+
+            if not isinstance(item, dict):
+                continue
+            try:
+                item_id = int(item.get("id"))
+            except (TypeError, ValueError):
+                continue
+            result = self._validate_item(item.get("keyword"), item.get("importance"), item.get("summary"))
+            if item_id in ids and result:
+                results[item_id] = result
+        return results
+
+    async def enrich_batch(self, items: list, max_words: int = None) -> list:
+        """
+        Get keyword, importance, and summary for several articles in one request
+
+        Articles go out as a JSON array and come back as one. Each returned
+        item is validated separately and only the missing or invalid ones are
+        sent again, up to Config.LLM_BATCH_ATTEMPTS requests; whatever is left
+        (or a lone article) goes through enrich_content.
+
+        Args:
+            items: List of (title, description) tuples
+            max_words: Maximum words for each summary
+
+        Returns:
+            list: (keyword, importance, summary) tuples in the order of items,
+            with None for articles that could not be enriched
+        """
+        if max_words is None:
+            max_words = self.max_summary_words
+
+        results = [None] * len(items)
+        pending = list(range(len(items)))
+        for attempt in range(Config.LLM_BATCH_ATTEMPTS):
+            if len(pending) < 2:
+                break
+
+            articles = json.dumps(
+                [{"id": i, "title": items[i][0], "description": items[i][1]} for i in pending],
+                ensure_ascii=False
+            )
+            user_prompt = self.BATCH_PROMPT_TEMPLATE.format(max_words=max_words, articles=articles)
+            max_tokens = min(self.BATCH_MAX_TOKENS, len(pending) * (2 * max_words + self.BATCH_ITEM_OVERHEAD_TOKENS))
+            try:
+                response = await self.create_message(self.BATCH_SYSTEM_PROMPT, user_prompt, max_tokens)
+                parsed = self.parse_batch_response(response.content[0].text, set(pending))
+            except Exception as e:
+                logger.error(f"Error enriching batch of {len(pending)} articles with Anthropic: {e}")
+                parsed = {}
+
+            for i, result in parsed.items():
+                results[i] = result
+            pending = [i for i in pending if results[i] is None]
+            if pending:
+                logger.warning(f"{len(pending)} of {len(items)} batched articles failed validation (attempt {attempt + 1})")
+
+        singles = await asyncio.gather(
+            *(self.enrich_content(items[i][0], items[i][1], max_words) for i in pending)
+        )
+        for i, result in zip(pending, singles):
+            results[i] = result
+        return results
+
+def create_enricher(provider: str = None, db_name="news_ingestion.db") -> LLMEnricher:
+    """
+    Build the enricher selected by the llm_provider setting.
+
+    Args:
+        provider: 'anthropic' or 'local' (defaults to llm_provider in app_config)
+        db_name: Path to the database file
+
+    Returns:
+        LLMEnricher: The configured enrichment service
+
+    Raises:
+        ValueError: If the Anthropic provider is selected without an API key
+    """
+    provider = (provider or get_config_value("llm_provider", db_name) or "anthropic").lower()
+    if provider == "local":
+        from enrichment.heuristic import HeuristicEnricher
+        return HeuristicEnricher(db_name=db_name)
+
+    if provider != "anthropic":
+        logger.warning(f"LLM provider '{provider}' is not supported; using anthropic")
+    api_key = os.getenv("ANTHROPIC_API_KEY")
+    if not api_key:
+        raise ValueError("ANTHROPIC_API_KEY not found in environment variables")
+    return AnthropicEnricher(api_key, db_name=db_name)
+
+def _apply_enrichment(article: dict, result: tuple):
+    article["keywords"], article["importance"], article["derived_summary"] = result
+
+async def enrich_articles(articles: list, enricher: LLMEnricher, concurrency: int = None, cache=None,
+                          batch_size: int = None) -> list:
     """
     Enrich a list of articles with keywords, importance, and summaries
     
+    Cache misses are grouped into batches of batch_size and sent through
+    enricher.enrich_batch. Batches run concurrently, bounded by a semaphore;
+    the enricher's own rate limiter paces the actual API calls.
+    
     Args:
         articles: List of article dictionaries
         enricher: LLM enrichment service instance
+        concurrency: Requests made at once (defaults to the enricher's
+            max_concurrency, then Config.LLM_MAX_CONCURRENCY)
+        cache: Optional EnrichmentCache checked before calling the provider
+        batch_size: Articles per request (defaults to Config.LLM_BATCH_SIZE;
+            1 sends every article on its own)
     
     Returns:
-        List of enriched article dictionaries
+        List of enriched article dictionaries, in the original order. Articles
+        the provider could not enrich get placeholder values and
+        'enrichment_failed' set to True.
     """
-    enriched_articles = []
-    
+    concurrency = concurrency or getattr(enricher, "max_concurrency", None) or Config.LLM_MAX_CONCURRENCY
+    batch_size = max(1, batch_size or Config.LLM_BATCH_SIZE)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    pending = []
     for article in articles:
+        # Near-duplicates reuse their canonical story's enrichment
+        if article.get("canonical_id") and article.get("keywords"):
+            continue
+
+        cache_key = cache.make_key(article["title"], article.get("description") or "", enricher) if cache else None
+        cached = cache.get(cache_key) if cache else None
+        if cached:
+            _apply_enrichment(article, cached)
+        else:
+            pending.append((article, cache_key))
+    if cache:
+        cache.flush()
+
+    async def enrich_chunk(chunk):
         try:
-            # Get all enrichments in one call
-            keyword, importance, summary = await enricher.enrich_content(
-                article["title"],
-                article["description"]
-            )
-            
-            article["keywords"] = keyword
-            article["importance"] = importance
-            article["derived_summary"] = summary
-            enriched_articles.append(article)
-            
+            async with semaphore:
+                if len(chunk) == 1:
+                    article = chunk[0][0]
+                    results = [await enricher.enrich_content(article["title"], article.get("description") or "")]
+                else:
+                    results = await enricher.enrich_batch(
+                        [(article["title"], article.get("description") or "") for article, _ in chunk]
+                    )
         except Exception as e:
-            logger.error(f"Error enriching article {article.get('title')}: {e}")
-            article["keywords"] = "uncategorized"
-            article["importance"] = "low"
-            article["derived_summary"] = article["description"][:100] + "..."
-            enriched_articles.append(article)
-    
-    return enriched_articles 
\ No newline at end of file
+            logger.error(f"Error enriching {len(chunk)} articles: {e}")
+            results = [None] * len(chunk)
+
+        for (article, cache_key), result in zip(chunk, results):
+            if result is None:
+                # Stored as a placeholder, flagged so callers can retry it
+                article["enrichment_failed"] = True
+                result = ("uncategorized", "low", (article.get("description") or "")[:100] + "...")
+            elif cache:
+                cache.put(cache_key, enricher, result)
+            _apply_enrichment(article, result)
+
+    chunks = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+    await asyncio.gather(*(enrich_chunk(chunk) for chunk in chunks))
+    return articles
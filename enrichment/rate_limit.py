@@ -0,0 +1,72 @@
+"""
+Module: rate_limit.py
+Purpose: Token-bucket limits on LLM requests per minute and tokens per minute
+"""
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+class TokenBucket:
+    """Continuously refilling bucket; callers wait until enough tokens are available"""
+
+    def __init__(self, per_minute: float, capacity: float = None):
+        """
+        Args:
+            per_minute: Refill rate in tokens per minute
+            capacity: Maximum burst size (defaults to one minute's worth)
+        """
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` tokens are available (0 if available now)."""
+        self._refill()
+        amount = min(amount, self.capacity)  # Oversized requests wait for a full bucket
+        return 0.0 if self.tokens >= amount else (amount - self.tokens) / self.rate
+
+    def take(self, amount: float):
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute limits shared by concurrent callers"""
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, tokens: float):
+        """
+        Wait until one request and `tokens` tokens may be spent, then spend them.
+
+        Callers are served in arrival order, so a large request is not starved
+        by a stream of small ones.
+        """
+        async with self._lock:
+            while True:
+                wait = max(
+                    self.paused_until - time.monotonic(),
+                    self.requests.wait_time(1),
+                    self.tokens.wait_time(tokens)
+                )
+                if wait <= 0:
+                    break
+                await asyncio.sleep(wait)
+            self.requests.take(1)
+            self.tokens.take(tokens)
+
+    def pause(self, seconds: float):
+        """Hold every caller for `seconds`, e.g. after the provider returns a 429."""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        logger.warning(f"Rate limited by provider; pausing requests for {seconds:.1f}s")
@@ -1,14 +1,14 @@
 from flask import Flask, render_template, jsonify, request, redirect, url_for, flash
 from functools import wraps
-import sqlite3
-from datetime import datetime
+from datetime import datetime, timezone
 import logging
 import sys
 import os
 import json
 from dotenv import load_dotenv
 from pipeline.rss_manager import refresh_rss_feeds  # Import the new function
-from enrichment.llm_enrichment import AnthropicEnricher  # Ensure this import is present
+from enrichment.llm_enrichment import create_enricher
+from ingestion.fetch_rss import close_session
 
 import asyncio
 
@@ -19,16 +19,19 @@ load_dotenv()
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from config.logging_config import setup_logging
-print("App.py - System Path:", sys.path)
 from config.settings import Config
 from ranking.rank import get_ranked_articles
+from ranking.search import search_articles
+from pipeline.run_ledger import get_pipeline_runs, get_pipeline_run
+from db.connection import connect
+from db.database import initialize_database
+from db.retention import get_archived_articles
 
 logger = setup_logging()
 
-# Debug prints
-print("Python path:", sys.path)
-print("Current directory:", os.getcwd())
-print("File location:", os.path.abspath(__file__))
+logger.debug(f"Python path: {sys.path}")
+logger.debug(f"Current directory: {os.getcwd()}")
+logger.debug(f"File location: {os.path.abspath(__file__)}")
 
 # Verify environment variables are loaded
 logger.info(f"Admin user set to: {Config.ADMIN_USERNAME}")
@@ -42,6 +45,19 @@ def create_app(db_path=None):
     app.secret_key = os.getenv('FLASK_SECRET_KEY', 'fallback_secret_key')
     app.config['DB_PATH'] = db_path or Config.DB_NAME
 
+    # Bring the schema up to date before serving; safe alongside running workers
+    try:
+        initialize_database(app.config['DB_PATH'])
+    except Exception as e:
+        logger.error(f"Error upgrading database schema: {e}")
+
+    @app.template_filter('format_ts')
+    def format_ts(timestamp, fallback="Unknown Date"):
+        """Format a UTC epoch for display; only done at render time."""
+        if timestamp is None:
+            return fallback
+        return datetime.fromtimestamp(timestamp, tz=timezone.utc).strftime("%d %b %Y %H:%M")
+
     # Basic auth decorator
     def admin_required(f):
         @wraps(f)
@@ -90,6 +106,7 @@ def create_app(db_path=None):
                     'source': article.get('source', ''),
                     'link': article.get('link', ''),
                     'published_date': article['published_date'],
+                    'published_ts': article.get('published_ts'),
                     'importance': article['importance'],
                     'rank_score': article['rank'],
                 })
@@ -105,17 +122,56 @@ def create_app(db_path=None):
     @app.route('/api/articles', methods=['GET'])
     def api_articles():
         try:
-            ranked_articles = get_ranked_articles(max_age_days=7, db_name=app.config['DB_PATH'])
+            # Optional ?since= / ?until= UTC epoch bounds, filtered in SQL
+            ranked_articles = get_ranked_articles(
+                max_age_days=7,
+                db_name=app.config['DB_PATH'],
+                since_ts=request.args.get('since', type=int),
+                until_ts=request.args.get('until', type=int)
+            )
             return jsonify(ranked_articles)
         except Exception as e:
             logger.error(f"Error fetching articles for API: {e}")
             return jsonify([])
 
+    @app.route('/api/search', methods=['GET'])
+    def api_search():
+        try:
+            # ?q= text, paged with ?page= / ?per_page=, optional ?source= / ?since= / ?until=
+            return jsonify(search_articles(
+                request.args.get('q', ''),
+                page=request.args.get('page', default=1, type=int),
+                per_page=request.args.get('per_page', default=20, type=int),
+                source=request.args.get('source'),
+                since_ts=request.args.get('since', type=int),
+                until_ts=request.args.get('until', type=int),
+                db_name=app.config['DB_PATH']
+            ))
+        except Exception as e:
+            logger.error(f"Error searching articles: {e}")
+            return jsonify({'error': str(e)}), 500
+
+    @app.route('/api/archive', methods=['GET'])
+    def api_archive():
+        try:
+            # Articles moved out of the live database by retention, newest first
+            articles = get_archived_articles(
+                since_ts=request.args.get('since', type=int),
+                until_ts=request.args.get('until', type=int),
+                source=request.args.get('source'),
+                limit=min(request.args.get('limit', default=100, type=int), 1000),
+                db_name=app.config['DB_PATH']
+            )
+            return jsonify(articles)
+        except Exception as e:
+            logger.error(f"Error fetching archived articles: {e}")
+            return jsonify([])
+
     @app.route('/admin')
     @admin_required
     def admin():
         try:
-            with sqlite3.connect(app.config['DB_PATH']) as conn:
+            with connect(app.config['DB_PATH'], readonly=True) as conn:
                 cursor = conn.cursor()
                 cursor.execute('SELECT key, value, description, type, options FROM app_config')
                 configs = [
@@ -129,31 +185,56 @@ def create_app(db_path=None):
                     for row in cursor.fetchall()
                 ]
 
-                cursor.execute('SELECT id, feed_url, source_name, category, status FROM rss_sources')
+                cursor.execute('SELECT id, feed_url, source_name, category, status, priority FROM rss_sources')
                 rss_sources = [
                     {
                         'id': row[0],
                         'feed_url': row[1],
                         'source_name': row[2],
                         'category': row[3],
-                        'status': row[4]
+                        'status': row[4],
+                        'priority': row[5] or 0
                     }
                     for row in cursor.fetchall()
                 ]
 
-                return render_template('admin.html', configs=configs, rss_sources=rss_sources)
+            pipeline_runs = get_pipeline_runs(10, app.config['DB_PATH'])
+            return render_template('admin.html', configs=configs, rss_sources=rss_sources,
+                                   pipeline_runs=pipeline_runs)
 
         except Exception as e:
             logger.error(f"Error in admin route: {e}")
             return jsonify({'error': str(e)}), 500
 
+    @app.route('/api/pipeline_runs', methods=['GET'])
+    @admin_required
+    def api_pipeline_runs():
+        try:
+            limit = min(request.args.get('limit', default=20, type=int), 1000)
+            return jsonify(get_pipeline_runs(limit, app.config['DB_PATH']))
+        except Exception as e:
+            logger.error(f"Error fetching pipeline runs: {e}")
+            return jsonify({'error': str(e)}), 500
+
+    @app.route('/api/pipeline_runs/<int:run_id>', methods=['GET'])
+    @admin_required
+    def api_pipeline_run(run_id):
+        try:
+            run = get_pipeline_run(run_id, app.config['DB_PATH'])
+            if run is None:
+                return jsonify({'error': 'Run not found'}), 404
+            return jsonify(run)
+        except Exception as e:
+            logger.error(f"Error fetching pipeline run {run_id}: {e}")
+            return jsonify({'error': str(e)}), 500
+
     @app.route('/admin/config', methods=['POST'])
     @admin_required
     def update_config():
         try:
             updates = request.form.to_dict()
 
-            with sqlite3.connect(app.config['DB_PATH']) as conn:
+            with connect(app.config['DB_PATH']) as conn:
                 cursor = conn.cursor()
                 for key, value in updates.items():
                     cursor.execute('''
@@ -182,19 +263,20 @@ def create_app(db_path=None):
                 url = request.form.get('feed_url')
                 name = request.form.get('source_name')
                 category = request.form.get('category')
+                priority = int(request.form.get('priority') or 0)
 
-                with sqlite3.connect(app.config['DB_PATH']) as conn:
+                with connect(app.config['DB_PATH']) as conn:
                     cursor = conn.cursor()
                     cursor.execute('''
-                        INSERT INTO rss_sources (feed_url, source_name, category)
-                        VALUES (?, ?, ?)
-                    ''', (url, name, category))
+                        INSERT INTO rss_sources (feed_url, source_name, category, priority)
+                        VALUES (?, ?, ?, ?)
+                    ''', (url, name, category, priority))
 
             elif action == 'update':
                 id = request.form.get('id')
                 status = request.form.get('status')
 
-                with sqlite3.connect(app.config['DB_PATH']) as conn:
+                with connect(app.config['DB_PATH']) as conn:
                     cursor = conn.cursor()
                     cursor.execute('''
                         UPDATE rss_sources 
@@ -202,6 +284,18 @@ def create_app(db_path=None):
                         WHERE id = ?
                     ''', (status, id))
 
+            elif action == 'priority':
+                id = request.form.get('id')
+                priority = int(request.form.get('priority') or 0)
+
+                with connect(app.config['DB_PATH']) as conn:
+                    cursor = conn.cursor()
+                    cursor.execute('''
+                        UPDATE rss_sources 
+                        SET priority = ?
+                        WHERE id = ?
+                    ''', (priority, id))
+
             conn.commit()
             flash('RSS sources updated successfully', 'success')
             return redirect(url_for('admin'))
@@ -215,16 +309,22 @@ def create_app(db_path=None):
     @admin_required  # Ensure this route is protected if needed
     def refresh_feeds():
         try:
-            api_key = os.getenv("ANTHROPIC_API_KEY")
-            if not api_key:
-                flash("ANTHROPIC_API_KEY not found in environment variables.", "error")
+            # Initialize the enricher selected by llm_provider
+            try:
+                enricher = create_enricher(db_name=app.config['DB_PATH'])
+            except ValueError as e:
+                flash(f"{e}.", "error")
                 return redirect(url_for('admin'))
 
-            # Initialize the enricher
-            enricher = AnthropicEnricher(api_key)  # Ensure api_key is a string
+            # Each request runs its own event loop, so release pooled connections with it
+            async def run_refresh():
+                try:
+                    return await refresh_rss_feeds(enricher)
+                finally:
+                    await close_session()
 
             # Call the refresh_rss_feeds function from rss_manager
-            result_message = asyncio.run(refresh_rss_feeds(enricher))
+            result_message = asyncio.run(run_refresh())
             flash(result_message, "success")
         except Exception as e:
             logger.error(f"Error refreshing feeds: {e}")
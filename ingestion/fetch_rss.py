@@ -2,51 +2,245 @@ import logging
 import feedparser
 import requests
 from requests.exceptions import RequestException
-from tenacity import retry, stop_after_attempt, wait_exponential
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential, wait_random
 import sqlite3
 from datetime import datetime
 import json  # Import the json module
+import hashlib
+import time
 import aiohttp
 import asyncio
+from db.database import get_feed_fetch_states, update_feed_fetch_state
+from db.raw_archive import archive_feed_body
+from config.settings import Config
+from ingestion.stream_parser import FeedParseError
+from ingestion.parse_executor import get_parse_executor, parse_in_executor
+from scheduler.poll_scheduler import record_poll
 
 # Logger initialization
 logger = logging.getLogger(__name__)
 
-async def fetch_feed(session, feed_url):
-    async with session.get(feed_url) as response:
-        if response.status != 200:
-            logger.error(f"Failed to fetch {feed_url}: {response.status}")
-            raise Exception(f"HTTP error: {response.status}")
-        return await response.text()
+# Shared client session so keep-alive connections are pooled across runs
+_session = None
+_session_loop = None
+
+class FeedFetchError(Exception):
+    """HTTP failure fetching a feed; retryable for throttling and server errors."""
+
+    def __init__(self, feed_url, status):
+        super().__init__(f"HTTP error: {status}")
+        self.feed_url = feed_url
+        self.status = status
+        self.retryable = status == 429 or status >= 500
+
+def _is_retryable(exception):
+    """Retry transient network failures, timeouts and retryable HTTP errors."""
+    if isinstance(exception, FeedFetchError):
+        return exception.retryable
+    return isinstance(exception, (aiohttp.ClientError, asyncio.TimeoutError))
+
+async def get_session():
+    """
+    Get the shared aiohttp session, creating one for the running event loop.
+
+    The connector caps concurrent connections globally and per host, and keeps
+    idle connections alive so later runs on the same loop reuse them.
+    """
+    global _session, _session_loop
+    loop = asyncio.get_running_loop()
+    if _session is None or _session.closed or _session_loop is not loop:
+        connector = aiohttp.TCPConnector(
+            limit=Config.FETCH_MAX_CONNECTIONS,
+            limit_per_host=Config.FETCH_MAX_PER_HOST,
+            keepalive_timeout=Config.FETCH_KEEPALIVE_SECONDS,
+            ttl_dns_cache=300
+        )
+        timeout = aiohttp.ClientTimeout(
+            connect=Config.FETCH_CONNECT_TIMEOUT,
+            sock_read=Config.FETCH_READ_TIMEOUT
+        )
+        _session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        _session_loop = loop
+    return _session
+
+async def close_session():
+    """Close the shared session (call before the event loop shuts down)."""
+    global _session, _session_loop
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+    _session_loop = None
 
 @retry(
-    stop=stop_after_attempt(3),
-    wait=wait_exponential(multiplier=1, min=2, max=10),
+    stop=stop_after_attempt(Config.FETCH_RETRY_ATTEMPTS),
+    wait=wait_exponential(multiplier=1, min=2, max=10) + wait_random(0, 1),
+    retry=retry_if_exception(_is_retryable),
     reraise=True
 )
-async def fetch_rss(rss_sources):
+async def fetch_feed(session, feed_url, state=None):
+    """
+    Fetch a feed, sending conditional GET validators when we have them.
+
+    Each feed retries independently on timeouts, connection errors, 429 and
+    5xx responses, so one failing publisher does not refetch the others.
+
+    Args:
+        session: aiohttp client session
+        feed_url: URL of the feed
+        state: Stored fetch state ({'etag', 'last_modified', 'content_hash'})
+
+    Returns:
+        tuple: (status, body, etag, last_modified); body is None on a 304
+    """
+    headers = {}
+    if state:
+        if state.get("etag"):
+            headers["If-None-Match"] = state["etag"]
+        if state.get("last_modified"):
+            headers["If-Modified-Since"] = state["last_modified"]
+
+    async with session.get(feed_url, headers=headers) as response:
+        if response.status == 304:
+            return 304, None, response.headers.get("ETag"), response.headers.get("Last-Modified")
+        if response.status != 200:
+            logger.error(f"Failed to fetch {feed_url}: {response.status}")
+            raise FeedFetchError(feed_url, response.status)
+        body = await response.read()
+        return 200, body, response.headers.get("ETag"), response.headers.get("Last-Modified")
+
+async def fetch_and_parse_feed(session, source_url, state, stats, db_name="news_ingestion.db",
+                               entry_limit=None, executor=None):
+    """
+    Fetch one feed and parse it as soon as its body arrives.
+
+    Parsing runs on the parse executor, so it overlaps with the downloads of
+    other feeds that are still in flight.
+
+    Args:
+        session: aiohttp client session
+        source_url: URL of the feed
+        state: Stored fetch state for the feed
+        stats: Dict of per-run counts to update
+        db_name: Path to the database file (for the raw archive)
+        entry_limit: Only parse the first N entries (None for all)
+        executor: Parse executor from get_parse_executor(), or None for inline
+
+    Returns:
+        tuple: (entries, fetch_state). entries are compact entry dicts tagged
+        with rss_feed (empty if skipped); fetch_state is the (etag,
+        last_modified, content_hash) to save with update_feed_fetch_state
+        once the entries are stored, or None if nothing should be saved
+    """
+    start = time.perf_counter()
+    status, body, etag, last_modified = await fetch_feed(session, source_url, state)
+    fetch_seconds = time.perf_counter() - start
+    stats["fetched"] += 1
+    stats["fetch_seconds"] = stats.get("fetch_seconds", 0.0) + fetch_seconds
+    feed = {"feed_url": source_url, "status": status, "latency_ms": round(fetch_seconds * 1000, 1),
+            "bytes": len(body or b""), "entries": 0, "error": None}
+    stats.setdefault("feeds", []).append(feed)
+
+    # Server says nothing changed since our validators
+    if status == 304:
+        stats["not_modified"] += 1
+        return [], (etag, last_modified, None)
+
+    # Record the fetch; identical bodies share one compressed copy. Compressing
+    # and committing is blocking work, so it stays off the event loop
+    content_hash = hashlib.sha256(body).hexdigest()
+    if Config.RAW_ARCHIVE_ENABLED:
+        await asyncio.to_thread(archive_feed_body, source_url, body, content_hash, db_name)
+
+    # Server ignored the validators but sent the same document
+    if content_hash == (state or {}).get("content_hash"):
+        stats["unchanged"] += 1
+        return [], (etag, last_modified, None)
+
+    start = time.perf_counter()
+    try:
+        entries = await parse_in_executor(body, entry_limit, executor)
+    except FeedParseError as e:
+        logger.warning(f"Parsing error in RSS feed: {e}")
+        feed["error"] = f"parse error: {e}"
+        return [], None
+    finally:
+        stats["parse_seconds"] = stats.get("parse_seconds", 0.0) + time.perf_counter() - start
+    feed["entries"] = len(entries)
+
+    if not entries:
+        logger.warning(f"No entries found in feed: {source_url}")
+
+    for entry in entries:
+        entry["rss_feed"] = source_url  # Ensure the correct source is assigned to each entry
+    # Only remember the hash once the document parsed cleanly
+    return entries, (etag, last_modified, content_hash)
+
+async def fetch_rss(rss_sources, db_name="news_ingestion.db", stats=None, entry_limit=None, executor_kind=None,
+                    on_feed=None, conditional=True):
+    """
+    Fetch and parse RSS feeds, skipping feeds that have not changed.
+
+    Args:
+        rss_sources: List of feed URLs
+        db_name: Path to the database holding per-feed fetch state
+        stats: Optional dict that receives per-run counts ('fetched',
+            'not_modified', 'unchanged', 'failed'), busy seconds
+            ('fetch_seconds', 'parse_seconds') and per-feed outcomes ('feeds')
+        entry_limit: Only parse the first N entries of each feed (None for all)
+        executor_kind: 'inline', 'thread' or 'process' (defaults to Config.PARSE_EXECUTOR)
+        on_feed: Optional coroutine function called with (source_url, entries)
+            as soon as each feed is parsed; its entries are then not returned.
+            It should return once the entries are stored and raise if they
+            could not be, since the feed's validators are saved after it
+        conditional: Skip feeds that have not changed since the last fetch
+            (backfills turn this off to read every document in full)
+
+    Returns:
+        list: Entries from every changed feed, or None on error
+    """
+    if stats is None:
+        stats = {}
+    stats.update({"fetched": 0, "not_modified": 0, "unchanged": 0, "failed": 0,
+                  "fetch_seconds": 0.0, "parse_seconds": 0.0, "feeds": []})
+
     try:
         fetched_data = []
+        fetch_states = get_feed_fetch_states(db_name) if conditional else {}
+        executor = get_parse_executor(executor_kind)
 
-        async with aiohttp.ClientSession() as session:
-            tasks = [fetch_feed(session, url) for url in rss_sources]
-            responses = await asyncio.gather(*tasks)
+        session = await get_session()
 
-        for response, source_url in zip(responses, rss_sources):
-            feed = feedparser.parse(response)
-            if feed.bozo:
-                logger.warning(f"Parsing error in RSS feed: {feed.bozo_exception}")
-                continue
+        async def fetch_one(url):
+            entries, fetch_state = await fetch_and_parse_feed(session, url, fetch_states.get(url), stats,
+                                                              db_name, entry_limit, executor)
+            if on_feed is not None:
+                await on_feed(url, entries)
+            # Saved only once on_feed has handled the entries, so a feed whose
+            # articles failed to store is fetched and parsed again next time
+            if fetch_state is not None:
+                await asyncio.to_thread(update_feed_fetch_state, url, *fetch_state, db_name=db_name)
+            # Learn the feed's publish rate and schedule its next poll
+            await asyncio.to_thread(record_poll, url, entries, db_name)
+            return [] if on_feed is not None else entries
 
-            if not feed.entries:
-                logger.warning(f"No entries found in feed: {source_url}")
-                continue
+        results = await asyncio.gather(*(fetch_one(url) for url in rss_sources), return_exceptions=True)
 
-            for entry in feed.entries:
-                entry["rss_feed"] = source_url  # Ensure the correct source is assigned to each entry
+        for result, source_url in zip(results, rss_sources):
+            # A failed feed is reported and skipped; the others carry on
+            if isinstance(result, Exception):
+                stats["failed"] += 1
+                stats["feeds"].append({"feed_url": source_url, "error": repr(result)})
+                logger.error(f"Giving up on {source_url}: {result!r}")
+                # Back off instead of retrying every tick
+                await asyncio.to_thread(record_poll, source_url, [], db_name)
+                continue
 
-            fetched_data.extend(feed.entries)  # Add entries directly to the main list
+            fetched_data.extend(result)  # Add entries directly to the main list
 
+        logger.info(
+            f"Fetched {stats['fetched']} feeds: {stats['not_modified']} not modified (304), "
+            f"{stats['unchanged']} unchanged (same hash), {stats['failed']} failed"
+        )
         logger.info("Successfully fetched data from the RSS feed.")
         return fetched_data
     except Exception as e:
@@ -0,0 +1,94 @@
+"""
+Module: parse_executor.py
+Purpose: Run CPU-bound feed parsing inline, in a thread pool or in a process pool
+"""
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from config.settings import Config
+from ingestion.stream_parser import parse_feed_document
+
+# Logger initialization
+logger = logging.getLogger(__name__)
+
+# Fields kept from each entry; everything else stays in the worker
+ENTRY_FIELDS = ("id", "title", "link", "summary", "description", "published", "pubDate", "updated")
+
+# Shared executor, created on first use
+_executor = None
+_executor_kind = None
+
+def parse_document(body, limit=None):
+    """
+    Parse a feed document into compact, picklable entry dicts.
+
+    This is the function shipped to pool workers, so it only returns plain
+    dicts of strings rather than FeedParserDict objects.
+
+    Args:
+        body: Feed document as bytes
+        limit: Maximum number of entries to return (None for all)
+
+    Returns:
+        list: Entry dicts containing only ENTRY_FIELDS
+    """
+    entries = parse_feed_document(body, limit=limit)
+    return [
+        {field: str(entry[field]) for field in ENTRY_FIELDS if entry.get(field) is not None}
+        for entry in entries
+    ]
+
+def get_parse_executor(kind=None):
+    """
+    Get the shared parse executor.
+
+    Args:
+        kind: 'inline', 'thread' or 'process' (defaults to Config.PARSE_EXECUTOR)
+
+    Returns:
+        Executor, or None when parsing runs inline on the event loop
+    """
+    global _executor, _executor_kind
+    kind = kind or Config.PARSE_EXECUTOR
+
+    if kind == "inline":
+        return None
+    if _executor is not None and _executor_kind == kind:
+        return _executor
+
+    shutdown_parse_executor()
+    if kind == "thread":
+        _executor = ThreadPoolExecutor(max_workers=Config.PARSE_WORKERS, thread_name_prefix="feed-parse")
+    elif kind == "process":
+        _executor = ProcessPoolExecutor(max_workers=Config.PARSE_WORKERS)
+    else:
+        raise ValueError(f"Unknown parse executor: {kind}")
+
+    _executor_kind = kind
+    logger.info(f"Started {kind} parse executor with {Config.PARSE_WORKERS} workers")
+    return _executor
+
+def shutdown_parse_executor():
+    """Shut down the shared parse executor, if one was started."""
+    global _executor, _executor_kind
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+    _executor = None
+    _executor_kind = None
+
+async def parse_in_executor(body, limit=None, executor=None):
+    """
+    Parse a feed document without blocking the event loop (unless inline).
+
+    Args:
+        body: Feed document as bytes
+        limit: Maximum number of entries to return (None for all)
+        executor: Executor from get_parse_executor(), or None for inline
+
+    Returns:
+        list: Compact entry dicts
+    """
+    if executor is None:
+        return parse_document(body, limit)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, parse_document, body, limit)
@@ -0,0 +1,155 @@
+"""
+Module: stream_parser.py
+Purpose: Incrementally parse RSS/Atom documents, stopping after the first N entries
+"""
+import logging
+import xml.etree.ElementTree as ET
+import feedparser
+from config.settings import Config
+
+# Logger initialization
+logger = logging.getLogger(__name__)
+
+# Bytes handed to the pull parser at a time
+CHUNK_SIZE = 16 * 1024
+
+# Element names (without namespace) that hold an entry and its fields
+ENTRY_TAGS = {"item", "entry"}
+SUMMARY_TAGS = ("description", "summary", "encoded", "content")
+DATE_TAGS = ("pubDate", "published", "updated", "date")
+
+class FeedParseError(Exception):
+    """Raised when a feed document cannot be parsed by either parser."""
+    pass
+
+def _local_name(tag):
+    """Strip the namespace from an ElementTree tag."""
+    return tag.rsplit("}", 1)[-1] if "}" in tag else tag
+
+def _element_text(element):
+    """Return all text inside an element, including nested markup."""
+    return "".join(element.itertext()).strip()
+
+def _entry_from_element(element):
+    """
+    Convert an <item> or <entry> element into a feedparser-style dict.
+
+    Args:
+        element: ElementTree element for the entry
+
+    Returns:
+        dict: Entry with id, title, link, summary and published keys where present
+    """
+    children = {}
+    link = None
+    for child in element:
+        name = _local_name(child.tag)
+        if name == "link":
+            # Atom links carry the URL in href; prefer the alternate link
+            href = child.get("href")
+            if href:
+                if link is None or child.get("rel", "alternate") == "alternate":
+                    link = href
+            elif link is None:
+                link = _element_text(child)
+            continue
+        # Keep the first occurrence of each field, like feedparser does
+        children.setdefault(name, child)
+
+    entry = {}
+    # RSS <guid> or Atom <id>, which feedparser also reports as id
+    for name in ("guid", "id"):
+        if name in children:
+            entry["id"] = _element_text(children[name])
+            break
+    if "title" in children:
+        entry["title"] = _element_text(children["title"])
+    if link:
+        entry["link"] = link
+    for name in SUMMARY_TAGS:
+        if name in children:
+            entry["summary"] = _element_text(children[name])
+            break
+    for name in DATE_TAGS:
+        if name in children:
+            entry["published"] = _element_text(children[name])
+            break
+    return entry
+
+def iter_entries(body, limit=None):
+    """
+    Parse entries from an RSS or Atom document, stopping after `limit` entries.
+
+    The document is fed to a pull parser in chunks, so the rest of the body is
+    never parsed once enough entries have been read.
+
+    Args:
+        body: Feed document as bytes or str
+        limit: Maximum number of entries to return (None for all)
+
+    Returns:
+        list: Entry dicts
+
+    Raises:
+        xml.etree.ElementTree.ParseError: If the document is not well-formed XML
+        ValueError: If the document is not an RSS or Atom feed
+    """
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+
+    parser = ET.XMLPullParser(events=("start", "end"))
+    entries = []
+    root_checked = False
+
+    for offset in range(0, len(body), CHUNK_SIZE):
+        parser.feed(body[offset:offset + CHUNK_SIZE])
+        for event, element in parser.read_events():
+            if event == "start":
+                if not root_checked:
+                    if _local_name(element.tag) not in ("rss", "feed", "RDF"):
+                        raise ValueError(f"Not a feed document: <{_local_name(element.tag)}>")
+                    root_checked = True
+                continue
+
+            if _local_name(element.tag) in ENTRY_TAGS:
+                entries.append(_entry_from_element(element))
+                element.clear()  # Release the parsed subtree
+                if limit is not None and len(entries) >= limit:
+                    return entries
+
+    parser.close()
+    return entries
+
+def parse_feed_document(body, limit=None, mode=None):
+    """
+    Parse a feed document into entries, using the streaming parser when possible.
+
+    Falls back to feedparser for malformed documents, which it handles more
+    leniently (undeclared HTML entities, unsupported encodings, broken markup).
+
+    Args:
+        body: Feed document as bytes or str
+        limit: Maximum number of entries to return (None for all)
+        mode: 'stream' or 'feedparser' (defaults to Config.FEED_PARSER_MODE)
+
+    Returns:
+        list: Entry dicts
+
+    Raises:
+        FeedParseError: If neither parser can read any entries from the document
+    """
+    mode = mode or Config.FEED_PARSER_MODE
+
+    if mode == "stream":
+        try:
+            return iter_entries(body, limit)
+        except (ET.ParseError, ValueError) as e:
+            logger.info(f"Streaming parse failed ({e}), falling back to feedparser")
+
+    feed = feedparser.parse(body)
+    if feed.bozo:
+        # feedparser's loose parser often recovers entries from broken markup
+        if not feed.entries:
+            raise FeedParseError(str(feed.bozo_exception))  # str() keeps it picklable
+        logger.warning(f"Recovered {len(feed.entries)} entries from malformed feed: {feed.bozo_exception}")
+    return feed.entries if limit is None else feed.entries[:limit]
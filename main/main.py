@@ -15,7 +15,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from db.database import setup_database, get_rss_sources
 from ingestion.fetch_rss import fetch_rss
 from parsing.parse_data import parse_feed, store_parsed_articles
-from enrichment.llm_enrichment import AnthropicEnricher, enrich_articles
+from enrichment.llm_enrichment import create_enricher, enrich_articles
 import frontend.app as app_module  # Ensure this import is present
 from pipeline.rss_manager import refresh_rss_feeds  # Import the refresh function from rss_manager
 
@@ -31,22 +31,34 @@ async def run_flask_app():
     app = app_module.create_app()  # Ensure app_module is defined
     await serve(app, config)
 
-async def main():
+async def main(sources=None, enrich=True, setup=True):
+    """
+    Set up the database and refresh feeds.
+
+    Args:
+        sources: Feed URLs to refresh (defaults to every active source)
+        enrich: Drain the enrichment queue after storing; False when
+            separate enrichment workers are running
+        setup: Create or migrate the database first; False when the caller
+            already did so at startup
+    """
     logger.info("########################## Starting the main function... ##########################")
     try:
         # Setup database if needed
-        setup_database()
+        if setup:
+            setup_database()
 
-        # Initialize the enricher
-        api_key = os.getenv("ANTHROPIC_API_KEY")
-        if not api_key:
-            logger.error("ANTHROPIC_API_KEY not found in environment variables")
-            return
-            
-        enricher = AnthropicEnricher(api_key)
+        # Initialize the enricher selected by llm_provider
+        enricher = None
+        if enrich:
+            try:
+                enricher = create_enricher()
+            except ValueError as e:
+                logger.error(str(e))
+                return
 
         # Call the refresh_rss_feeds function from rss_manager
-        result_message = await refresh_rss_feeds(enricher)
+        result_message = await refresh_rss_feeds(enricher, rss_sources=sources)
         logger.info(result_message)
 
     except Exception as e:
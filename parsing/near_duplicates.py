@@ -0,0 +1,261 @@
+"""
+Module: near_duplicates.py
+Purpose: Detect the same story arriving from different sources using SimHash
+
+Each article gets a 64-bit SimHash of its title and description. Stories
+within MAX_DISTANCE bits of an already stored article are linked to it as
+their canonical article and are not enriched again. Lookups go through the
+article_fingerprints table, which stores each fingerprint split into
+BANDS 16-bit bands: any two fingerprints within MAX_DISTANCE bits must share
+at least one band exactly, so only a handful of rows are ever compared.
+"""
+import hashlib
+import logging
+import re
+import sqlite3
+import time
+from db.connection import connect
+
+logger = logging.getLogger(__name__)
+
+HASH_BITS = 64
+BANDS = 4
+BAND_BITS = HASH_BITS // BANDS
+MAX_DISTANCE = 3  # Must stay below BANDS for the band lookup to be exhaustive
+
+# Only link to stories stored within this window
+WINDOW_DAYS = 3
+
+TAG_PATTERN = re.compile(r"<[^>]+>")
+WORD_PATTERN = re.compile(r"\w+")
+
+def _features(text):
+    """Lowercased words and word bigrams, with HTML tags removed."""
+    words = WORD_PATTERN.findall(TAG_PATTERN.sub(" ", text or "").lower())
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+def _feature_hash(feature):
+    return int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+
+def simhash(text):
+    """
+    Compute the 64-bit SimHash of a piece of text.
+
+    Returns:
+        int: Unsigned fingerprint, or None if the text has no words
+    """
+    features = _features(text)
+    if not features:
+        return None
+
+    weights = [0] * HASH_BITS
+    for feature in features:
+        value = _feature_hash(feature)
+        for bit in range(HASH_BITS):
+            weights[bit] += 1 if value >> bit & 1 else -1
+
+    return sum(1 << bit for bit, weight in enumerate(weights) if weight > 0)
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count("1")
+
+def to_signed(value):
+    """Convert an unsigned 64-bit fingerprint to SQLite's signed INTEGER range."""
+    return value - (1 << HASH_BITS) if value >= 1 << (HASH_BITS - 1) else value
+
+def to_unsigned(value):
+    return value + (1 << HASH_BITS) if value < 0 else value
+
+def bands(fingerprint):
+    """Split a fingerprint into (band_number, band_value) pairs."""
+    mask = (1 << BAND_BITS) - 1
+    return [(band, fingerprint >> (band * BAND_BITS) & mask) for band in range(BANDS)]
+
+def article_fingerprint(article):
+    """SimHash of an article's title and description."""
+    return simhash(f"{article.get('title') or ''} {article.get('description') or ''}")
+
+def find_canonical(cursor, fingerprint, since_ts=None):
+    """
+    Find the stored canonical article closest to a fingerprint.
+
+    Args:
+        cursor: Open database cursor
+        fingerprint: Unsigned SimHash
+        since_ts: Ignore articles published before this UTC epoch
+
+    Returns:
+        tuple: (id, keywords, importance, derived_summary) of the canonical
+            article, or None if nothing is within MAX_DISTANCE
+    """
+    band_pairs = bands(fingerprint)
+    conditions = " OR ".join("(f.band = ? AND f.band_value = ?)" for _ in band_pairs)
+    params = [value for pair in band_pairs for value in pair]
+
+    cursor.execute(f'''
+        SELECT DISTINCT f.article_id, f.simhash
+        FROM article_fingerprints f
+        JOIN parsed_articles p ON p.id = f.article_id
+        WHERE ({conditions}) AND (p.published_ts IS NULL OR p.published_ts >= ?)
+    ''', (*params, since_ts or 0))
+
+    best = None
+    for article_id, stored in cursor.fetchall():
+        distance = hamming_distance(fingerprint, to_unsigned(stored))
+        if distance <= MAX_DISTANCE and (best is None or distance < best[1]):
+            best = (article_id, distance)
+    if best is None:
+        return None
+
+    # Resolve to the canonical article in case the match is itself a duplicate
+    cursor.execute('''
+        SELECT p.id, p.keywords, p.importance, p.derived_summary
+        FROM parsed_articles p
+        WHERE p.id = (SELECT COALESCE(canonical_id, id) FROM parsed_articles WHERE id = ?)
+    ''', (best[0],))
+    return cursor.fetchone()
+
+def _link(article, canonical_id, keywords, importance, summary):
+    """Point an article at its canonical story and inherit any enrichment it has."""
+    article["canonical_id"] = canonical_id
+    if keywords:
+        article["keywords"] = keywords
+        article["importance"] = importance
+        article["derived_summary"] = summary
+
+def mark_near_duplicates(articles, db_name="news_ingestion.db"):
+    """
+    Fingerprint articles and link near-duplicates to their canonical article.
+
+    Duplicates get 'canonical_id' set and inherit the canonical article's
+    enrichment, so enrich_articles can skip them.
+
+    Args:
+        articles: Parsed article dicts (updated in place)
+        db_name: Path to the database file
+
+    Returns:
+        int: Number of articles marked as duplicates
+    """
+    since_ts = int(time.time()) - WINDOW_DAYS * 24 * 3600
+    duplicates = 0
+    try:
+        with connect(db_name) as conn:
+            cursor = conn.cursor()
+            for article in articles:
+                fingerprint = article_fingerprint(article)
+                article["simhash"] = fingerprint
+                if fingerprint is None:
+                    continue
+
+                canonical = find_canonical(cursor, fingerprint, since_ts)
+                if canonical is None:
+                    continue
+
+                _link(article, *canonical)
+                duplicates += 1
+    except sqlite3.Error as e:
+        logger.error(f"Error checking for near-duplicates: {e}")
+
+    if duplicates:
+        logger.info(f"Linked {duplicates} near-duplicate articles to existing stories.")
+    return duplicates
+
+def index_fingerprint(cursor, article_id, fingerprint):
+    """Add a canonical article's fingerprint bands to the lookup index."""
+    signed = to_signed(fingerprint)
+    cursor.executemany('''
+        INSERT OR IGNORE INTO article_fingerprints (band, band_value, article_id, simhash)
+        VALUES (?, ?, ?, ?)
+    ''', [(band, value, article_id, signed) for band, value in bands(fingerprint)])
+
+def settle_new_duplicates(cursor, article_ids):
+    """
+    Resolve freshly stored near-duplicates whose canonical already finished.
+
+    A duplicate is stored 'pending' to inherit its canonical's enrichment
+    when that completes. If the canonical completed (or was dead-lettered)
+    between the duplicate's parse and its store, that hand-off has already
+    happened, so the result is copied here instead. Duplicates whose
+    canonical has since been archived are returned so they can be
+    enriched on their own. Must run in the storing write transaction.
+
+    Args:
+        cursor: Cursor inside the transaction that stored the articles
+        article_ids: ids of newly stored articles with a canonical_id (retention
+            also passes the repeats of the stories it archives)
+
+    Returns:
+        list: ids that still need an enrichment job of their own
+    """
+    cursor.executemany('''
+        UPDATE parsed_articles
+        SET keywords = c.keywords, importance = c.importance, derived_summary = c.derived_summary,
+            enrichment_status = c.enrichment_status
+        FROM parsed_articles AS c
+        WHERE parsed_articles.id = ? AND c.id = parsed_articles.canonical_id
+        AND parsed_articles.enrichment_status = 'pending' AND c.enrichment_status != 'pending'
+    ''', [(article_id,) for article_id in article_ids])
+
+    orphaned = []
+    for article_id in article_ids:
+        cursor.execute('''
+            SELECT 1 FROM parsed_articles d
+            WHERE d.id = ? AND d.enrichment_status = 'pending'
+            AND NOT EXISTS (SELECT 1 FROM parsed_articles c WHERE c.id = d.canonical_id)
+        ''', (article_id,))
+        if cursor.fetchone():
+            orphaned.append(article_id)
+    return orphaned
+
+def _closest_in_batch(batch_index, fingerprint):
+    """Closest article within MAX_DISTANCE in an in-memory band index, or None."""
+    best = None
+    for pair in bands(fingerprint):
+        for article in batch_index.get(pair, ()):
+            distance = hamming_distance(fingerprint, article["simhash"])
+            if distance <= MAX_DISTANCE and (best is None or distance < best[1]):
+                best = (article, distance)
+    return best[0] if best else None
+
+def link_batch_duplicates(cursor, articles):
+    """
+    Link new articles to copies stored or batched since they were parsed.
+
+    Feeds are parsed concurrently and each is checked against the database
+    on its own, so the same story from two feeds in one refresh would miss
+    itself. Articles not yet linked are looked up again in the index as seen
+    by the storing transaction, then compared with the canonical articles
+    earlier in the same batch through an in-memory band index.
+
+    Args:
+        cursor: Cursor inside the transaction that stores the articles
+        articles: New article dicts with their 'simhash', in store order
+
+    Returns:
+        list: (duplicate, canonical) pairs of article dicts from the batch;
+            the canonical's id is only known once it has been inserted
+    """
+    since_ts = int(time.time()) - WINDOW_DAYS * 24 * 3600
+    batch_index = {}
+    pairs = []
+    for article in articles:
+        fingerprint = article.get("simhash")
+        if fingerprint is None or article.get("canonical_id"):
+            continue
+
+        canonical = find_canonical(cursor, fingerprint, since_ts)
+        if canonical is not None:
+            _link(article, *canonical)
+            continue
+
+        match = _closest_in_batch(batch_index, fingerprint)
+        if match is not None:
+            pairs.append((article, match))
+        elif article.get("published_ts") is None or article["published_ts"] >= since_ts:
+            for pair in bands(fingerprint):
+                batch_index.setdefault(pair, []).append(article)
+
+    if pairs:
+        logger.info(f"Linked {len(pairs)} near-duplicate articles to stories in the same batch.")
+    return pairs
@@ -2,14 +2,16 @@
 Module: parse_data.py
 Purpose: Extract and normalize fields (e.g., title, description, source).
 """
-import sqlite3
 import ast  # For safely evaluating serialized Python dictionaries
 import logging
-from datetime import datetime
+from datetime import datetime, timezone
 from dateutil.parser import parse as dateutil_parse  # Import dateutil parser
 import json  # Import the json module
 from db.database import initialize_database  # Import from centralized db module
+from db.connection import connect
 from enrichment.llm_enrichment import AnthropicEnricher, enrich_articles
+from parsing.near_duplicates import mark_near_duplicates, index_fingerprint, link_batch_duplicates, settle_new_duplicates, to_signed
+from enrichment.job_queue import enqueue_enrichments, job_priority
 import os
 import asyncio
 
@@ -31,13 +33,69 @@ def parse_date(date_str):
         logger.error(f"Error parsing date with strptime: {date_str}")
         return None  # Return None or handle as needed
 
-def get_existing_articles(db_name="news_ingestion.db"):
-    """Get existing article titles and sources from database"""
+def normalize_published_date(date_str):
+    """
+    Normalize a feed date string to UTC.
+
+    Naive dates are assumed to already be UTC.
+
+    Args:
+        date_str: Date string from the feed entry
+
+    Returns:
+        tuple: (ISO-8601 UTC string, integer epoch seconds), or (None, None) if unparseable
+    """
+    if not date_str:
+        return None, None
+    try:
+        parsed = parse_date(date_str)
+    except (OverflowError, TypeError):
+        parsed = None
+    if parsed is None:
+        return None, None
+
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    parsed = parsed.astimezone(timezone.utc)
+    return parsed.strftime("%Y-%m-%dT%H:%M:%SZ"), int(parsed.timestamp())
+
+# Keys per IN (...) query; stays well under SQLite's bound-parameter limit
+DEDUP_BATCH_SIZE = 500
+
+def get_existing_articles(keys, db_name="news_ingestion.db"):
+    """
+    Find which candidate articles are already stored.
+
+    Only the candidate keys are looked up, in batched IN queries served by the
+    UNIQUE(title, source) index, so the cost depends on the batch size rather
+    than on how many articles the table holds.
+
+    Args:
+        keys: Iterable of (title, source) pairs
+        db_name: Path to the database file
+
+    Returns:
+        set: The (title, source) pairs that already exist
+    """
+    titles_by_source = {}
+    for title, source in keys:
+        titles_by_source.setdefault(source, set()).add(title)
+
+    existing = set()
     try:
-        with sqlite3.connect(db_name) as conn:
+        with connect(db_name) as conn:
             cursor = conn.cursor()
-            cursor.execute('SELECT title, source FROM parsed_articles')
-            return {(title, source) for title, source in cursor.fetchall()}
+            for source, titles in titles_by_source.items():
+                titles = list(titles)
+                for start in range(0, len(titles), DEDUP_BATCH_SIZE):
+                    batch = titles[start:start + DEDUP_BATCH_SIZE]
+                    placeholders = ", ".join("?" * len(batch))
+                    cursor.execute(
+                        f'SELECT title FROM parsed_articles WHERE title IN ({placeholders}) AND source = ?',
+                        (*batch, source)
+                    )
+                    existing.update((title, source) for (title,) in cursor.fetchall())
+        return existing
     except Exception as e:
         logger.error(f"Error getting existing articles: {e}")
         return set()
@@ -49,90 +107,199 @@ def parse_feed(entries, rss_feed, limit=2, db_name="news_ingestion.db"):
         logger.error("No valid entries to parse.")
         return []
 
-    # Get existing articles
-    existing_articles = get_existing_articles(db_name)
+    # Look up only this batch's titles
+    candidates = [entry for entry in entries[:limit] if entry.get("title") and entry.get("link")]
+    existing_articles = get_existing_articles(
+        ((entry["title"], rss_feed) for entry in candidates), db_name
+    )
     
     # Filter out invalid entries and normalize fields
     articles = []
-    for entry in entries[:limit]:
-        if not entry.get("title") or not entry.get("link"):
-            continue
-            
+    seen_titles = set()
+    for entry in candidates:
         title = entry.get("title", "Untitled")
-        # Check if article already exists
-        if (title, rss_feed) in existing_articles:
+        # Check if article already exists, or repeats earlier in this batch
+        if (title, rss_feed) in existing_articles or title in seen_titles:
             logger.info(f"Skipping existing article")
             continue
+        seen_titles.add(title)
             
         articles.append({
             "title": title,
             "description": entry.get("summary") or entry.get("description", "No description available."),
             "link": entry.get("link"),
             "source": rss_feed,
-            "published_date": (
-                entry.get("pubDate") or entry.get("published", "Unknown Date")
-            ),
-            "parsed_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            "published_date": entry.get("pubDate") or entry.get("published"),
+            # UTC, like the column's CURRENT_TIMESTAMP default; retention compares it to a UTC cutoff
+            "parsed_at": datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
         })
 
-    # Format the published_date correctly for new articles
+    # Store dates as UTC; display formatting happens at render time
     for article in articles:
-        if article["published_date"] != "Unknown Date":
-            try:
-                # Check if the date string contains 'GMT'
-                if 'GMT' in article["published_date"]:
-                    article["published_date"] = datetime.strptime(article["published_date"], 
-                                                                "%a, %d %b %Y %H:%M:%S %Z").strftime("%d %b %Y %H:%M")
-                # Handle ISO format dates (e.g., 2024-12-12T23:05:14-05:00)
-                elif 'T' in article["published_date"]:
-                    iso_date = datetime.fromisoformat(article["published_date"])
-                    article["published_date"] = iso_date.strftime("%d %b %Y %H:%M")
-                else:
-                    # Handle the +0000 format
-                    article["published_date"] = datetime.strptime(article["published_date"], 
-                                                                "%a, %d %b %Y %H:%M:%S %z").strftime("%d %b %Y %H:%M")
-            except ValueError as e:
-                logger.error(f"Error parsing date: {e}")
-                article["published_date"] = "Unknown Date"
+        article["published_date"], article["published_ts"] = normalize_published_date(article["published_date"])
+
+    # Link stories already stored from another source
+    mark_near_duplicates(articles, db_name)
 
     logger.info(f"Successfully parsed {len(articles)} new articles.")
     return articles
 
-async def store_parsed_articles(articles, db_name="news_ingestion.db"):
-    """Store parsed articles in the database."""
+# Columns an incoming article replaces when they differ from the stored row
+CONTENT_COLUMNS = ("description", "link", "published_date", "published_ts")
+
+# Enrichment columns; only replaced when the incoming article carries a value
+ENRICHMENT_COLUMNS = ("keywords", "importance", "derived_summary")
+
+UPSERT_SQL = f'''
+    INSERT INTO parsed_articles
+    (title, description, source, link, published_date, published_ts, parsed_at,
+     keywords, importance, derived_summary, simhash, canonical_id, enrichment_status)
+    VALUES (?, ?, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP), ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(title, source) DO UPDATE SET
+        {", ".join(f"{column} = excluded.{column}" for column in CONTENT_COLUMNS)},
+        {", ".join(f"{column} = COALESCE(excluded.{column}, {column})" for column in ENRICHMENT_COLUMNS)},
+        enrichment_status = CASE WHEN excluded.keywords IS NOT NULL THEN 'done' ELSE enrichment_status END
+    WHERE {" OR ".join(f"{column} IS NOT excluded.{column}" for column in CONTENT_COLUMNS)}
+       OR {" OR ".join(f"(excluded.{column} IS NOT NULL AND {column} IS NOT excluded.{column})"
+                       for column in ENRICHMENT_COLUMNS)}
+'''
+
+def _stored_rows(cursor, keys):
+    """Stored id and comparable columns for (title, source) keys, in batched IN queries."""
+    titles_by_source = {}
+    for title, source in keys:
+        titles_by_source.setdefault(source, []).append(title)
+
+    rows = {}
+    columns = ", ".join(CONTENT_COLUMNS + ENRICHMENT_COLUMNS)
+    for source, titles in titles_by_source.items():
+        for start in range(0, len(titles), DEDUP_BATCH_SIZE):
+            batch = titles[start:start + DEDUP_BATCH_SIZE]
+            placeholders = ", ".join("?" * len(batch))
+            cursor.execute(
+                f'SELECT id, title, {columns} FROM parsed_articles WHERE title IN ({placeholders}) AND source = ?',
+                (*batch, source)
+            )
+            for row in cursor.fetchall():
+                rows[(row[1], source)] = {"id": row[0], **dict(zip(CONTENT_COLUMNS + ENRICHMENT_COLUMNS, row[2:]))}
+    return rows
+
+def _changed(article, stored):
+    """Whether an incoming article differs from its stored row."""
+    return (any(article.get(column) != stored[column] for column in CONTENT_COLUMNS)
+            or any(article.get(column) is not None and article.get(column) != stored[column]
+                   for column in ENRICHMENT_COLUMNS))
+
+async def store_parsed_articles(articles, db_name="news_ingestion.db", backfill=False):
+    """
+    Store parsed articles in the database.
+
+    Articles are upserted on (title, source) with one executemany, so a
+    stored article keeps its id: changed content columns are updated in
+    place, enrichment is only overwritten by a new result, and unchanged
+    articles are not written at all.
+
+    New articles that have not been enriched yet are stored with
+    enrichment_status 'pending' and, unless they are near-duplicates waiting
+    on their canonical story, queued in enrichment_jobs in the same
+    transaction. Backfilled articles are queued in the low-priority lane.
+    New articles are checked for near-duplicates again as they are stored,
+    against the index and the rest of the batch, since feeds parsed at the
+    same time cannot see each other's articles.
+
+    Returns:
+        dict: Counts of 'inserted', 'updated' and 'unchanged' articles
+
+    Raises:
+        Exception: Whatever failed the write; the transaction is rolled back,
+            so none of the batch is stored and callers must not treat it as done
+    """
+    counts = {"inserted": 0, "updated": 0, "unchanged": 0}
     if not articles:
         logger.warning("No articles to store.")
-        return
+        return counts
+
+    # The last copy of an article in the batch wins
+    by_key = {}
+    for article in articles:
+        if not article.get("title") or not article.get("source"):
+            logger.error(f"Skipping article without a title or source: {article.get('link')}")
+            continue
+        by_key[(article["title"], article["source"])] = article
 
     try:
-        with sqlite3.connect(db_name) as connection:
+        with connect(db_name) as connection:
             cursor = connection.cursor()
+            stored = _stored_rows(cursor, by_key)
+
+            new_keys, changed = [], []
+            for key, article in by_key.items():
+                if key not in stored:
+                    new_keys.append(key)
+                elif not _changed(article, stored[key]):
+                    counts["unchanged"] += 1
+                    continue
+                else:
+                    counts["updated"] += 1
+                changed.append(article)
+
+            # Catch copies of a story from feeds that were parsed at the same time
+            batch_links = link_batch_duplicates(cursor, [by_key[key] for key in new_keys])
+
+            writes = []
+            for article in changed:
+                writes.append((
+                    article["title"],
+                    article.get("description"),
+                    article["source"],
+                    article.get("link"),
+                    article.get("published_date"),
+                    article.get("published_ts"),
+                    article.get("parsed_at", None),
+                    article.get("keywords"),
+                    article.get("importance"),
+                    article.get("derived_summary"),
+                    to_signed(article["simhash"]) if article.get("simhash") is not None else None,
+                    article.get("canonical_id"),
+                    "pending" if article.get("keywords") is None else "done"
+                ))
+            cursor.executemany(UPSERT_SQL, writes)
+            counts["inserted"] = len(new_keys)
 
-            for article in articles:
-                try:
-                    cursor.execute('''
-                        INSERT OR REPLACE INTO parsed_articles 
-                        (title, description, source, link, published_date, parsed_at, 
-                         keywords, importance, derived_summary)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', (
-                        article.get("title"), 
-                        article.get("description"), 
-                        article.get("source"), 
-                        article.get("link"),
-                        article.get("published_date"), 
-                        article.get("parsed_at", None),
-                        article.get("keywords", "uncategorized"),
-                        article.get("importance", "low"),
-                        article.get("derived_summary")
-                    ))
-                    
-                except Exception as e:
-                    logger.error(f"Error storing article {article.get('title')}: {e}")
+            if new_keys:
+                new_ids = {key: row["id"] for key, row in _stored_rows(cursor, new_keys).items()}
+                for duplicate, canonical in batch_links:
+                    duplicate["canonical_id"] = new_ids[(canonical["title"], canonical["source"])]
+                cursor.executemany('UPDATE parsed_articles SET canonical_id = ? WHERE id = ?', [
+                    (duplicate["canonical_id"], new_ids[(duplicate["title"], duplicate["source"])])
+                    for duplicate, _ in batch_links
+                ])
+                cursor.execute('SELECT feed_url, priority FROM rss_sources WHERE priority != 0')
+                source_priorities = dict(cursor.fetchall())
+
+                # Duplicates whose canonical finished before they were stored
+                # take its result now; those whose canonical is gone need a job
+                waiting = [new_ids[key] for key in new_keys
+                           if by_key[key].get("canonical_id") and by_key[key].get("keywords") is None]
+                orphaned = set(settle_new_duplicates(cursor, waiting))
+
+                jobs = []
+                for key in new_keys:
+                    article, article_id = by_key[key], new_ids[key]
+                    if article.get("keywords") is None and (not article.get("canonical_id") or article_id in orphaned):
+                        priority = job_priority(article, source_priorities.get(article["source"], 0), backfill)
+                        jobs.append((article_id, priority))
+                    # Only canonical stories go into the near-duplicate index
+                    if article.get("simhash") is not None and not article.get("canonical_id"):
+                        index_fingerprint(cursor, article_id, article["simhash"])
+                enqueue_enrichments(cursor, jobs)
 
             connection.commit()
-            logger.info(f"Stored {len(articles)} articles.")
-            
+            logger.info(f"Stored {len(by_key)} articles: {counts['inserted']} new, "
+                        f"{counts['updated']} updated, {counts['unchanged']} unchanged.")
+            return counts
+
     except Exception as e:
         logger.error(f"Error in store_parsed_articles: {e}")
-        logger.exception("Full traceback:")
\ No newline at end of file
+        logger.exception("Full traceback:")
+        raise
@@ -0,0 +1,236 @@
+"""
+Module: backfill.py
+Purpose: Load a source's full backlog instead of the few newest entries a refresh takes
+
+A backfill reads each feed in full, bypassing conditional GET, keeps every
+entry or the configured window (backfill_entry_window entries, no older than
+backfill_max_age_days), and stores it in chunks of BACKFILL_COMMIT_SIZE:
+one bulk dedup lookup and one transaction per chunk. New articles are queued
+in the backfill lane of enrichment_jobs, so workers reach them only once
+live articles are done.
+
+After each committed chunk the key (guid, else link) of its last entry is
+saved in backfill_progress. An interrupted backfill resumes after that
+entry wherever it has moved to in the feed; if it has dropped out, the
+backfill starts over and already stored articles are deduplicated. Sources
+whose backfill finished are skipped unless restarted.
+
+    python pipeline/backfill.py                      # every source not yet backfilled
+    python pipeline/backfill.py --source URL --restart
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sqlite3
+import sys
+import time
+
+# Add project root to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from config.settings import Config
+from db.database import initialize_database, get_rss_sources, get_config_value
+from ingestion.fetch_rss import fetch_rss, close_session
+from parsing.parse_data import parse_feed, store_parsed_articles, normalize_published_date
+from pipeline.run_ledger import PipelineRun
+from db.connection import connect
+
+logger = logging.getLogger(__name__)
+
+def _config_int(key, db_name):
+    try:
+        return int(get_config_value(key, db_name) or 0)
+    except ValueError:
+        logger.warning(f"Invalid {key}; ignoring it")
+        return 0
+
+def backfill_window(entries, window=None, max_age_days=None):
+    """
+    Entries inside the backfill window, in feed order.
+
+    Args:
+        entries: Parsed feed entries
+        window: Keep at most this many entries (None or 0 for all)
+        max_age_days: Drop entries published longer ago than this (None or 0
+            for no limit); entries without a date are kept
+
+    Returns:
+        list: The entries to backfill
+    """
+    if max_age_days:
+        cutoff = time.time() - max_age_days * 86400
+        kept = []
+        for entry in entries:
+            _, published_ts = normalize_published_date(entry.get("pubDate") or entry.get("published"))
+            if published_ts is None or published_ts >= cutoff:
+                kept.append(entry)
+        entries = kept
+    return entries[:window] if window else entries
+
+def entry_key(entry):
+    """Stable identity of a feed entry: its guid, else its link, else its title."""
+    return entry.get("id") or entry.get("guid") or entry.get("link") or entry.get("title")
+
+def resume_position(entries, last_entry_key):
+    """
+    Index of the first entry after the last committed one.
+
+    Args:
+        entries: Entries in the backfill window
+        last_entry_key: entry_key of the last committed entry (None if none)
+
+    Returns:
+        int: Where to resume (0 when the entry is no longer in the feed)
+    """
+    if last_entry_key:
+        for position, entry in enumerate(entries):
+            if entry_key(entry) == last_entry_key:
+                return position + 1
+        logger.warning("Last backfilled entry is no longer in the feed; starting over")
+    return 0
+
+def get_backfill_progress(db_name="news_ingestion.db"):
+    """
+    Backfill checkpoints by feed URL.
+
+    Returns:
+        dict: feed_url -> row dict (status, entries_total, entries_done,
+            articles_stored, last_entry_key)
+    """
+    cursor = connect(db_name).cursor()
+    cursor.row_factory = sqlite3.Row
+    rows = cursor.execute('SELECT * FROM backfill_progress').fetchall()
+    return {row["feed_url"]: dict(row) for row in rows}
+
+def _save_progress(feed_url, status, entries_total, entries_done, stored, last_entry_key, db_name):
+    with connect(db_name) as conn:
+        conn.execute('''
+            INSERT INTO backfill_progress
+            (feed_url, status, entries_total, entries_done, articles_stored, last_entry_key)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(feed_url) DO UPDATE SET
+                status = excluded.status,
+                entries_total = excluded.entries_total,
+                entries_done = excluded.entries_done,
+                articles_stored = backfill_progress.articles_stored + excluded.articles_stored,
+                last_entry_key = excluded.last_entry_key,
+                updated_at = CURRENT_TIMESTAMP
+        ''', (feed_url, status, entries_total, entries_done, stored, last_entry_key))
+        conn.commit()
+
+def _reset_progress(feed_urls, db_name):
+    with connect(db_name) as conn:
+        conn.executemany('DELETE FROM backfill_progress WHERE feed_url = ?', [(url,) for url in feed_urls])
+        conn.commit()
+
+async def backfill_sources(rss_sources=None, db_name="news_ingestion.db", window=None, max_age_days=None,
+                           commit_size=None, fetcher=fetch_rss, restart=False):
+    """
+    Backfill sources, resuming any that were interrupted.
+
+    Args:
+        rss_sources: Feed URLs to backfill (defaults to every active source)
+        db_name: Path to the database file
+        window: Entries kept per source (defaults to backfill_entry_window; 0 for all)
+        max_age_days: Oldest entries kept (defaults to backfill_max_age_days; 0 for no limit)
+        commit_size: Articles per transaction and checkpoint (defaults to
+            Config.BACKFILL_COMMIT_SIZE)
+        fetcher: Coroutine with fetch_rss's signature, including on_feed and conditional
+        restart: Start finished or interrupted backfills over from the first entry
+
+    Returns:
+        dict: Counts of 'sources', 'entries' and 'articles_stored'
+    """
+    if rss_sources is None:
+        rss_sources = get_rss_sources(db_name)
+    if window is None:
+        window = _config_int("backfill_entry_window", db_name)
+    if max_age_days is None:
+        max_age_days = _config_int("backfill_max_age_days", db_name)
+    commit_size = commit_size or Config.BACKFILL_COMMIT_SIZE
+
+    if restart:
+        _reset_progress(rss_sources, db_name)
+    progress = get_backfill_progress(db_name)
+    pending = [url for url in rss_sources if progress.get(url, {}).get("status") != "done"]
+    counts = {"sources": len(pending), "entries": 0, "articles_stored": 0}
+    if not pending:
+        logger.info("No sources left to backfill.")
+        return counts
+
+    run = PipelineRun(db_name, "backfill").start(len(pending))
+    fetch_stats = {}
+    # One writer at a time keeps the large transactions from timing each other out
+    write_lock = asyncio.Lock()
+
+    async def on_feed(source, entries):
+        entries = backfill_window(entries, window, max_age_days)
+        done = resume_position(entries, progress.get(source, {}).get("last_entry_key"))
+        if done:
+            logger.info(f"Resuming backfill of {source} at entry {done} of {len(entries)}")
+        run.add("entries", len(entries) - done)
+
+        for offset in range(done, len(entries), commit_size):
+            chunk = entries[offset:offset + commit_size]
+            start = time.perf_counter()
+            articles = await asyncio.to_thread(parse_feed, chunk, source, len(chunk), db_name)
+            run.add_time("dedup", time.perf_counter() - start)
+            run.add("articles_parsed", len(articles))
+            run.add("duplicates", sum(1 for article in articles if article.get("canonical_id")))
+
+            async with write_lock:
+                start = time.perf_counter()
+                stored = await store_parsed_articles(articles, db_name=db_name, backfill=True)
+                run.add_time("store", time.perf_counter() - start)
+                run.add("articles_stored", stored["inserted"])
+                run.add("articles_updated", stored["updated"])
+                _save_progress(source, "running", len(entries), offset + len(chunk), stored["inserted"],
+                               entry_key(chunk[-1]), db_name)
+
+        _save_progress(source, "done", len(entries), len(entries), 0, None, db_name)
+        logger.info(f"Backfilled {source}: {len(entries)} entries")
+
+    try:
+        await fetcher(pending, db_name=db_name, stats=fetch_stats, entry_limit=None, on_feed=on_feed,
+                      conditional=False)
+        run.record_fetch(fetch_stats)
+        run.finish()
+    except Exception as e:
+        logger.error(f"Error during backfill: {e}")
+        run.record_fetch(fetch_stats)
+        run.finish("error", str(e))
+        raise
+
+    counts["entries"] = run.counters["entries"]
+    counts["articles_stored"] = run.counters["articles_stored"]
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill the full backlog of RSS sources")
+    parser.add_argument("--source", action="append", help="Feed URL to backfill (repeatable; default: all active)")
+    parser.add_argument("--window", type=int, default=None, help="Entries kept per source (0 = all)")
+    parser.add_argument("--max-age-days", type=int, default=None, help="Oldest entries kept, in days (0 = no limit)")
+    parser.add_argument("--commit-size", type=int, default=None, help="Articles per transaction")
+    parser.add_argument("--restart", action="store_true", help="Start over instead of resuming")
+    parser.add_argument("--db", default="news_ingestion.db", help="Database file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    initialize_database(args.db)
+
+    async def run():
+        try:
+            return await backfill_sources(
+                args.source, db_name=args.db, window=args.window, max_age_days=args.max_age_days,
+                commit_size=args.commit_size, restart=args.restart
+            )
+        finally:
+            await close_session()
+
+    for key, value in asyncio.run(run()).items():
+        print(f"{key}: {value}")
+
+if __name__ == "__main__":
+    main()
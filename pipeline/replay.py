@@ -0,0 +1,227 @@
+"""
+Module: replay.py
+Purpose: Drive refresh_rss_feeds from saved feed documents instead of the network
+
+Documents come from a directory of saved XML files or from the raw_feed
+archive. They are replayed in fetch order as a series of refresh cycles, so
+the same parse / enrich / store path runs without contacting any publisher.
+
+Usage:
+    python -m pipeline.replay --dir saved_feeds/ --db replay.db
+    python -m pipeline.replay --archive news_ingestion.db --db replay.db --speed 60
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+from datetime import datetime
+
+# Add project root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db.database import initialize_database
+from db.connection import connect
+from db.raw_archive import iter_archived_feeds
+from enrichment.llm_enrichment import create_enricher
+from ingestion.parse_executor import get_parse_executor, parse_in_executor
+from ingestion.stream_parser import FeedParseError
+from pipeline.rss_manager import refresh_rss_feeds
+
+logger = logging.getLogger(__name__)
+
+FEED_FILE_EXTENSIONS = (".xml", ".rss", ".atom")
+
+def load_directory_documents(path):
+    """
+    Load saved feed documents from a directory.
+
+    Each file is replayed as its own source (file:// URL), timed by its mtime.
+
+    Args:
+        path: Directory containing .xml/.rss/.atom files
+
+    Returns:
+        list: (source_url, fetched_at datetime, body bytes) tuples in mtime order
+    """
+    documents = []
+    for name in sorted(os.listdir(path)):
+        file_path = os.path.abspath(os.path.join(path, name))
+        if not name.lower().endswith(FEED_FILE_EXTENSIONS) or not os.path.isfile(file_path):
+            continue
+        with open(file_path, "rb") as f:
+            body = f.read()
+        documents.append((f"file://{file_path}", datetime.fromtimestamp(os.path.getmtime(file_path)), body))
+    documents.sort(key=lambda document: document[1])
+    return documents
+
+def load_archive_documents(archive_db, feed_url=None, since=None, latest_only=False):
+    """
+    Stream documents from the raw_feed archive, one decompressed body at a time.
+
+    Yields:
+        tuple: (feed_url, fetched_at datetime, body bytes) in fetch order
+    """
+    for url, fetched_at, body in iter_archived_feeds(feed_url, since, latest_only, db_name=archive_db):
+        yield url, datetime.strptime(fetched_at, "%Y-%m-%d %H:%M:%S"), body
+
+def split_into_cycles(documents):
+    """
+    Group documents into refresh cycles, starting a new cycle whenever a
+    feed repeats, so each cycle fetches every feed at most once.
+
+    Cycles are yielded as they fill, so only one cycle's bodies are held
+    in memory at a time.
+    """
+    current, seen = [], set()
+    for document in documents:
+        if document[0] in seen:
+            yield current
+            current, seen = [], set()
+        current.append(document)
+        seen.add(document[0])
+    if current:
+        yield current
+
+def make_replay_fetcher(documents, concurrency=4, executor_kind=None):
+    """
+    Build a fetcher with fetch_rss's signature that serves saved documents.
+
+    Args:
+        documents: (source_url, fetched_at, body) tuples for one cycle
+        concurrency: Documents parsed at the same time
+        executor_kind: Parse executor ('inline', 'thread' or 'process')
+
+    Returns:
+        Coroutine function usable as refresh_rss_feeds(fetcher=...)
+    """
+    bodies = {url: body for url, _, body in documents}
+
+    async def fetcher(rss_sources, db_name=None, stats=None, entry_limit=None, on_feed=None):
+        if stats is None:
+            stats = {}
+        stats.update({"fetched": 0, "not_modified": 0, "unchanged": 0, "failed": 0})
+        executor = get_parse_executor(executor_kind)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def parse_one(url):
+            async with semaphore:
+                try:
+                    entries = await parse_in_executor(bodies[url], entry_limit, executor)
+                except FeedParseError as e:
+                    logger.warning(f"Parsing error in replayed feed {url}: {e}")
+                    stats["failed"] += 1
+                    return []
+                stats["fetched"] += 1
+                for entry in entries:
+                    entry["rss_feed"] = url
+            if on_feed is not None:
+                await on_feed(url, entries)
+                return []
+            return entries
+
+        results = await asyncio.gather(*(parse_one(url) for url in rss_sources if url in bodies))
+        return [entry for entries in results for entry in entries]
+
+    return fetcher
+
+def _count_articles(db_name):
+    with connect(db_name) as conn:
+        return conn.execute("SELECT COUNT(*) FROM parsed_articles").fetchone()[0]
+
+async def replay(documents, enricher, db_name="news_ingestion.db", speed=None, concurrency=4,
+                 entry_limit=None, executor_kind=None):
+    """
+    Replay saved documents through refresh_rss_feeds.
+
+    Args:
+        documents: Iterable of (source_url, fetched_at, body) tuples in fetch
+            order; consumed lazily, one cycle at a time
+        enricher: LLM enrichment service instance, or None to only parse and
+            store (articles stay queued for enrichment)
+        db_name: Database the replayed articles are stored in
+        speed: Replay speed relative to the original fetch times (e.g. 60 = one
+            minute per second); None or 0 replays as fast as possible
+        concurrency: Documents parsed at the same time within a cycle
+        entry_limit: Entries taken per document (None for all)
+        executor_kind: Parse executor ('inline', 'thread' or 'process')
+
+    Returns:
+        dict: Throughput figures for the run
+    """
+    initialize_database(db_name)
+    articles_before = _count_articles(db_name)
+
+    start = time.perf_counter()
+    previous_time = None
+    document_count = cycle_count = total_bytes = 0
+    for cycle in split_into_cycles(documents):
+        cycle_count += 1
+        document_count += len(cycle)
+        total_bytes += sum(len(body) for _, _, body in cycle)
+        if speed and previous_time is not None:
+            delay = (cycle[0][1] - previous_time).total_seconds() / speed
+            if delay > 0:
+                await asyncio.sleep(delay)
+        previous_time = cycle[0][1]
+
+        fetcher = make_replay_fetcher(cycle, concurrency, executor_kind)
+        message = await refresh_rss_feeds(
+            enricher, rss_sources=[url for url, _, _ in cycle], fetcher=fetcher,
+            db_name=db_name, entry_limit=entry_limit, trigger="replay"
+        )
+        logger.info(message)
+    elapsed = time.perf_counter() - start
+
+    stored = _count_articles(db_name) - articles_before
+    return {
+        "documents": document_count,
+        "cycles": cycle_count,
+        "bytes": total_bytes,
+        "articles_stored": stored,
+        "elapsed_seconds": round(elapsed, 3),
+        "documents_per_second": round(document_count / elapsed, 1) if elapsed else None,
+        "megabytes_per_second": round(total_bytes / elapsed / 1e6, 2) if elapsed else None,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay saved feeds through the ingestion pipeline")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--dir", help="Directory of saved feed documents")
+    source.add_argument("--archive", help="Database whose raw_feed archive should be replayed")
+    parser.add_argument("--db", default="replay.db", help="Database to store replayed articles in")
+    parser.add_argument("--feed", help="Only replay this feed URL from the archive")
+    parser.add_argument("--since", help="Only replay archived fetches since 'YYYY-MM-DD HH:MM:SS'")
+    parser.add_argument("--latest", action="store_true", help="Only replay the latest archived fetch per feed")
+    parser.add_argument("--speed", type=float, default=0, help="Speed relative to original fetch times (0 = unthrottled)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Documents parsed at once")
+    parser.add_argument("--limit", type=int, default=None, help="Entries taken per document (default: all)")
+    parser.add_argument("--executor", choices=["inline", "thread", "process"], help="Parse executor")
+    parser.add_argument("--enricher", choices=["none", "local", "anthropic"], default="none",
+                        help="Enrichment to run on replayed articles")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    if args.dir:
+        documents = load_directory_documents(args.dir)
+    else:
+        documents = load_archive_documents(args.archive, args.feed, args.since, args.latest)
+
+    enricher = None
+    if args.enricher != "none":
+        try:
+            enricher = create_enricher(args.enricher, db_name=args.db)
+        except ValueError as e:
+            sys.exit(str(e))
+
+    results = asyncio.run(replay(
+        documents, enricher, db_name=args.db, speed=args.speed, concurrency=args.concurrency,
+        entry_limit=args.limit, executor_kind=args.executor
+    ))
+    for key, value in results.items():
+        print(f"{key}: {value}")
+
+if __name__ == "__main__":
+    main()
@@ -1,45 +1,193 @@
 import asyncio
 import logging
+import time
+from config.settings import Config
 from ingestion.fetch_rss import fetch_rss
 from parsing.parse_data import parse_feed, store_parsed_articles
-from enrichment.llm_enrichment import enrich_articles, AnthropicEnricher
-from db.database import get_rss_sources
+from enrichment.job_queue import run_enrichment_workers
+from db.database import get_rss_sources, get_config_value
+from pipeline.run_ledger import PipelineRun
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
-async def refresh_rss_feeds(enricher):
-    """Fetch, parse, enrich, and store RSS feeds."""
+# Entries taken from each source per refresh when article_fetch_limit is unset
+ENTRY_LIMIT = 2
+
+# Default entry_limit: read article_fetch_limit from app_config
+CONFIGURED_LIMIT = object()
+
+# How often enrichment workers check for newly stored articles during a refresh
+ENRICH_POLL_SECONDS = 0.05
+
+def configured_entry_limit(db_name="news_ingestion.db"):
+    """Entries taken per source per refresh, from article_fetch_limit (0 means all)."""
+    try:
+        limit = int(get_config_value("article_fetch_limit", db_name) or ENTRY_LIMIT)
+    except ValueError:
+        logger.warning("Invalid article_fetch_limit; using the default")
+        return ENTRY_LIMIT
+    return limit if limit > 0 else None
+
+async def refresh_rss_feeds(enricher, rss_sources=None, fetcher=fetch_rss, db_name="news_ingestion.db",
+                            entry_limit=CONFIGURED_LIMIT, trigger="refresh"):
+    """
+    Fetch, parse, and store RSS feeds while enriching what has been stored.
+
+    The refresh runs as streaming stages joined by bounded queues:
+
+        fetch + parse  ->  dedup  ->  store (micro-batches)  ->  enrichment_jobs
+                                                                     |
+                                                            enrichment workers
+
+    Each feed moves on as soon as it is parsed, so a slow feed only delays
+    itself, and a full queue makes the stage before it wait. New articles
+    are stored as pending and queued in enrichment_jobs; the workers drain
+    that queue alongside ingestion, so a slow LLM never holds back storage
+    and a crash leaves the work queued for next time.
+
+    Args:
+        enricher: LLM enrichment service instance, or None when separate
+            workers drain the enrichment queue
+        rss_sources: Feed URLs to refresh (defaults to every active source)
+        fetcher: Coroutine with fetch_rss's signature, including on_feed
+            (replay swaps in one that reads saved documents)
+        db_name: Path to the database file
+        entry_limit: Entries taken from each source (None for all; defaults to
+            the article_fetch_limit setting)
+        trigger: Recorded in pipeline_runs as what started the run
+    """
     logger.info("Starting the RSS feed refresh process.")
+    run = PipelineRun(db_name, trigger)
     try:
         # Fetch RSS sources from the database
-        rss_sources = get_rss_sources()
+        if rss_sources is None:
+            rss_sources = get_rss_sources(db_name)
         if not rss_sources:
             logger.warning("No active RSS sources found.")
             return "No active RSS sources found."
+        run.start(len(rss_sources))
+        if entry_limit is CONFIGURED_LIMIT:
+            entry_limit = configured_entry_limit(db_name)
 
-        # Fetch RSS data
-        logger.info("Fetching RSS data from sources.")
-        entries = await fetch_rss(rss_sources)
-        if entries:
-            logger.info(f"Fetched {len(entries)} entries from RSS sources.")
+        fetch_stats = {}
+        parsed_queue = asyncio.Queue(maxsize=Config.PIPELINE_QUEUE_SIZE)
+        store_queue = asyncio.Queue(maxsize=Config.PIPELINE_QUEUE_SIZE)
+        stored_all = asyncio.Event()
 
-            # Group entries by source
-            source_entries = {source: [] for source in rss_sources}
-            for entry in entries:
-                source_entries[entry["rss_feed"]].append(entry)
+        async def on_feed(source, entries):
+            # Waits until the feed's articles are stored (or raises if they
+            # were not), so fetch_rss only then saves the feed's validators
+            if entries:
+                run.add("entries", len(entries))
+                stored = asyncio.get_running_loop().create_future()
+                await parsed_queue.put((source, entries, stored))
+                await stored
 
-            # Process each source's entries
-            for source, entries in source_entries.items():
+        async def fetch_stage():
+            logger.info("Fetching RSS data from sources.")
+            try:
+                await fetcher(rss_sources, db_name=db_name, stats=fetch_stats, entry_limit=entry_limit,
+                              on_feed=on_feed)
+            finally:
+                run.record_fetch(fetch_stats)
+            # Not sent if a stage failed: every stage is cancelled then, and a
+            # full queue would block the put
+            await parsed_queue.put(None)
+
+        async def dedup_stage():
+            while (item := await parsed_queue.get()) is not None:
+                source, entries, stored = item
                 logger.info(f"Processing entries for source: {source}")
-                articles = parse_feed(entries, source, limit=2)
-                enriched_articles = await enrich_articles(articles, enricher)
-                await store_parsed_articles(enriched_articles)
-
-            return "Feeds refreshed and new stories ingested successfully."
-        else:
-            logger.info("No new entries found in the RSS feeds.")
-            return "No new entries found in the RSS feeds."
+                start = time.perf_counter()
+                try:
+                    # Dedup lookups hit the database, so keep them off the event loop
+                    articles = await asyncio.to_thread(parse_feed, entries, source, entry_limit, db_name)
+                except Exception as e:
+                    logger.error(f"Error parsing entries for {source}: {e}")
+                    stored.set_exception(e)
+                    continue
+                finally:
+                    run.add_time("dedup", time.perf_counter() - start)
+                run.add("articles_parsed", len(articles))
+                run.add("duplicates", sum(1 for article in articles if article.get("canonical_id")))
+                if articles:
+                    await store_queue.put((articles, stored))
+                else:
+                    stored.set_result(None)
+            await store_queue.put(None)
+
+        async def store_stage():
+            batch, waiting = [], []
+
+            async def flush():
+                if batch:
+                    start = time.perf_counter()
+                    try:
+                        counts = await store_parsed_articles(list(batch), db_name=db_name)
+                    except Exception as e:
+                        for stored in waiting:
+                            stored.set_exception(e)
+                        raise
+                    run.add_time("store", time.perf_counter() - start)
+                    run.add("articles_stored", counts["inserted"])
+                    run.add("articles_updated", counts["updated"])
+                    for stored in waiting:
+                        stored.set_result(None)
+                    batch.clear()
+                    waiting.clear()
+
+            try:
+                while True:
+                    try:
+                        # Flush a partial batch if nothing more arrives for a moment
+                        timeout = Config.STORE_FLUSH_SECONDS if batch else None
+                        item = await asyncio.wait_for(store_queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        await flush()
+                        continue
+                    if item is None:
+                        break
+                    articles, stored = item
+                    batch.extend(articles)
+                    waiting.append(stored)
+                    if len(batch) >= Config.STORE_BATCH_SIZE:
+                        await flush()
+                await flush()
+            finally:
+                stored_all.set()
+
+        async def enrich_stage():
+            # Also picks up jobs left over from earlier runs
+            run.record_enrichment(await run_enrichment_workers(
+                enricher, db_name, stop_event=stored_all, idle_seconds=ENRICH_POLL_SECONDS
+            ))
+
+        stages = [fetch_stage(), dedup_stage(), store_stage()]
+        if enricher is not None:
+            stages.append(enrich_stage())
+        tasks = [asyncio.create_task(stage) for stage in stages]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            # A failed stage leaves its neighbours blocked on a queue; stop them
+            # (and the enrichment workers) rather than leave them running
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        run.finish()
+
+        skipped = fetch_stats.get("not_modified", 0) + fetch_stats.get("unchanged", 0)
+        if skipped:
+            logger.info(f"Skipped {skipped} unchanged feeds without parsing.")
+
+        if run.counters["entries"]:
+            logger.info(f"Fetched {run.counters['entries']} entries and stored "
+                        f"{run.counters['articles_stored']} new articles.")
+            return f"Feeds refreshed and new stories ingested successfully ({skipped} feeds unchanged)."
+        logger.info("No new entries found in the RSS feeds.")
+        return f"No new entries found in the RSS feeds ({skipped} feeds unchanged)."
     except Exception as e:
         logger.error(f"Error refreshing feeds: {str(e)}")
-        return f"Error refreshing feeds: {str(e)}" 
\ No newline at end of file
+        run.finish("error", str(e))
+        return f"Error refreshing feeds: {str(e)}"
@@ -0,0 +1,152 @@
+"""
+Module: run_ledger.py
+Purpose: Record each pipeline run with per-stage timings and counters
+
+A run row in pipeline_runs holds start/end times, busy seconds per stage
+(fetch, parse, dedup, enrich, store), article counts at each stage and LLM
+usage; pipeline_run_feeds holds one row per feed with its fetch latency,
+bytes and outcome. Stages overlap, so stage seconds add up to more than the
+run's wall time when the pipeline is streaming well.
+"""
+import logging
+import sqlite3
+import time
+from db.connection import connect
+
+logger = logging.getLogger(__name__)
+
+STAGES = ("fetch", "parse", "dedup", "enrich", "store")
+
+COUNTERS = (
+    "sources", "feeds_fetched", "feeds_not_modified", "feeds_unchanged", "feeds_failed",
+    "entries", "articles_parsed", "duplicates", "articles_stored", "articles_updated",
+    "articles_enriched", "articles_enriched_locally", "enrich_errors",
+    "llm_requests", "llm_input_tokens", "llm_output_tokens",
+)
+
+# Runs kept in the ledger
+MAX_RUNS = 1000
+
+class PipelineRun:
+    """One refresh's timings and counters, written to pipeline_runs on finish"""
+
+    def __init__(self, db_name="news_ingestion.db", trigger="refresh"):
+        """
+        Args:
+            db_name: Path to the database file
+            trigger: What started the run (e.g. 'refresh', 'schedule', 'replay')
+        """
+        self.db_name = db_name
+        self.trigger = trigger
+        self.run_id = None
+        self.started_at = None
+        self.stage_seconds = dict.fromkeys(STAGES, 0.0)
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.feeds = []
+
+    def start(self, sources=0):
+        """Insert the run row with status 'running'."""
+        self.started_at = time.time()
+        self.counters["sources"] = sources
+        try:
+            with connect(self.db_name) as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    INSERT INTO pipeline_runs (trigger, started_at, status, sources)
+                    VALUES (?, ?, 'running', ?)
+                ''', (self.trigger, self.started_at, sources))
+                self.run_id = cursor.lastrowid
+                conn.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Error starting pipeline run record: {e}")
+        return self
+
+    def add_time(self, stage, seconds):
+        self.stage_seconds[stage] += seconds
+
+    def add(self, counter, amount=1):
+        self.counters[counter] += amount
+
+    def record_fetch(self, stats):
+        """Take fetch/parse timings, feed outcomes and per-feed rows from fetch_rss stats."""
+        self.add_time("fetch", stats.get("fetch_seconds", 0.0))
+        self.add_time("parse", stats.get("parse_seconds", 0.0))
+        self.counters["feeds_fetched"] += stats.get("fetched", 0)
+        self.counters["feeds_not_modified"] += stats.get("not_modified", 0)
+        self.counters["feeds_unchanged"] += stats.get("unchanged", 0)
+        self.counters["feeds_failed"] += stats.get("failed", 0)
+        self.feeds.extend(stats.get("feeds", []))
+
+    def record_enrichment(self, counts):
+        """Take timings and LLM usage from run_enrichment_workers' counts."""
+        self.add_time("enrich", counts.get("seconds", 0.0))
+        self.counters["articles_enriched"] += counts.get("enriched", 0)
+        self.counters["articles_enriched_locally"] += counts.get("local", 0)
+        self.counters["enrich_errors"] += counts.get("failed", 0)
+        self.counters["llm_requests"] += counts.get("llm_requests", 0)
+        self.counters["llm_input_tokens"] += counts.get("input_tokens", 0)
+        self.counters["llm_output_tokens"] += counts.get("output_tokens", 0)
+
+    def finish(self, status="ok", error=None):
+        """Write end time, stage seconds, counters and feed rows."""
+        if self.run_id is None:
+            return
+        finished_at = time.time()
+        columns = [f"{stage}_seconds" for stage in STAGES] + list(COUNTERS)
+        values = [round(self.stage_seconds[stage], 4) for stage in STAGES] + [self.counters[c] for c in COUNTERS]
+        assignments = ", ".join(f"{column} = ?" for column in columns)
+        try:
+            with connect(self.db_name) as conn:
+                cursor = conn.cursor()
+                cursor.execute(f'''
+                    UPDATE pipeline_runs
+                    SET finished_at = ?, duration_seconds = ?, status = ?, error = ?, {assignments}
+                    WHERE id = ?
+                ''', (finished_at, round(finished_at - self.started_at, 4), status, error, *values, self.run_id))
+                cursor.executemany('''
+                    INSERT INTO pipeline_run_feeds (run_id, feed_url, http_status, latency_ms, bytes, entries, error)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', [
+                    (self.run_id, feed["feed_url"], feed.get("status"), feed.get("latency_ms"),
+                     feed.get("bytes"), feed.get("entries"), feed.get("error"))
+                    for feed in self.feeds
+                ])
+                cursor.execute('''
+                    DELETE FROM pipeline_runs WHERE id <= (SELECT MAX(id) FROM pipeline_runs) - ?
+                ''', (MAX_RUNS,))
+                cursor.execute('DELETE FROM pipeline_run_feeds WHERE run_id NOT IN (SELECT id FROM pipeline_runs)')
+                conn.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Error finishing pipeline run record: {e}")
+
+def get_pipeline_runs(limit=20, db_name="news_ingestion.db"):
+    """
+    Most recent pipeline runs, newest first.
+
+    Returns:
+        list: Run dicts with every pipeline_runs column
+    """
+    cursor = connect(db_name, readonly=True).cursor()
+    cursor.row_factory = sqlite3.Row
+    rows = cursor.execute('SELECT * FROM pipeline_runs ORDER BY id DESC LIMIT ?', (limit,)).fetchall()
+    return [dict(row) for row in rows]
+
+def get_pipeline_run(run_id, db_name="news_ingestion.db"):
+    """
+    One pipeline run with its per-feed rows.
+
+    Returns:
+        dict: Run columns plus 'feeds', or None if the run does not exist
+    """
+    cursor = connect(db_name, readonly=True).cursor()
+    cursor.row_factory = sqlite3.Row
+    row = cursor.execute('SELECT * FROM pipeline_runs WHERE id = ?', (run_id,)).fetchone()
+    if row is None:
+        return None
+    feeds = cursor.execute('''
+        SELECT feed_url, http_status, latency_ms, bytes, entries, error
+        FROM pipeline_run_feeds WHERE run_id = ? ORDER BY latency_ms DESC
+    ''', (run_id,)).fetchall()
+    run = dict(row)
+    run["feeds"] = [dict(feed) for feed in feeds]
+    return run
@@ -3,12 +3,17 @@ Module: rank.py
 Purpose: Calculate article rankings based on time and importance
 """
 import logging
-from datetime import datetime
-import sqlite3
+from datetime import datetime, timezone
 import os
+import time
+from db.connection import connect
 
 logger = logging.getLogger(__name__)
 
+def _utc_text(epoch):
+    """UTC epoch as text comparable with parsed_at ('%Y-%m-%d %H:%M:%S')."""
+    return datetime.fromtimestamp(int(epoch), tz=timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
 class ArticleRanker:
     """Calculate and manage article rankings"""
     
@@ -28,12 +33,15 @@ class ArticleRanker:
         """
         self.max_age_days = max_age_days
     
-    def fetch_articles_from_db(self, db_name: str) -> list:
+    def fetch_articles_from_db(self, db_name: str, since_ts: int = None, until_ts: int = None) -> list:
         """
         Fetch articles from the database.
         
         Args:
             db_name: Path to the database file
+            since_ts: Only fetch articles published at or after this UTC epoch
+                (defaults to max_age_days ago); undated ones go by parse time
+            until_ts: Only fetch articles published before this UTC epoch
             
         Returns:
             list: List of articles fetched from the database
@@ -48,10 +56,32 @@ class ArticleRanker:
             abs_db_path = os.path.abspath(db_name)
             logger.info(f"Attempting to connect to database at: {abs_db_path}")
             
-            with sqlite3.connect(db_name) as conn:
+            with connect(db_name, readonly=True) as conn:
                 cursor = conn.cursor()
                 
-                cursor.execute('SELECT id, title, description, source, link, published_date, importance, derived_summary, keywords FROM parsed_articles')
+                # Near-duplicates are hidden behind their canonical story;
+                # time-range filters run in SQL against the (canonical_id,
+                # published_ts, parsed_at) index. Undated articles are placed
+                # by when they were parsed (UTC text), in a UNION ALL branch of
+                # their own so each branch stays an index range scan
+                if since_ts is None:
+                    # Older articles score zero on time; leave them on disk
+                    since_ts = int(time.time()) - int(self.max_age_days * 24 * 3600)
+                dated, undated = ['published_ts >= ?'], ['published_ts IS NULL', 'parsed_at >= ?']
+                dated_params, undated_params = [int(since_ts)], [_utc_text(since_ts)]
+                if until_ts is not None:
+                    dated.append('published_ts < ?')
+                    dated_params.append(int(until_ts))
+                    undated.append('parsed_at < ?')
+                    undated_params.append(_utc_text(until_ts))
+
+                select = ('SELECT id, title, description, source, link, published_date, importance, '
+                          'derived_summary, keywords, published_ts FROM parsed_articles '
+                          'WHERE canonical_id IS NULL AND ')
+                cursor.execute(
+                    select + ' AND '.join(dated) + ' UNION ALL ' + select + ' AND '.join(undated),
+                    dated_params + undated_params
+                )
                 articles = cursor.fetchall()
                 logger.info(f"Fetched {len(articles)} articles from database")
                 
@@ -70,7 +100,8 @@ class ArticleRanker:
                         'published_date': article[5],
                         'importance': article[6],
                         'derived_summary': article[7] or article[2][:100] + "...",
-                        'keywords': article[8]
+                        'keywords': article[8],
+                        'published_ts': article[9]
                     }
                     for article in articles
                 ]
@@ -81,20 +112,24 @@ class ArticleRanker:
         
         return articles
 
-    def calculate_time_score(self, published_date: str) -> float:
+    def calculate_time_score(self, published) -> float:
         """
         Calculate time-based score (1.0 for now, decreasing to 0.0 for max_age)
         
         Args:
-            published_date: Article publication date string (format: "%d %b %Y %H:%M")
+            published: Publication time as UTC epoch seconds, or a legacy
+                date string (format: "%d %b %Y %H:%M")
             
         Returns:
             float: Score between 0 and 1
         """
         try:
-            pub_date = datetime.strptime(published_date, "%d %b %Y %H:%M")
-            now = datetime.now()
-            age_days = (now - pub_date).total_seconds() / (24 * 3600)  # Convert to days
+            if isinstance(published, (int, float)):
+                age_days = (time.time() - published) / (24 * 3600)
+            else:
+                pub_date = datetime.strptime(published, "%d %b %Y %H:%M")
+                now = datetime.now()
+                age_days = (now - pub_date).total_seconds() / (24 * 3600)  # Convert to days
             
             if age_days < 0:  # Future dates get full score
                 return 1.0
@@ -103,8 +138,8 @@ class ArticleRanker:
             time_score = 1.0 - (age_days / self.max_age_days)
             return max(0.0, min(1.0, time_score))  # Clamp between 0 and 1
             
-        except ValueError as e:
-            logger.error(f"Error parsing date {published_date}: {e}")
+        except (ValueError, TypeError) as e:
+            logger.error(f"Error parsing date {published}: {e}")
             return 0.0
     
     def calculate_importance_score(self, importance: str = None) -> float:
@@ -120,12 +155,12 @@ class ArticleRanker:
         importance = (importance or 'uncategorized').lower()
         return self.IMPORTANCE_WEIGHTS.get(importance, 0.1)
     
-    def calculate_rank(self, published_date: str, importance: str) -> float:
+    def calculate_rank(self, published_date, importance: str) -> float:
         """
         Calculate overall rank score for an article
         
         Args:
-            published_date: Article publication date
+            published_date: Publication time (UTC epoch seconds or legacy date string)
             importance: Article importance level
             
         Returns:
@@ -152,7 +187,11 @@ class ArticleRanker:
         ranked_articles = []
         try:
             for article in articles:
-                rank = self.calculate_rank(article['published_date'], article.get('importance'))
+                # Prefer the stored epoch; fall back to the string for older rows
+                published = article.get('published_ts')
+                if published is None:
+                    published = article['published_date']
+                rank = self.calculate_rank(published, article.get('importance'))
                 article['rank'] = rank
                 ranked_articles.append(article)
             
@@ -167,13 +206,16 @@ class ArticleRanker:
                 raise  # Raise the exception in development mode
             return []
 
-def get_ranked_articles(max_age_days=7, db_name="news_ingestion.db"):
+def get_ranked_articles(max_age_days=7, db_name="news_ingestion.db", since_ts=None, until_ts=None):
     """
     Convenience function to get ranked articles
     
     Args:
         max_age_days: Number of days to consider for time decay
         db_name: Path to the database file
+        since_ts: Only include articles published at or after this UTC epoch
+            (defaults to max_age_days ago)
+        until_ts: Only include articles published before this UTC epoch
         
     Returns:
         list: Ranked articles sorted by score
@@ -183,7 +225,7 @@ def get_ranked_articles(max_age_days=7, db_name="news_ingestion.db"):
     ranker = ArticleRanker(max_age_days=max_age_days)
     
     # Fetch articles from the database
-    articles = ranker.fetch_articles_from_db(db_name)
+    articles = ranker.fetch_articles_from_db(db_name, since_ts=since_ts, until_ts=until_ts)
     
     # Rank the fetched articles
     return ranker.rank_articles(articles)
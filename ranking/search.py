@@ -0,0 +1,180 @@
+"""
+Module: search.py
+Purpose: Full-text article search ranked by relevance and recency
+
+Searches the articles_fts index (db/migrations.py), which triggers keep in
+step with parsed_articles. Ranking happens in SQL: FTS5's bm25() with
+per-column weights gives the relevance, which is multiplied by a recency
+factor that halves every search_recency_half_life_days, and pages are read
+with LIMIT/OFFSET from that order.
+
+Scoring every match of a common word is slow on a large table, so matches
+are read in newest-first windows: first the articles stored no earlier
+than the first one published within WINDOW_HALF_LIVES half-lives, widening by
+WINDOW_GROWTH until the requested page is full or the window covers the
+whole table. Rowids grow with storage time, so a window is a rowid range
+that FTS5 reads straight from its index. A match left outside a full
+window is at least that many half-lives old and would need a bm25 score at least
+2**WINDOW_HALF_LIVES times higher to outrank the page.
+"""
+import logging
+import math
+import re
+import sqlite3
+import time
+from db.connection import connect
+from db.database import get_config_value
+
+logger = logging.getLogger(__name__)
+
+# bm25() weights for title, description, derived_summary, keywords (FTS column order)
+COLUMN_WEIGHTS = (10.0, 1.0, 2.0, 5.0)
+
+MAX_PER_PAGE = 100
+
+# First search window, in recency half-lives, and how much each retry widens it
+WINDOW_HALF_LIVES = 4
+WINDOW_GROWTH = 4
+
+WORD_PATTERN = re.compile(r"\w+")
+
+def query_words(text):
+    """
+    Lower-cased words of free search text, duplicates removed.
+
+    Each word is quoted in the MATCH expression, so operators and
+    punctuation in user input cannot break the query.
+    """
+    return list(dict.fromkeys(word.lower() for word in WORD_PATTERN.findall(text or "")))
+
+def _recency_sql(half_life_days, now):
+    """
+    SQL multiplier in (0, 1] that halves every half_life_days of age.
+
+    Returns:
+        tuple: (SQL expression over p.published_ts, its parameters)
+    """
+    if not half_life_days:
+        return "1", []
+    half_life = half_life_days * 24 * 3600
+    # Undated articles rank as if one half-life old; future dates count as new
+    return ("pow(0.5, max(0, ? - COALESCE(p.published_ts, ?)) / ?)",
+            [int(now), int(now - half_life), half_life])
+
+def _ensure_pow(conn):
+    """Provide pow() where SQLite was built without its math functions."""
+    try:
+        conn.execute("SELECT pow(0.5, 1)")
+    except sqlite3.OperationalError:
+        conn.create_function("pow", 2, math.pow, deterministic=True)
+
+def _window_starts(conn, half_life_days, now, since_ts):
+    """
+    First rowids of the newest-first search windows, oldest last.
+
+    Each window holds the articles stored no earlier than the first one
+    published after its cutoff. The last window covers everything the filters allow:
+    rowid 0, or the first article published at or after since_ts.
+
+    Yields:
+        int: Smallest rowid to search (windows with no articles are skipped)
+    """
+    def first_id(cutoff):
+        # +id keeps SQLite on the published_ts index; MIN(id) alone walks
+        # the table in rowid order up to the first recent article
+        return conn.execute('SELECT MIN(+id) FROM parsed_articles WHERE published_ts >= ?',
+                            (int(cutoff),)).fetchone()[0]
+
+    previous = None
+    if half_life_days:
+        oldest = since_ts
+        if oldest is None:
+            oldest = conn.execute('SELECT MIN(published_ts) FROM parsed_articles').fetchone()[0]
+        span = half_life_days * 24 * 3600 * WINDOW_HALF_LIVES
+        while oldest is not None and now - span > oldest:
+            start = first_id(now - span)
+            if start is not None and start != previous:
+                previous = start
+                yield start
+            span *= WINDOW_GROWTH
+    start = 0 if since_ts is None else first_id(since_ts)
+    if start is not None and start != previous:
+        yield start
+
+def search_articles(query, page=1, per_page=20, source=None, since_ts=None, until_ts=None,
+                    db_name="news_ingestion.db"):
+    """
+    Search articles by text, best matches first.
+
+    Args:
+        query: Search text (every word must match, in any form the stemmer folds together)
+        page: 1-based page number
+        per_page: Results per page (at most MAX_PER_PAGE)
+        source: Only articles from this feed URL
+        since_ts: Only articles published at or after this UTC epoch
+        until_ts: Only articles published before this UTC epoch
+        db_name: Path to the database file
+
+    Returns:
+        dict: 'query', 'page', 'per_page', 'has_more' and 'results' (article
+        dicts with a 'score')
+    """
+    page = max(1, int(page))
+    per_page = max(1, min(int(per_page), MAX_PER_PAGE))
+    response = {"query": query, "page": page, "per_page": per_page, "has_more": False, "results": []}
+    words = query_words(query)
+    if not words:
+        return response
+
+    # Near-duplicates are hidden behind their canonical story, as on the front page
+    conditions, params = ['articles_fts MATCH ?', 'p.canonical_id IS NULL'], [" ".join(f'"{word}"' for word in words)]
+    if source:
+        conditions.append('p.source = ?')
+        params.append(source)
+    if since_ts is not None:
+        conditions.append('p.published_ts >= ?')
+        params.append(int(since_ts))
+    if until_ts is not None:
+        conditions.append('p.published_ts < ?')
+        params.append(int(until_ts))
+
+    half_life = float(get_config_value("search_recency_half_life_days", db_name) or 0)
+    now = time.time()
+    recency, recency_params = _recency_sql(half_life, now)
+    conn = connect(db_name, readonly=True)
+    _ensure_pow(conn)
+    weights = ", ".join(str(weight) for weight in COLUMN_WEIGHTS)
+    rows = []
+    for start in _window_starts(conn, half_life, now, since_ts):
+        # bm25() is lower for better matches; negate it so scores grow with relevance.
+        # One extra row tells whether another page follows.
+        rows = conn.execute(f'''
+            SELECT p.id, p.title, p.source, p.link, p.published_date, p.published_ts, p.importance,
+                   p.derived_summary, p.keywords,
+                   -bm25(articles_fts, {weights}) * {recency} AS score
+            FROM articles_fts JOIN parsed_articles p ON p.id = articles_fts.rowid
+            WHERE {" AND ".join(conditions)} AND articles_fts.rowid >= ?
+            ORDER BY score DESC, p.id DESC
+            LIMIT ? OFFSET ?
+        ''', (*recency_params, *params, start, per_page + 1, (page - 1) * per_page)).fetchall()
+        if len(rows) > per_page:
+            break
+
+    response["has_more"] = len(rows) > per_page
+    response["results"] = [
+        {
+            'id': row[0],
+            'title': row[1],
+            'source': row[2],
+            'link': row[3],
+            'published_date': row[4],
+            'published_ts': row[5],
+            'importance': row[6],
+            'derived_summary': row[7],
+            'keywords': row[8],
+            'score': row[9],
+        }
+        for row in rows[:per_page]
+    ]
+    logger.info(f"Search {words} returned {len(response['results'])} results for page {page}")
+    return response
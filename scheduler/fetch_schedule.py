@@ -1,13 +1,18 @@
 """
 Module: fetch_schedule.py
 Purpose: Scheduled RSS fetching that runs independently of the web app
+
+Each feed is polled when its learned next_fetch_at comes due, so busy feeds
+are polled often and dormant ones back off (see poll_scheduler.py).
+Fetches only store articles; a pool of enrichment workers drains the
+enrichment queue alongside them. Every RETENTION_INTERVAL_HOURS old articles
+are archived and the database is compacted (see db/retention.py).
 """
 import asyncio
-import schedule
-import time
 import sys
 import os
 import logging
+import time
 from datetime import datetime
 
 # Add project root to Python path
@@ -15,30 +20,71 @@ project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(project_root)
 
 from main.main import main as fetch_main
+from enrichment.llm_enrichment import create_enricher
+from enrichment.job_queue import run_enrichment_workers
+from ingestion.fetch_rss import close_session
+from scheduler.poll_scheduler import PollScheduler, defer_unpolled
+from db.database import setup_database
+from db.retention import run_retention
+from config.settings import Config
 from config.logging_config import setup_logging
 
 logger = setup_logging()
 
-async def scheduled_fetch():
-    """Run the RSS fetch process"""
+# Longest time to sleep before re-reading the schedule (picks up new sources)
+MAX_SLEEP_SECONDS = 60
+
+async def scheduled_fetch(sources=None):
+    """Run the RSS fetch process for the given sources (all active if None)"""
     try:
-        logger.info(f"Starting scheduled fetch at {datetime.now()}")
-        await fetch_main()
+        logger.info(f"Starting scheduled fetch of {len(sources) if sources else 'all'} sources at {datetime.now()}")
+        await fetch_main(sources, enrich=False, setup=False)
         logger.info("Completed scheduled fetch")
     except Exception as e:
         logger.error(f"Error in scheduled fetch: {e}")
 
-def run_schedule():
-    """Run the scheduler"""
-    schedule.every(30).minutes.do(lambda: asyncio.run(scheduled_fetch()))
-    
-    while True:
-        schedule.run_pending()
-        time.sleep(60)
+async def scheduled_retention(db_name="news_ingestion.db"):
+    """Archive old articles and compact the database off the event loop"""
+    try:
+        logger.info(f"Starting retention at {datetime.now()}")
+        result = await asyncio.to_thread(run_retention, db_name)
+        logger.info(f"Completed retention: {result}")
+    except Exception as e:
+        logger.error(f"Error in retention: {e}")
+
+async def run_schedule(db_name="news_ingestion.db"):
+    """Poll feeds as they come due, in next-due order, while workers enrich"""
+    scheduler = PollScheduler(db_name)
+    workers = None
+    try:
+        workers = asyncio.create_task(run_enrichment_workers(create_enricher(db_name=db_name), db_name))
+    except ValueError as e:
+        logger.warning(f"{e}; articles will stay queued for enrichment")
+    next_retention = time.monotonic()
+    try:
+        while True:
+            if Config.RETENTION_INTERVAL_HOURS and time.monotonic() >= next_retention:
+                await scheduled_retention(db_name)
+                next_retention = time.monotonic() + Config.RETENTION_INTERVAL_HOURS * 3600
+
+            scheduler.refresh()
+            due = scheduler.pop_due()
+            if due:
+                try:
+                    await scheduled_fetch(due)
+                finally:
+                    # Feeds whose poll failed early are still due; back them off
+                    defer_unpolled(due, db_name=db_name)
+                continue
+
+            wait = scheduler.seconds_until_next()
+            await asyncio.sleep(MAX_SLEEP_SECONDS if wait is None else min(wait, MAX_SLEEP_SECONDS))
+    finally:
+        if workers:
+            workers.cancel()
+        await close_session()
 
 if __name__ == "__main__":
     logger.info("Starting RSS fetch scheduler")
-    # Run initial fetch
-    asyncio.run(scheduled_fetch())
-    # Start scheduler
-    run_schedule() 
\ No newline at end of file
+    setup_database()
+    asyncio.run(run_schedule())
@@ -0,0 +1,142 @@
+"""
+Module: ingest_worker.py
+Purpose: Ingestion worker processes that share the feeds through source leases
+
+Run several of these, on one machine or on many sharing the database, in
+place of fetch_schedule.py. Each worker repeatedly claims a batch of due
+sources (see source_leases.py), fetches, parses and stores them, renewing
+its leases while it works and releasing them when the batch is done. If a
+worker dies its leases expire and another worker picks the sources up.
+
+    python scheduler/ingest_worker.py --processes 4
+"""
+import argparse
+import asyncio
+import multiprocessing
+import sys
+import os
+import logging
+
+# Add project root to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from config.settings import Config
+from enrichment.llm_enrichment import create_enricher
+from enrichment.job_queue import run_enrichment_workers, worker_id
+from ingestion.fetch_rss import fetch_rss, close_session
+from pipeline.rss_manager import refresh_rss_feeds
+from scheduler.poll_scheduler import defer_unpolled
+from scheduler.source_leases import claim_due_sources, renew_leases, release_leases, seconds_until_next_due
+
+logger = logging.getLogger(__name__)
+
+# Longest time an idle worker sleeps before looking for due sources again
+MAX_IDLE_SECONDS = 60
+
+async def _keep_leases(owner, urls, lease_seconds, db_name):
+    """Renew the batch's leases every third of the lease period until cancelled."""
+    while True:
+        await asyncio.sleep(lease_seconds / 3)
+        await asyncio.to_thread(renew_leases, owner, urls, lease_seconds, db_name)
+
+async def run_worker(db_name="news_ingestion.db", batch_size=None, lease_seconds=None, fetcher=fetch_rss,
+                     enrich=False, stop_when_idle=False, owner=None):
+    """
+    Claim, fetch and store batches of due sources until stopped.
+
+    Args:
+        db_name: Path to the database file
+        batch_size: Sources claimed per batch (defaults to Config.INGEST_BATCH_SIZE)
+        lease_seconds: Lease length (defaults to Config.SOURCE_LEASE_SECONDS)
+        fetcher: Coroutine with fetch_rss's signature
+        enrich: Also run enrichment workers in this process
+        stop_when_idle: Return once no sources are due instead of waiting
+        owner: Lease owner name (defaults to this host and process)
+
+    Returns:
+        dict: Counts of 'batches' and 'sources' processed
+    """
+    batch_size = batch_size or Config.INGEST_BATCH_SIZE
+    lease_seconds = lease_seconds or Config.SOURCE_LEASE_SECONDS
+    owner = owner or worker_id()
+    counts = {"batches": 0, "sources": 0}
+
+    enrichment = None
+    if enrich:
+        try:
+            enrichment = asyncio.create_task(run_enrichment_workers(create_enricher(db_name=db_name), db_name))
+        except ValueError as e:
+            logger.warning(f"{e}; articles will stay queued for enrichment")
+
+    try:
+        while True:
+            urls = await asyncio.to_thread(claim_due_sources, owner, batch_size, lease_seconds, db_name)
+            if not urls:
+                if stop_when_idle:
+                    break
+                wait = await asyncio.to_thread(seconds_until_next_due, db_name)
+                # Another worker may hold the due sources; look again shortly
+                await asyncio.sleep(MAX_IDLE_SECONDS if wait is None else min(max(wait, 1), MAX_IDLE_SECONDS))
+                continue
+
+            logger.info(f"{owner} claimed {len(urls)} sources")
+            keeper = asyncio.create_task(_keep_leases(owner, urls, lease_seconds, db_name))
+            try:
+                # refresh_rss_feeds records each poll, which moves next_fetch_at past now
+                await refresh_rss_feeds(None, rss_sources=urls, fetcher=fetcher, db_name=db_name,
+                                        trigger=f"worker:{owner}")
+            finally:
+                keeper.cancel()
+                # Sources whose poll failed early are still due; back them off
+                # before releasing them, or the next claim picks them straight up
+                await asyncio.to_thread(defer_unpolled, urls, db_name=db_name)
+                await asyncio.to_thread(release_leases, owner, urls, db_name)
+            counts["batches"] += 1
+            counts["sources"] += len(urls)
+    finally:
+        if enrichment:
+            enrichment.cancel()
+    return counts
+
+def _process_main(index, db_name, batch_size, lease_seconds, enrich):
+    """Entry point for one worker process."""
+    from config.logging_config import setup_logging
+    setup_logging()
+
+    async def run():
+        try:
+            await run_worker(db_name, batch_size, lease_seconds, enrich=enrich, owner=worker_id(index))
+        finally:
+            await close_session()
+
+    asyncio.run(run())
+
+def main():
+    parser = argparse.ArgumentParser(description="Run ingestion workers that share sources through leases.")
+    parser.add_argument("--processes", type=int, default=1, help="Worker processes to start on this machine")
+    parser.add_argument("--batch-size", type=int, default=None, help="Sources claimed per batch")
+    parser.add_argument("--lease-seconds", type=int, default=None, help="Lease length in seconds")
+    parser.add_argument("--db", default="news_ingestion.db", help="Database file")
+    parser.add_argument("--enrich", action="store_true", help="Also drain the enrichment queue in each process")
+    args = parser.parse_args()
+
+    from db.database import initialize_database
+    initialize_database(args.db)
+
+    processes = [
+        multiprocessing.Process(target=_process_main, name=f"ingest-{index}",
+                                args=(index, args.db, args.batch_size, args.lease_seconds, args.enrich))
+        for index in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""
+Module: poll_scheduler.py
+Purpose: Learn each feed's publish rate and decide when it is next due for polling
+"""
+import heapq
+import logging
+import statistics
+from datetime import datetime, timedelta, timezone
+from dateutil.parser import parse as dateutil_parse
+from db.database import get_config_value
+from db.connection import connect
+
+logger = logging.getLogger(__name__)
+
+# Bounds on how often a single feed is polled
+MIN_POLL_MINUTES = 5
+MAX_POLL_MINUTES = 24 * 60
+
+# Weight given to the newest observation when smoothing the publish interval
+SMOOTHING = 0.3
+
+# Multiplier applied to the poll interval when a feed had nothing new
+BACKOFF_FACTOR = 1.5
+
+# Timestamp format used for next_fetch_at (matches SQLite CURRENT_TIMESTAMP)
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def _parse_entry_time(entry):
+    """Parse an entry's publish time as naive UTC, or None if it has none."""
+    value = entry.get("published") or entry.get("pubDate") or entry.get("updated")
+    if not value:
+        return None
+    try:
+        parsed = dateutil_parse(value)
+    except (ValueError, OverflowError):
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+def estimate_publish_interval(timestamps):
+    """
+    Estimate the typical gap between posts from entry timestamps.
+
+    Args:
+        timestamps: List of datetimes (any order, duplicates allowed)
+
+    Returns:
+        float: Median gap in minutes, or None with fewer than two distinct times
+    """
+    ordered = sorted(set(timestamps))
+    if len(ordered) < 2:
+        return None
+    gaps = [(later - earlier).total_seconds() / 60 for earlier, later in zip(ordered, ordered[1:])]
+    return statistics.median(gaps)
+
+def next_poll_interval(current_interval, publish_interval, has_new_entries):
+    """
+    Decide how long to wait before polling a feed again.
+
+    Feeds with new entries are polled about twice per expected post; feeds
+    with nothing new back off geometrically.
+
+    Args:
+        current_interval: Current poll interval in minutes
+        publish_interval: Smoothed publish interval in minutes (or None)
+        has_new_entries: Whether the last poll returned new content
+
+    Returns:
+        float: Poll interval in minutes, clamped to [MIN_POLL_MINUTES, MAX_POLL_MINUTES]
+    """
+    if has_new_entries and publish_interval:
+        interval = publish_interval / 2
+    elif has_new_entries:
+        interval = current_interval
+    else:
+        interval = current_interval * BACKOFF_FACTOR
+    return max(MIN_POLL_MINUTES, min(MAX_POLL_MINUTES, interval))
+
+def default_poll_interval(db_name="news_ingestion.db"):
+    """Poll interval for feeds we know nothing about, from app_config."""
+    try:
+        return float(get_config_value("fetch_interval_minutes", db_name) or 30)
+    except ValueError:
+        return 30.0
+
+def record_poll(feed_url, entries, db_name="news_ingestion.db"):
+    """
+    Update a feed's learned publish rate and schedule its next poll.
+
+    Args:
+        feed_url: URL of the polled feed
+        entries: Entries returned by the poll (empty if unchanged or not modified)
+        db_name: Path to the database file
+
+    Returns:
+        float: The new poll interval in minutes
+    """
+    default_interval = default_poll_interval(db_name)
+    try:
+        with connect(db_name) as connection:
+            cursor = connection.cursor()
+            cursor.execute('''
+                SELECT poll_interval_minutes, publish_interval_minutes
+                FROM rss_sources WHERE feed_url = ?
+            ''', (feed_url,))
+            row = cursor.fetchone()
+            current_interval, publish_interval = row if row else (None, None)
+            current_interval = current_interval or default_interval
+
+            timestamps = [t for t in (_parse_entry_time(entry) for entry in entries) if t]
+            observed = estimate_publish_interval(timestamps)
+            if observed:
+                publish_interval = (
+                    observed if publish_interval is None
+                    else SMOOTHING * observed + (1 - SMOOTHING) * publish_interval
+                )
+
+            interval = next_poll_interval(current_interval, publish_interval, bool(entries))
+            next_fetch_at = (_utcnow() + timedelta(minutes=interval)).strftime(TIMESTAMP_FORMAT)
+
+            cursor.execute('''
+                UPDATE rss_sources
+                SET poll_interval_minutes = ?, publish_interval_minutes = ?, next_fetch_at = ?
+                WHERE feed_url = ?
+            ''', (interval, publish_interval, next_fetch_at, feed_url))
+            connection.commit()
+
+            logger.debug(f"Next poll of {feed_url} in {interval:.0f} minutes")
+            return interval
+    except Exception as e:
+        logger.error(f"Error recording poll for {feed_url}: {e}")
+        return default_interval
+
+def defer_unpolled(feed_urls, minutes=MIN_POLL_MINUTES, db_name="news_ingestion.db"):
+    """
+    Push back feeds that are still due after a poll attempt.
+
+    A fetch that fails before record_poll runs leaves next_fetch_at in the
+    past; without this the scheduler would pick the same feeds straight
+    back up and retry them in a tight loop.
+
+    Args:
+        feed_urls: Feeds that were just polled
+        minutes: How long to wait before retrying them
+        db_name: Path to the database file
+
+    Returns:
+        int: Number of feeds deferred
+    """
+    now = _utcnow()
+    retry_at = (now + timedelta(minutes=minutes)).strftime(TIMESTAMP_FORMAT)
+    with connect(db_name) as connection:
+        cursor = connection.cursor()
+        cursor.executemany('''
+            UPDATE rss_sources SET next_fetch_at = ?
+            WHERE feed_url = ? AND (next_fetch_at IS NULL OR next_fetch_at <= ?)
+        ''', [(retry_at, feed_url, now.strftime(TIMESTAMP_FORMAT)) for feed_url in feed_urls])
+        deferred = cursor.rowcount
+    if deferred:
+        logger.warning(f"{deferred} feeds were not rescheduled by their poll; retrying in {minutes} minutes")
+    return deferred
+
+class PollScheduler:
+    """Priority queue of active feeds ordered by their next due time"""
+
+    def __init__(self, db_name="news_ingestion.db"):
+        self.db_name = db_name
+        self._heap = []
+
+    def refresh(self):
+        """Rebuild the queue from rss_sources so new and edited sources are picked up."""
+        with connect(self.db_name) as connection:
+            cursor = connection.cursor()
+            cursor.execute("SELECT feed_url, next_fetch_at FROM rss_sources WHERE status = 'active'")
+            rows = cursor.fetchall()
+
+        # Feeds that were never scheduled are due immediately
+        self._heap = [
+            (datetime.strptime(next_fetch_at, TIMESTAMP_FORMAT) if next_fetch_at else datetime.min, feed_url)
+            for feed_url, next_fetch_at in rows
+        ]
+        heapq.heapify(self._heap)
+
+    def pop_due(self, now=None):
+        """
+        Remove and return every feed that is due.
+
+        Args:
+            now: Naive UTC datetime to compare against (defaults to now)
+
+        Returns:
+            list: Feed URLs, most overdue first
+        """
+        now = now or _utcnow()
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            due.append(heapq.heappop(self._heap)[1])
+        return due
+
+    def seconds_until_next(self, now=None):
+        """Seconds until the next feed is due (None if the queue is empty)."""
+        if not self._heap:
+            return None
+        now = now or _utcnow()
+        return max(0.0, (self._heap[0][0] - now).total_seconds())
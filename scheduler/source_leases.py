@@ -0,0 +1,108 @@
+"""
+Module: source_leases.py
+Purpose: Time-limited leases on rss_sources so several workers can share the feeds
+
+A worker claims a batch of due sources by writing its name and a lease
+expiry into rss_sources under an immediate transaction, so no two workers
+can claim the same source. It renews the lease while fetching and releases
+it when done; by then record_poll has moved next_fetch_at forward, so the
+source is not due again. A crashed worker's leases simply expire and the
+sources are claimed by someone else.
+"""
+import logging
+import time
+from datetime import datetime
+from scheduler.poll_scheduler import _utcnow, TIMESTAMP_FORMAT
+from db.connection import connect
+
+logger = logging.getLogger(__name__)
+
+def claim_due_sources(owner, limit, lease_seconds, db_name="news_ingestion.db"):
+    """
+    Lease up to `limit` active sources that are due and not leased by anyone else.
+
+    Args:
+        owner: Identifier of the claiming worker
+        limit: Maximum sources to claim
+        lease_seconds: How long the lease lasts unless renewed
+        db_name: Path to the database file
+
+    Returns:
+        list: Claimed feed URLs, most overdue first
+    """
+    now = int(time.time())
+    due_before = _utcnow().strftime(TIMESTAMP_FORMAT)
+    conn = connect(db_name)
+    try:
+        cursor = conn.cursor()
+        # Take the write lock up front so two workers cannot claim the same sources
+        cursor.execute('BEGIN IMMEDIATE')
+        # Feeds that were never scheduled are due immediately
+        cursor.execute('''
+            SELECT feed_url FROM rss_sources
+            WHERE status = 'active'
+            AND (next_fetch_at IS NULL OR next_fetch_at <= ?)
+            AND (lease_owner IS NULL OR lease_expires_at < ?)
+            ORDER BY next_fetch_at IS NOT NULL, next_fetch_at
+            LIMIT ?
+        ''', (due_before, now, limit))
+        urls = [row[0] for row in cursor.fetchall()]
+        if urls:
+            placeholders = ", ".join("?" * len(urls))
+            cursor.execute(f'''
+                UPDATE rss_sources SET lease_owner = ?, lease_expires_at = ?
+                WHERE feed_url IN ({placeholders})
+            ''', (owner, now + lease_seconds, *urls))
+        cursor.execute('COMMIT')
+        return urls
+    except Exception:
+        if conn.in_transaction:
+            cursor.execute('ROLLBACK')
+        raise
+
+def renew_leases(owner, urls, lease_seconds, db_name="news_ingestion.db"):
+    """
+    Extend this worker's leases on `urls`.
+
+    Returns:
+        int: Number of leases still held (fewer if some expired and were taken)
+    """
+    if not urls:
+        return 0
+    placeholders = ", ".join("?" * len(urls))
+    with connect(db_name) as conn:
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            UPDATE rss_sources SET lease_expires_at = ?
+            WHERE lease_owner = ? AND feed_url IN ({placeholders})
+        ''', (int(time.time()) + lease_seconds, owner, *urls))
+        conn.commit()
+        if cursor.rowcount < len(urls):
+            logger.warning(f"{owner} lost {len(urls) - cursor.rowcount} source leases")
+        return cursor.rowcount
+
+def release_leases(owner, urls, db_name="news_ingestion.db"):
+    """Give up this worker's leases on `urls`."""
+    if not urls:
+        return
+    placeholders = ", ".join("?" * len(urls))
+    with connect(db_name) as conn:
+        conn.execute(f'''
+            UPDATE rss_sources SET lease_owner = NULL, lease_expires_at = NULL
+            WHERE lease_owner = ? AND feed_url IN ({placeholders})
+        ''', (owner, *urls))
+        conn.commit()
+
+def seconds_until_next_due(db_name="news_ingestion.db"):
+    """Seconds until the next active source is due (None if there are none)."""
+    with connect(db_name) as conn:
+        total, next_due, scheduled = conn.execute('''
+            SELECT COUNT(*), MIN(next_fetch_at), COUNT(next_fetch_at)
+            FROM rss_sources WHERE status = 'active'
+        ''').fetchone()
+    if not total:
+        return None
+    if scheduled < total:
+        return 0.0
+    wait = datetime.strptime(next_due, TIMESTAMP_FORMAT) - _utcnow()
+    return max(0.0, wait.total_seconds())
@@ -0,0 +1,11 @@
+import pytest
+from db.connection import close_connections
+from db.database import initialize_database
+
+@pytest.fixture
+def temp_db(tmp_path):
+    """A fully initialized database in the test's tmp_path."""
+    db_file = str(tmp_path / "test.sqlite")
+    initialize_database(db_file)
+    yield db_file
+    close_connections(db_file)
@@ -0,0 +1,83 @@
+import asyncio
+import sqlite3
+import time
+import pytest
+from enrichment.job_queue import EnrichmentQueue
+from parsing.parse_data import store_parsed_articles
+import parsing.parse_data as parse_data
+from pipeline.backfill import backfill_sources, backfill_window, get_backfill_progress
+
+FEED = "https://archive/rss"
+
+def _entries(count):
+    return [{"title": f"Story {i}", "link": f"http://x/{i}", "description": "Body",
+             "published": time.strftime("%a, %d %b %Y %H:%M:%S +0000", time.gmtime(time.time() - i * 86400))}
+            for i in range(count)]
+
+def make_fetcher(entries, calls):
+    async def fetcher(rss_sources, db_name=None, stats=None, entry_limit=None, on_feed=None, conditional=True):
+        calls.append((list(rss_sources), entry_limit, conditional))
+        for url in rss_sources:
+            await on_feed(url, entries)
+    return fetcher
+
+def _count(db_file):
+    with sqlite3.connect(db_file) as conn:
+        return conn.execute("SELECT COUNT(*) FROM parsed_articles").fetchone()[0]
+
+def test_backfill_window_limits_count_and_age():
+    entries = _entries(10)
+    assert len(backfill_window(entries)) == 10
+    assert [e["title"] for e in backfill_window(entries, window=3)] == ["Story 0", "Story 1", "Story 2"]
+    assert len(backfill_window(entries, max_age_days=4.5)) == 5
+    assert len(backfill_window(entries + [{"title": "Undated"}], max_age_days=1.5)) == 3
+
+def test_interrupted_backfill_resumes_from_checkpoint(temp_db, monkeypatch):
+    calls = []
+    fetcher = make_fetcher(_entries(25), calls)
+
+    real_enqueue = parse_data.enqueue_enrichments
+    commits = []
+
+    def failing_enqueue(cursor, jobs):
+        # Fails the second chunk's transaction after its rows are written
+        commits.append(len(jobs))
+        if len(commits) == 2:
+            raise sqlite3.OperationalError("disk full")
+        return real_enqueue(cursor, jobs)
+
+    monkeypatch.setattr(parse_data, "enqueue_enrichments", failing_enqueue)
+    with pytest.raises(sqlite3.OperationalError):
+        asyncio.run(backfill_sources([FEED], db_name=temp_db, commit_size=10, fetcher=fetcher))
+    assert calls == [([FEED], None, False)]
+    assert _count(temp_db) == 10
+    progress = get_backfill_progress(temp_db)[FEED]
+    assert (progress["status"], progress["entries_done"]) == ("running", 10)
+
+    # By the next run the feed has dropped its three newest entries, shifting every offset
+    monkeypatch.setattr(parse_data, "enqueue_enrichments", real_enqueue)
+    counts = asyncio.run(backfill_sources([FEED], db_name=temp_db, commit_size=10,
+                                          fetcher=make_fetcher(_entries(25)[3:], calls)))
+    assert (counts["entries"], counts["articles_stored"]) == (15, 15)
+    assert _count(temp_db) == 25
+    assert get_backfill_progress(temp_db)[FEED]["status"] == "done"
+
+    # Finished sources are skipped until restarted
+    assert asyncio.run(backfill_sources([FEED], db_name=temp_db, fetcher=fetcher))["sources"] == 0
+    counts = asyncio.run(backfill_sources([FEED], db_name=temp_db, fetcher=fetcher, restart=True))
+    assert (counts["entries"], counts["articles_stored"]) == (25, 0)
+
+def test_backfilled_articles_wait_behind_live_ones(temp_db):
+    asyncio.run(backfill_sources([FEED], db_name=temp_db, window=2, fetcher=make_fetcher(_entries(5), [])))
+    old = {"title": "Live but old", "description": "", "source": "https://live/rss", "published_ts": 1}
+    asyncio.run(store_parsed_articles([old], db_name=temp_db))
+
+    jobs = EnrichmentQueue(temp_db).lease("w1", limit=3)
+    assert [job["title"] for job in jobs] == ["Live but old", "Story 0", "Story 1"]
+
+def test_refresh_entry_limit_follows_config(temp_db):
+    from pipeline.rss_manager import configured_entry_limit
+    assert configured_entry_limit(temp_db) == 2
+    with sqlite3.connect(temp_db) as conn:
+        conn.execute("UPDATE app_config SET value = '0' WHERE key = 'article_fetch_limit'")
+    assert configured_entry_limit(temp_db) is None
@@ -0,0 +1,31 @@
+import sqlite3
+import threading
+import pytest
+from db.connection import connect
+
+def test_connections_are_shared_per_thread_and_use_wal(temp_db):
+    conn = connect(temp_db)
+    assert connect(temp_db) is conn
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+
+    other = []
+    thread = threading.Thread(target=lambda: other.append(connect(temp_db)))
+    thread.start()
+    thread.join()
+    assert other[0] is not conn
+
+def test_readers_see_committed_data_while_a_write_is_open(temp_db):
+    writer = connect(temp_db)
+    writer.execute("BEGIN IMMEDIATE")
+    writer.execute("INSERT INTO rss_sources (feed_url, source_name) VALUES ('https://a/rss', 'A')")
+
+    reader = connect(temp_db, readonly=True)
+    assert reader is not writer
+    # Not blocked by the open write, and only sees committed rows
+    assert reader.execute("SELECT COUNT(*) FROM rss_sources").fetchone()[0] == 0
+    writer.commit()
+    assert reader.execute("SELECT COUNT(*) FROM rss_sources").fetchone()[0] == 1
+
+    with pytest.raises(sqlite3.OperationalError):
+        reader.execute("DELETE FROM rss_sources")
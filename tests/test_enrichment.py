@@ -0,0 +1,218 @@
+import asyncio
+import json
+import time
+from aiohttp import web
+from email.utils import formatdate
+from enrichment.llm_enrichment import AnthropicEnricher, LLMEnricher, enrich_articles, retry_after_seconds
+from enrichment.rate_limit import TokenBucket
+
+def _message(text):
+    return {
+        "id": "msg_stub", "type": "message", "role": "assistant",
+        "model": AnthropicEnricher.MODEL, "stop_reason": "end_turn", "stop_sequence": None,
+        "content": [{"type": "text", "text": text}],
+        "usage": {"input_tokens": 10, "output_tokens": 10},
+    }
+
+def _run(coro):
+    # A private loop leaves the default event loop untouched for other tests
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+async def _start_stub(handler):
+    app = web.Application()
+    app.router.add_post("/v1/messages", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}"
+
+def test_enrich_articles_concurrent_with_429_backoff(temp_db):
+    state = {"requests": 0, "in_flight": 0, "max_in_flight": 0}
+
+    async def handler(request):
+        state["requests"] += 1
+        if state["requests"] == 1:
+            return web.json_response(
+                {"type": "error", "error": {"type": "rate_limit_error", "message": "slow down"}},
+                status=429, headers={"retry-after": "0.1"}
+            )
+        body = await request.json()
+        title = body["messages"][0]["content"][0]["text"].split("Title: ")[1].split("\n")[0]
+        state["in_flight"] += 1
+        state["max_in_flight"] = max(state["max_in_flight"], state["in_flight"])
+        await asyncio.sleep(0.05)
+        state["in_flight"] -= 1
+        return web.json_response(_message(f"tech\nhigh\nSummary of {title}"))
+
+    async def run():
+        runner, base_url = await _start_stub(handler)
+        try:
+            enricher = AnthropicEnricher("test-key", base_url=base_url, max_concurrency=4,
+                                         requests_per_minute=6000, tokens_per_minute=10_000_000, db_name=temp_db)
+            articles = [{"title": f"Story {i}", "description": "Body"} for i in range(12)]
+            start = time.perf_counter()
+            enriched = await enrich_articles(articles, enricher, batch_size=1)
+            return enriched, time.perf_counter() - start
+        finally:
+            await runner.cleanup()
+
+    enriched, elapsed = _run(run())
+    assert [a["derived_summary"] for a in enriched] == [f"Summary of Story {i}" for i in range(12)]
+    assert all(a["keywords"] == "tech" and a["importance"] == "high" for a in enriched)
+    assert state["requests"] == 13  # One rejected request retried after backoff
+    assert 1 < state["max_in_flight"] <= 4
+    assert elapsed < 12 * 0.05  # Faster than one at a time
+
+def test_batch_enrichment_retries_only_invalid_items(temp_db):
+    requests = []
+
+    async def handler(request):
+        body = await request.json()
+        prompt = body["messages"][0]["content"][0]["text"]
+        requests.append(prompt)
+        if "JSON array" not in body["system"]:
+            title = prompt.split("Title: ")[1].split("\n")[0]
+            return web.json_response(_message(f"tech\nlow\nSummary of {title}"))
+        articles = json.loads(prompt.split("Articles:\n")[1].split("\n\n")[0])
+        results = [
+            {"id": a["id"], "keyword": "tech", "importance": "high", "summary": f"Summary of {a['title']}"}
+            for a in articles
+        ]
+        results[1]["importance"] = "urgent"  # Fails validation
+        return web.json_response(_message("Here you go:\n" + json.dumps(results)))
+
+    async def run():
+        runner, base_url = await _start_stub(handler)
+        try:
+            enricher = AnthropicEnricher("test-key", base_url=base_url, requests_per_minute=6000,
+                                         tokens_per_minute=10_000_000, db_name=temp_db)
+            articles = [{"title": f"Story {i}", "description": "Body"} for i in range(3)]
+            return await enrich_articles(articles, enricher, batch_size=10)
+        finally:
+            await runner.cleanup()
+
+    enriched = _run(run())
+    assert [a["derived_summary"] for a in enriched] == [f"Summary of Story {i}" for i in range(3)]
+    assert [a["importance"] for a in enriched] == ["high", "low", "high"]
+    # One batched request, then a single retry for the invalid item only
+    assert len(requests) == 2
+    assert "Title: Story 1" in requests[1] and "Story 0" not in requests[1]
+
+def test_retry_after_accepts_seconds_and_http_dates():
+    assert retry_after_seconds("2.5") == 2.5
+    assert 25 < retry_after_seconds(formatdate(time.time() + 30, usegmt=True)) <= 30
+    assert retry_after_seconds(formatdate(time.time() - 30, usegmt=True)) == 0
+    assert retry_after_seconds("soon") is None
+    assert retry_after_seconds(None) is None
+
+def test_enrich_articles_handles_missing_descriptions():
+    class FailingEnricher(LLMEnricher):
+        async def enrich_content(self, title, description, max_words=None):
+            raise RuntimeError("provider down")
+
+    articles = [{"title": "No body", "description": None}]
+    enriched = _run(enrich_articles(articles, FailingEnricher(), batch_size=1))
+    assert enriched[0]["keywords"] == "uncategorized" and enriched[0]["derived_summary"] == "..."
+
+def test_parse_batch_response_keeps_valid_items_from_truncated_output():
+    enricher = AnthropicEnricher.__new__(AnthropicEnricher)
+    text = '[{"id": 0, "keyword": "Tech", "importance": "High", "summary": "A"}, {"id": 1, "keyword": "sp'
+    assert enricher.parse_batch_response(text, {0, 1}) == {0: ("tech", "high", "A")}
+
+def test_token_bucket_wait_time():
+    bucket = TokenBucket(per_minute=60, capacity=2)
+    assert bucket.wait_time(2) == 0
+    bucket.take(2)
+    assert 0.9 < bucket.wait_time(1) <= 1.0
+
+class CountingEnricher:
+    """Stub enricher that records how often the provider is called"""
+    max_summary_words = 100
+
+    def __init__(self, namespace="v1"):
+        self.calls = 0
+        self.namespace = namespace
+
+    def cache_namespace(self):
+        return self.namespace
+
+    async def enrich_content(self, title, description, max_words=None):
+        self.calls += 1
+        return "tech", "high", f"Summary of {title}"
+
+def test_enrichment_cache_hits_and_invalidation(temp_db):
+    from enrichment.cache import EnrichmentCache
+
+    enricher = CountingEnricher()
+    cache = EnrichmentCache(temp_db)
+    _run(enrich_articles([{"title": "Story", "description": "<p>Body  text</p>"}], enricher, cache=cache))
+    # Same content with different markup and spacing is a hit
+    enriched = _run(enrich_articles([{"title": "story", "description": "Body text"}], enricher, cache=cache))
+    assert enricher.calls == 1
+    assert enriched[0]["derived_summary"] == "Summary of Story"
+    assert cache.stats() == {"hits": 1, "misses": 1, "hit_rate": 0.5}
+
+    # A new prompt version misses and purges the old rows
+    new_prompt = CountingEnricher(namespace="v2")
+    _run(enrich_articles([{"title": "Story", "description": "Body text"}], new_prompt, cache=EnrichmentCache(temp_db)))
+    assert new_prompt.calls == 1
+    import sqlite3
+    with sqlite3.connect(temp_db) as conn:
+        assert conn.execute("SELECT namespace FROM enrichment_cache").fetchall() == [("v2",)]
+
+def test_enrichment_cache_evicts_least_recently_used(temp_db):
+    from enrichment.cache import EnrichmentCache
+
+    cache = EnrichmentCache(temp_db, max_entries=10)
+    enricher = CountingEnricher()
+    for i in range(11):
+        cache.put(cache.make_key(f"Title {i}", "", enricher), enricher, ("k", "low", "s"))
+    import sqlite3
+    with sqlite3.connect(temp_db) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM enrichment_cache").fetchone()[0] == 9
+
+def test_enrichment_cache_batches_hit_updates(temp_db):
+    import sqlite3
+    from enrichment.cache import EnrichmentCache
+
+    cache = EnrichmentCache(temp_db)
+    enricher = CountingEnricher()
+    key = cache.make_key("Story", "", enricher)
+    cache.put(key, enricher, ("k", "low", "s"))
+    with sqlite3.connect(temp_db) as conn:
+        for _ in range(3):
+            assert cache.get(key) == ("k", "low", "s")
+        assert conn.execute("SELECT hits FROM enrichment_cache").fetchone()[0] == 0
+        cache.flush()
+        assert conn.execute("SELECT hits FROM enrichment_cache").fetchone()[0] == 3
+
+def test_heuristic_enricher_categories_importance_and_summary():
+    from enrichment.heuristic import HeuristicEnricher
+    enricher = HeuristicEnricher(max_summary_words=20)
+
+    keyword, importance, summary = enricher.enrich_sync(
+        "Breaking: earthquake kills dozens as emergency teams evacuate coastal towns",
+        "<p>A powerful earthquake struck on Monday. Emergency teams were sent to the coast. "
+        "Officials said dozens of people were killed and thousands were told to evacuate their homes.</p>"
+    )
+    assert importance == "high"
+    assert len(summary.split()) <= 20 and "<p>" not in summary
+
+    assert enricher.enrich_sync("Striker scores twice as team wins the league cup final",
+                                "The football season ended with a cup win.")[:2] == ("sport", "low")
+    assert enricher.enrich_sync("Apple unveils new AI chips for its smartphone range", "")[0] == "technology"
+    assert enricher.prescore("Breaking: war", "") > enricher.prescore("Gardening tips", "")
+
+def test_create_enricher_local_provider(temp_db):
+    import sqlite3
+    from enrichment.heuristic import HeuristicEnricher
+    from enrichment.llm_enrichment import create_enricher
+    with sqlite3.connect(temp_db) as conn:
+        conn.execute("UPDATE app_config SET value = 'local' WHERE key = 'llm_provider'")
+    assert isinstance(create_enricher(db_name=temp_db), HeuristicEnricher)
@@ -41,9 +41,12 @@ def test_concurrent_feed_parsing(mock_parse):
         return feedparser.parse(url)
 
     urls = ["http://example.com/rss1", "http://example.com/rss2"]
-    loop = asyncio.get_event_loop()
     tasks = [fetch_feed(url) for url in urls]
-    results = loop.run_until_complete(asyncio.gather(*tasks))
+
+    async def gather_all():
+        return await asyncio.gather(*tasks)
+
+    results = asyncio.run(gather_all())
     for result in results:
         assert result.bozo == 0
         assert len(result.entries) > 0
@@ -89,4 +92,193 @@ def test_feedparser_exception_handling(mock_parse):
     mock_parse.side_effect = Exception("Feedparser Error")
     with pytest.raises(Exception) as exc_info:
         feedparser.parse("http://example.com/rss")
-    assert "Feedparser Error" in str(exc_info.value)
\ No newline at end of file
+    assert "Feedparser Error" in str(exc_info.value)
+
+SAMPLE_RSS = b"""<?xml version="1.0"?>
+<rss version="2.0"><channel><title>Test</title>
+<item><title>Item 1</title><link>http://example.com/1</link><description>One</description></item>
+</channel></rss>"""
+
+def _feed_db(tmp_path, feed_urls):
+    from db.database import initialize_database
+    import sqlite3
+    db_file = str(tmp_path / "feeds.sqlite")
+    initialize_database(db_file)
+    with sqlite3.connect(db_file) as conn:
+        conn.executemany(
+            "INSERT INTO rss_sources (feed_url, source_name) VALUES (?, ?)",
+            [(url, url) for url in feed_urls]
+        )
+    return db_file
+
+async def _serve(handler):
+    from aiohttp import web
+    app = web.Application()
+    app.router.add_get("/{name}", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}"
+
+def test_fetch_rss_conditional_get(tmp_path):
+    from aiohttp import web
+    from ingestion.fetch_rss import fetch_rss, close_session
+
+    async def handler(request):
+        name = request.match_info["name"]
+        # "etag" honours validators, "noetag" always resends the same body
+        if name == "etag":
+            if request.headers.get("If-None-Match") == '"v1"':
+                return web.Response(status=304)
+            return web.Response(body=SAMPLE_RSS, headers={"ETag": '"v1"'})
+        return web.Response(body=SAMPLE_RSS)
+
+    async def run():
+        runner, base = await _serve(handler)
+        try:
+            urls = [f"{base}/etag", f"{base}/noetag"]
+            db_file = _feed_db(tmp_path, urls)
+
+            first_stats, second_stats = {}, {}
+            first = await fetch_rss(urls, db_name=db_file, stats=first_stats)
+            second = await fetch_rss(urls, db_name=db_file, stats=second_stats)
+            return first, first_stats, second, second_stats
+        finally:
+            await close_session()
+            await runner.cleanup()
+
+    first, first_stats, second, second_stats = asyncio.run(run())
+    assert len(first) == 2
+    assert first_stats["not_modified"] == 0 and first_stats["unchanged"] == 0
+    assert second == []
+    assert second_stats["not_modified"] == 1
+    assert second_stats["unchanged"] == 1
+
+def test_fetch_rss_keeps_validators_until_entries_are_stored(tmp_path, monkeypatch):
+    from aiohttp import web
+    import ingestion.fetch_rss as fetch_module
+    from ingestion.fetch_rss import fetch_rss, close_session
+    polls = []
+    real_record_poll = fetch_module.record_poll
+
+    def counting_record_poll(feed_url, entries, db_name="news_ingestion.db"):
+        polls.append(len(entries))
+        return real_record_poll(feed_url, entries, db_name)
+    monkeypatch.setattr(fetch_module, "record_poll", counting_record_poll)
+
+    async def handler(request):
+        if request.headers.get("If-None-Match") == '"v1"':
+            return web.Response(status=304)
+        return web.Response(body=SAMPLE_RSS, headers={"ETag": '"v1"'})
+
+    async def failing_store(url, entries):
+        raise RuntimeError("disk full")
+
+    async def run():
+        runner, base = await _serve(handler)
+        try:
+            urls = [f"{base}/feed"]
+            db_file = _feed_db(tmp_path, urls)
+            first_stats, second_stats = {}, {}
+            await fetch_rss(urls, db_name=db_file, stats=first_stats, on_feed=failing_store)
+            second = await fetch_rss(urls, db_name=db_file, stats=second_stats)
+            return first_stats, second, second_stats
+        finally:
+            await close_session()
+            await runner.cleanup()
+
+    first_stats, second, second_stats = asyncio.run(run())
+    assert first_stats["failed"] == 1
+    # Each poll is recorded once, the failed one with no entries
+    assert polls == [0, 1]
+    # The entries were lost, so the next poll downloads and parses the feed again
+    assert len(second) == 1
+    assert second_stats["not_modified"] == 0 and second_stats["unchanged"] == 0
+
+def test_fetch_rss_isolates_failing_feed(tmp_path):
+    from aiohttp import web
+    from ingestion.fetch_rss import fetch_rss, close_session
+
+    calls = {"good": 0, "missing": 0}
+
+    async def handler(request):
+        name = request.match_info["name"]
+        calls[name] += 1
+        if name == "missing":
+            return web.Response(status=404)
+        return web.Response(body=SAMPLE_RSS)
+
+    async def run():
+        runner, base = await _serve(handler)
+        try:
+            urls = [f"{base}/good", f"{base}/missing"]
+            db_file = _feed_db(tmp_path, urls)
+            stats = {}
+            entries = await fetch_rss(urls, db_name=db_file, stats=stats)
+            return entries, stats
+        finally:
+            await close_session()
+            await runner.cleanup()
+
+    entries, stats = asyncio.run(run())
+    assert len(entries) == 1
+    assert stats["failed"] == 1
+    feeds = {feed["feed_url"].rsplit("/", 1)[1]: feed for feed in stats["feeds"]}
+    assert feeds["good"]["status"] == 200 and feeds["good"]["bytes"] == len(SAMPLE_RSS)
+    assert feeds["good"]["entries"] == 1 and feeds["good"]["latency_ms"] > 0
+    assert "404" in feeds["missing"]["error"]
+    # A 404 is permanent, so neither feed is fetched more than once
+    assert calls == {"good": 1, "missing": 1}
+
+def test_stream_parser_stops_at_limit():
+    from ingestion.stream_parser import parse_feed_document
+    items = "".join(
+        f"<item><title>Item {i}</title><link>http://example.com/{i}</link>"
+        f"<description>Body {i}</description><pubDate>Mon, 16 Dec 2024 10:00:00 GMT</pubDate></item>"
+        for i in range(50)
+    )
+    # Garbage after the requested items is never reached
+    body = f"<rss version='2.0'><channel>{items}<item><title>broken".encode()
+    entries = parse_feed_document(body, limit=2, mode="stream")
+    assert [e["title"] for e in entries] == ["Item 0", "Item 1"]
+    assert entries[0]["link"] == "http://example.com/0"
+    assert entries[0]["summary"] == "Body 0"
+    assert entries[0]["published"] == "Mon, 16 Dec 2024 10:00:00 GMT"
+
+def test_stream_parser_atom_links():
+    from ingestion.stream_parser import parse_feed_document
+    body = b"""<feed xmlns="http://www.w3.org/2005/Atom"><title>Atom</title>
+    <entry><id>urn:entry:1</id><title>Atom entry</title>
+    <link rel="self" href="http://example.com/self"/><link rel="alternate" href="http://example.com/a"/>
+    <summary>Short</summary><published>2024-12-12T23:05:14-05:00</published></entry></feed>"""
+    entries = parse_feed_document(body, limit=5, mode="stream")
+    assert entries == [{
+        "id": "urn:entry:1",
+        "title": "Atom entry",
+        "link": "http://example.com/a",
+        "summary": "Short",
+        "published": "2024-12-12T23:05:14-05:00",
+    }]
+
+def test_stream_parser_falls_back_to_feedparser():
+    from ingestion.stream_parser import parse_feed_document
+    # &nbsp; is not an XML entity, so the strict parser rejects the document
+    body = b"""<?xml version="1.0"?><rss version="2.0"><channel>
+    <item><title>Caf&eacute; news</title><link>http://example.com/1</link></item>
+    </channel></rss>"""
+    entries = parse_feed_document(body, limit=2, mode="stream")
+    assert len(entries) == 1
+    assert entries[0]["link"] == "http://example.com/1"
+
+@pytest.mark.parametrize("kind", ["inline", "thread", "process"])
+def test_parse_executor_returns_compact_entries(kind):
+    from ingestion.parse_executor import get_parse_executor, parse_in_executor, shutdown_parse_executor
+    try:
+        executor = get_parse_executor(kind)
+        entries = asyncio.run(parse_in_executor(SAMPLE_RSS, 5, executor))
+    finally:
+        shutdown_parse_executor()
+    assert entries == [{"title": "Item 1", "link": "http://example.com/1", "summary": "One"}]
+    assert all(type(entry) is dict for entry in entries)
@@ -0,0 +1,151 @@
+import asyncio
+import sqlite3
+import time
+from enrichment.budget import LLMBudget
+from enrichment.job_queue import EnrichmentQueue, drain_enrichment_queue
+from parsing.parse_data import store_parsed_articles
+
+class FlakyEnricher:
+    """Stub enricher that fails for titles listed in `failing`"""
+    max_summary_words = 100
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.titles = []
+
+    def cache_namespace(self):
+        return "flaky"
+
+    async def enrich_content(self, title, description, max_words=None):
+        self.titles.append(title)
+        if title in self.failing:
+            return None
+        if title.startswith("Misc"):
+            return "uncategorized", "low", f"Summary of {title}"
+        return "tech", "high", f"Summary of {title}"
+
+    async def enrich_batch(self, items, max_words=None):
+        return [await self.enrich_content(title, description) for title, description in items]
+
+def _store(db_file, titles, published_ts=None):
+    now = int(time.time())
+    articles = [
+        {"title": title, "description": "Body", "source": "https://feed/rss", "link": f"http://x/{i}",
+         "published_ts": published_ts[i] if published_ts else now}
+        for i, title in enumerate(titles)
+    ]
+    asyncio.run(store_parsed_articles(articles, db_name=db_file))
+
+def _statuses(db_file):
+    with sqlite3.connect(db_file) as conn:
+        return dict(conn.execute("SELECT title, enrichment_status FROM parsed_articles").fetchall())
+
+def test_articles_stored_pending_and_leased_newest_first(temp_db):
+    _store(temp_db, ["Old", "New", "Middle"], published_ts=[100, 300, 200])
+    assert set(_statuses(temp_db).values()) == {"pending"}
+
+    queue = EnrichmentQueue(temp_db)
+    assert [job["title"] for job in queue.lease("w1", limit=2)] == ["New", "Middle"]
+    assert [job["title"] for job in queue.lease("w2", limit=2)] == ["Old"]
+    assert queue.lease("w3") == []
+    assert queue.stats() == {"queued": 0, "leased": 3, "dead": 0}
+
+def test_expired_lease_is_taken_over(temp_db):
+    _store(temp_db, ["Story"])
+    queue = EnrichmentQueue(temp_db, lease_seconds=1)
+    first = queue.lease("crashed-worker")
+    assert len(first) == 1
+
+    with sqlite3.connect(temp_db) as conn:
+        conn.execute("UPDATE enrichment_jobs SET lease_expires_at = ?", (int(time.time()) - 1,))
+    second = queue.lease("w2")
+    assert [job["id"] for job in second] == [first[0]["id"]]
+    assert second[0]["attempts"] == 2
+
+def test_drain_completes_jobs_and_dead_letters_failures(temp_db):
+    _store(temp_db, ["Good", "Bad", "Misc"])
+    enricher = FlakyEnricher(failing={"Bad"})
+    queue = EnrichmentQueue(temp_db, max_attempts=2)
+
+    # Only a reported failure is retried; an 'uncategorized' answer is a result
+    counts = asyncio.run(drain_enrichment_queue(enricher, temp_db, workers=2, batch_size=1, queue=queue))
+    assert (counts["enriched"], counts["local"], counts["failed"]) == (2, 0, 1)
+    assert _statuses(temp_db) == {"Good": "done", "Bad": "pending", "Misc": "done"}
+    assert queue.stats()["queued"] == 1
+
+    # The retry waits for its backoff; make it due, then fail it for good
+    with sqlite3.connect(temp_db) as conn:
+        conn.execute("UPDATE enrichment_jobs SET available_at = 0")
+    asyncio.run(drain_enrichment_queue(enricher, temp_db, workers=1, batch_size=1, queue=queue))
+    assert _statuses(temp_db)["Bad"] == "failed"
+    assert queue.stats() == {"queued": 0, "leased": 0, "dead": 1}
+    assert enricher.titles.count("Good") == 1
+
+    with sqlite3.connect(temp_db) as conn:
+        row = conn.execute("SELECT keywords, derived_summary FROM parsed_articles WHERE title = 'Good'").fetchone()
+    assert row == ("tech", "Summary of Good")
+
+    assert queue.requeue_dead() == 1
+    assert _statuses(temp_db)["Bad"] == "pending"
+
+class MeteredEnricher(FlakyEnricher):
+    """Stub paid enricher that reports usage like AnthropicEnricher"""
+
+    def __init__(self):
+        super().__init__()
+        self.usage = {"requests": 0, "input_tokens": 0, "output_tokens": 0}
+
+    async def enrich_content(self, title, description, max_words=None):
+        self.usage["requests"] += 1
+        self.usage["input_tokens"] += 50
+        self.usage["output_tokens"] += 20
+        return await super().enrich_content(title, description, max_words)
+
+def test_source_priority_and_prescore_order_jobs(temp_db):
+    with sqlite3.connect(temp_db) as conn:
+        conn.execute("INSERT INTO rss_sources (feed_url, source_name, priority) VALUES ('https://wire/rss', 'Wire', 1)")
+    now = int(time.time())
+    articles = [
+        {"title": "Gardening tips", "description": "", "source": "https://feed/rss", "published_ts": now},
+        {"title": "Breaking: earthquake kills dozens", "description": "", "source": "https://feed/rss",
+         "published_ts": now - 600},
+        {"title": "Wire story", "description": "", "source": "https://wire/rss", "published_ts": now - 1800},
+    ]
+    asyncio.run(store_parsed_articles(articles, db_name=temp_db))
+
+    jobs = EnrichmentQueue(temp_db).lease("w1", limit=3)
+    assert [job["title"] for job in jobs] == ["Breaking: earthquake kills dozens", "Wire story", "Gardening tips"]
+
+def test_budget_caps_llm_calls_and_enriches_rest_locally(temp_db):
+    _store(temp_db, ["First", "Second", "Third"], published_ts=[300, 200, 100])
+    enricher = MeteredEnricher()
+    budget = LLMBudget(temp_db, calls_per_hour=0, tokens_per_hour=0, calls_per_run=1, tokens_per_run=0)
+
+    counts = asyncio.run(drain_enrichment_queue(enricher, temp_db, workers=1, batch_size=1, budget=budget))
+    assert (counts["enriched"], counts["local"], counts["failed"]) == (1, 2, 0)
+    assert (counts["llm_requests"], counts["input_tokens"], counts["output_tokens"]) == (1, 50, 20)
+    assert enricher.titles == ["First"]  # The newest article got the LLM call
+    assert set(_statuses(temp_db).values()) == {"done"}
+    assert budget.spent_last_hour() == (1, 70)
+
+    # Deferring leaves over-budget articles queued instead
+    _store(temp_db, ["Fourth"])
+    deferred = LLMBudget(temp_db, calls_per_hour=1, overflow="defer")
+    counts = asyncio.run(drain_enrichment_queue(enricher, temp_db, workers=1, budget=deferred))
+    assert counts["enriched"] == 0 and _statuses(temp_db)["Fourth"] == "pending"
+
+def test_concurrent_workers_do_not_overshoot_the_budget(temp_db):
+    _store(temp_db, [f"Story {i}" for i in range(8)])
+
+    class SlowMeteredEnricher(MeteredEnricher):
+        async def enrich_content(self, title, description, max_words=None):
+            await asyncio.sleep(0.05)  # Every worker is mid-call before the first one records its spend
+            return await super().enrich_content(title, description, max_words)
+
+    enricher = SlowMeteredEnricher()
+    budget = LLMBudget(temp_db, calls_per_hour=0, tokens_per_hour=0, calls_per_run=2, tokens_per_run=0)
+    counts = asyncio.run(drain_enrichment_queue(enricher, temp_db, workers=4, batch_size=1, budget=budget))
+    # Local workers may drain the queue before a second LLM batch is leased
+    assert 1 <= counts["llm_requests"] <= 2
+    assert counts["enriched"] == counts["llm_requests"] and counts["enriched"] + counts["local"] == 8
+    assert (budget.reserved_calls, budget.reserved_tokens) == (0, 0)
@@ -0,0 +1,49 @@
+import sqlite3
+import threading
+import pytest
+from db import migrations
+from db.migrations import migrate, get_schema_version, latest_version
+
+def _plan(db_file, query, params=()):
+    with sqlite3.connect(db_file) as conn:
+        return " ".join(row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params))
+
+def test_fresh_database_is_at_latest_version_and_uses_indexes(temp_db):
+    assert get_schema_version(temp_db) == latest_version() >= 1
+    assert migrate(temp_db) == []
+
+    assert "idx_parsed_articles_canonical_published" in _plan(
+        temp_db, "SELECT id FROM parsed_articles WHERE canonical_id IS NULL AND published_ts >= ?", (0,))
+    # Undated stories are ranked by parse time in a branch of their own
+    assert "parsed_at>?" in _plan(temp_db, "SELECT id FROM parsed_articles WHERE canonical_id IS NULL "
+                                           "AND published_ts IS NULL AND parsed_at >= ?", ("2024-01-01",))
+    assert "idx_parsed_articles_source_published" in _plan(
+        temp_db, "SELECT id FROM parsed_articles WHERE source = ? ORDER BY published_ts DESC", ("s",))
+    assert "idx_parsed_articles_importance" in _plan(
+        temp_db, "SELECT id FROM parsed_articles WHERE importance = 'high'")
+    assert "idx_parsed_articles_link" in _plan(temp_db, "SELECT id FROM parsed_articles WHERE link = ?", ("l",))
+
+def test_failed_migration_rolls_back_and_others_wait(temp_db, monkeypatch):
+    def broken(cursor):
+        cursor.execute("CREATE TABLE half_done (id INTEGER)")
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(migrations, "MIGRATIONS", list(migrations.MIGRATIONS))
+    migrations.migration(latest_version() + 1, "Broken")(broken)
+    with pytest.raises(RuntimeError):
+        migrate(temp_db)
+    assert get_schema_version(temp_db) == latest_version() - 1
+    with sqlite3.connect(temp_db) as conn:
+        assert not conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'half_done'").fetchone()
+
+    # Several processes starting at once apply a new migration exactly once
+    calls = []
+    migrations.MIGRATIONS[-1] = (latest_version(), "Working", lambda cursor: calls.append(1))
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(migrate(temp_db))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert calls == [1]
+    assert sorted(results) == [[], [], [], [latest_version()]]
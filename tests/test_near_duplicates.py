@@ -0,0 +1,71 @@
+import asyncio
+import sqlite3
+import time
+from parsing.near_duplicates import simhash, hamming_distance, mark_near_duplicates, MAX_DISTANCE
+from parsing.parse_data import store_parsed_articles
+from enrichment.job_queue import EnrichmentQueue
+
+WIRE_STORY = {
+    "title": "Central bank raises interest rates by a quarter point to curb inflation",
+    "description": "The central bank raised its benchmark interest rate by 0.25 percentage points on "
+                   "Thursday, citing persistent inflation and a tight labour market, and signalled "
+                   "that further increases could follow later this year.",
+}
+
+def test_simhash_similar_and_different_text():
+    base = simhash(f"{WIRE_STORY['title']} {WIRE_STORY['description']}")
+    edited = simhash(f"{WIRE_STORY['title']} {WIRE_STORY['description'].replace('Thursday', 'Thursday,')} <b></b>")
+    other = simhash("Local football club wins the cup after dramatic penalty shootout")
+    assert hamming_distance(base, edited) <= MAX_DISTANCE
+    assert hamming_distance(base, other) > MAX_DISTANCE
+    assert simhash("") is None
+
+def test_cross_source_duplicate_linked_and_hidden(temp_db):
+    canonical = dict(WIRE_STORY, source="https://bbc/rss", link="http://bbc/1",
+                     published_ts=int(time.time()), keywords="economy", importance="high",
+                     derived_summary="Rates up.")
+    mark_near_duplicates([canonical], temp_db)
+    assert "canonical_id" not in canonical
+    asyncio.run(store_parsed_articles([canonical], db_name=temp_db))
+
+    repeat = dict(WIRE_STORY, source="https://prnewswire/rss", link="http://prn/1",
+                  published_ts=int(time.time()))
+    repeat["title"] = repeat["title"].upper()
+    assert mark_near_duplicates([repeat], temp_db) == 1
+    assert repeat["keywords"] == "economy" and repeat["derived_summary"] == "Rates up."
+    asyncio.run(store_parsed_articles([repeat], db_name=temp_db))
+
+    with sqlite3.connect(temp_db) as conn:
+        rows = conn.execute("SELECT source, canonical_id FROM parsed_articles ORDER BY id").fetchall()
+    canonical_id = rows[0][1]
+    assert canonical_id is None
+    assert rows[1][1] is not None
+
+    from ranking.rank import ArticleRanker
+    shown = ArticleRanker().fetch_articles_from_db(temp_db)
+    assert [article["source"] for article in shown] == ["https://bbc/rss"]
+
+def test_duplicate_stored_after_its_canonical_completed(temp_db):
+    canonical = dict(WIRE_STORY, source="https://bbc/rss", link="http://bbc/1", published_ts=int(time.time()))
+    mark_near_duplicates([canonical], temp_db)
+    asyncio.run(store_parsed_articles([canonical], db_name=temp_db))
+
+    # The repeat is parsed while the canonical is still pending...
+    repeat = dict(WIRE_STORY, source="https://prnewswire/rss", link="http://prn/1", published_ts=int(time.time()))
+    assert mark_near_duplicates([repeat], temp_db) == 1 and "keywords" not in repeat
+    # ...then the canonical is enriched before the repeat is stored
+    queue = EnrichmentQueue(temp_db)
+    job = queue.lease("worker")[0]
+    queue.complete(job, ("economy", "high", "Rates up."))
+    asyncio.run(store_parsed_articles([repeat], db_name=temp_db))
+
+    # An orphaned repeat (its canonical was archived) gets a job of its own
+    orphan = dict(WIRE_STORY, title="Rates story", source="https://other/rss", canonical_id=999999)
+    asyncio.run(store_parsed_articles([orphan], db_name=temp_db))
+
+    with sqlite3.connect(temp_db) as conn:
+        assert conn.execute("SELECT keywords, enrichment_status FROM parsed_articles WHERE source = ?",
+                            ("https://prnewswire/rss",)).fetchone() == ("economy", "done")
+        queued = conn.execute("SELECT p.source FROM enrichment_jobs j "
+                              "JOIN parsed_articles p ON p.id = j.article_id").fetchall()
+    assert queued == [("https://other/rss",)]
@@ -23,33 +23,41 @@ def temp_db(tmp_path):
     yield str(db_file)  # Provide the database file path to the test
     connection.close()  # Close the connection after the test
 
-def test_parse_feed():
+@pytest.fixture
+def feed_db(tmp_path):
+    # parse_feed looks up stored articles, so give it a real schema
+    from db.database import initialize_database
+    db_file = str(tmp_path / "feed.sqlite")
+    initialize_database(db_file)
+    return db_file
+
+def test_parse_feed(feed_db):
     # Test feed with one valid and one invalid entry
     sample_feed_entries = [
         {"title": "Valid Title", "summary": "Valid Summary", "link": "http://example.com", "pubDate": "2024-01-01"},
         {"title": "", "summary": "Invalid Article", "link": None, "pubDate": "2024-01-02"},
     ]
     rss_feed = "https://example.com/rss"  # Example RSS feed URL
-    parsed = parse_feed(sample_feed_entries, rss_feed)  # Pass rss_feed argument
+    parsed = parse_feed(sample_feed_entries, rss_feed, db_name=feed_db)  # Pass rss_feed argument
     assert len(parsed) == 1, f"Expected 1 valid article, got {len(parsed)}"
     assert parsed[0]["title"] == "Valid Title"
 
-def test_parse_feed_with_missing_fields():
+def test_parse_feed_with_missing_fields(feed_db):
     # Test feed with missing or malformed fields
     sample_feed_entries = [
         {"title": None, "summary": None, "link": None, "pubDate": None},
         {"title": "Valid Title", "summary": "Valid Summary", "link": "http://example.com", "pubDate": "2024-01-01"},
     ]
     rss_feed = "https://example.com/rss"  # Example RSS feed URL
-    parsed = parse_feed(sample_feed_entries, rss_feed)  # Pass rss_feed argument
+    parsed = parse_feed(sample_feed_entries, rss_feed, db_name=feed_db)  # Pass rss_feed argument
     assert len(parsed) == 1, "Should parse only valid articles"
     assert parsed[0]["title"] == "Valid Title", "The title of the valid article should be 'Valid Title'"
 
-def test_parse_feed_malformed_data():
+def test_parse_feed_malformed_data(feed_db):
     # Explicitly test malformed data formats
     malformed_feed_entries = [{"malformed_field": "Unexpected Data"}]
     rss_feed = "https://example.com/rss"  # Example RSS feed URL
-    parsed = parse_feed(malformed_feed_entries, rss_feed)  # Pass rss_feed argument
+    parsed = parse_feed(malformed_feed_entries, rss_feed, db_name=feed_db)  # Pass rss_feed argument
     assert len(parsed) == 0, "Malformed entries should not be parsed"
 
 def test_store_parsed_article_content(temp_db):
@@ -92,4 +100,85 @@ def test_store_parsed_articles(temp_db):
         cursor = conn.cursor()
         cursor.execute("SELECT COUNT(*) FROM parsed_articles")
         count = cursor.fetchone()[0]
-        assert count == 2, "Expected 2 articles to be stored in the database"
\ No newline at end of file
+        assert count == 2, "Expected 2 articles to be stored in the database"
+
+@pytest.mark.parametrize("raw, expected", [
+    ("Mon, 16 Dec 2024 10:00:00 GMT", ("2024-12-16T10:00:00Z", 1734343200)),
+    ("Mon, 16 Dec 2024 10:00:00 +0100", ("2024-12-16T09:00:00Z", 1734339600)),
+    ("2024-12-12T23:05:14-05:00", ("2024-12-13T04:05:14Z", 1734062714)),
+    ("not a date", (None, None)),
+    (None, (None, None)),
+])
+def test_normalize_published_date(raw, expected):
+    from parsing.parse_data import normalize_published_date
+    assert normalize_published_date(raw) == expected
+
+def test_backfill_published_ts(tmp_path):
+    from db.database import initialize_database
+    db_file = str(tmp_path / "legacy.sqlite")
+    with sqlite3.connect(db_file) as conn:
+        conn.execute('''
+            CREATE TABLE parsed_articles (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT NOT NULL, description TEXT,
+                source TEXT NOT NULL, link TEXT, published_date TIMESTAMP,
+                parsed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, derived_summary TEXT,
+                keywords TEXT, importance TEXT, UNIQUE(title, source)
+            )
+        ''')
+        conn.executemany(
+            "INSERT INTO parsed_articles (title, source, published_date) VALUES (?, ?, ?)",
+            [("Old", "s", "16 Dec 2024 10:00"), ("Unknown", "s", "Unknown Date")]
+        )
+    initialize_database(db_file)
+    with sqlite3.connect(db_file) as conn:
+        rows = dict(conn.execute("SELECT title, published_ts FROM parsed_articles"))
+    assert rows == {"Old": 1734343200, "Unknown": None}
+
+def test_parse_feed_skips_stored_and_repeated_titles(feed_db):
+    with sqlite3.connect(feed_db) as conn:
+        conn.executemany(
+            "INSERT INTO parsed_articles (title, source) VALUES (?, ?)",
+            [("Stored", "https://example.com/rss"), ("New", "https://other.com/rss")]
+        )
+    entries = [
+        {"title": "Stored", "link": "http://a"},
+        {"title": "New", "link": "http://b"},
+        {"title": "New", "link": "http://c"},
+    ]
+    parsed = parse_feed(entries, "https://example.com/rss", limit=None, db_name=feed_db)
+    assert [article["link"] for article in parsed] == ["http://b"]
+
+def test_get_existing_articles_batches(feed_db, monkeypatch):
+    import parsing.parse_data as parse_data
+    monkeypatch.setattr(parse_data, "DEDUP_BATCH_SIZE", 3)
+    with sqlite3.connect(feed_db) as conn:
+        conn.executemany(
+            "INSERT INTO parsed_articles (title, source) VALUES (?, ?)",
+            [(f"T{i}", "s") for i in range(0, 10, 2)]
+        )
+    found = parse_data.get_existing_articles([(f"T{i}", "s") for i in range(10)], feed_db)
+    assert found == {(f"T{i}", "s") for i in range(0, 10, 2)}
+
+def test_store_upserts_in_place_and_counts_changes(feed_db):
+    import asyncio
+    first = [
+        {"title": "Kept", "description": "Same", "source": "s", "link": "http://a", "published_ts": 100},
+        {"title": "Edited", "description": "Old", "source": "s", "link": "http://b", "published_ts": 100},
+    ]
+    assert asyncio.run(store_parsed_articles(first, db_name=feed_db)) == {"inserted": 2, "updated": 0, "unchanged": 0}
+    with sqlite3.connect(feed_db) as conn:
+        ids = dict(conn.execute("SELECT title, id FROM parsed_articles"))
+        conn.execute("UPDATE parsed_articles SET keywords = 'tech', enrichment_status = 'done' WHERE title = 'Edited'")
+
+    second = [dict(first[0]), dict(first[1], description="New"),
+              {"title": "Fresh", "description": "", "source": "s", "link": "http://c", "published_ts": 200}]
+    assert asyncio.run(store_parsed_articles(second, db_name=feed_db)) == {"inserted": 1, "updated": 1, "unchanged": 1}
+
+    with sqlite3.connect(feed_db) as conn:
+        rows = {row[0]: row[1:] for row in conn.execute(
+            "SELECT title, id, description, keywords, enrichment_status FROM parsed_articles")}
+        jobs = conn.execute("SELECT COUNT(*) FROM enrichment_jobs").fetchone()[0]
+    assert rows["Kept"][0] == ids["Kept"]
+    # Updated in place: same id, new content, enrichment kept
+    assert rows["Edited"] == (ids["Edited"], "New", "tech", "done")
+    assert jobs == 3  # Only the new article was queued again
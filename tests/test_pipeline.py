@@ -55,6 +55,111 @@ async def test_pipeline(mock_store, mock_fetch):
     # Ensure store_parsed_articles was called once with the correct arguments
     mock_store.assert_called_once_with(parsed_articles)
 
+def test_refresh_streams_feeds_through_stages(temp_db, monkeypatch):
+    import sqlite3
+    from config.settings import Config
+    from enrichment.llm_enrichment import LLMEnricher
+    from pipeline.rss_manager import refresh_rss_feeds
+    monkeypatch.setattr(Config, "STORE_FLUSH_SECONDS", 0.05)
+
+    def stored():
+        with sqlite3.connect(temp_db) as conn:
+            return conn.execute("SELECT COUNT(*) FROM parsed_articles").fetchone()[0]
+
+    stored_before_slow_feed = []
+
+    async def fetcher(rss_sources, db_name=None, stats=None, entry_limit=None, on_feed=None):
+        stats.update({"fetched": 2, "not_modified": 0, "unchanged": 0})
+        fast = [{"title": f"Fast {i}", "link": f"http://fast/{i}", "summary": "Body"} for i in range(2)]
+        await on_feed("https://fast/rss", fast)
+        await asyncio.sleep(0.3)  # A slow publisher
+        stored_before_slow_feed.append(stored())
+        await on_feed("https://slow/rss", [{"title": "Slow", "link": "http://slow/1", "summary": "Body"}])
+        return []
+
+    class SlowEnricher(LLMEnricher):
+        max_summary_words = 100
+
+        async def enrich_content(self, title, description, max_words=None):
+            await asyncio.sleep(0.2)
+            return "tech", "high", f"Summary of {title}"
+
+    message = asyncio.run(refresh_rss_feeds(
+        SlowEnricher(), rss_sources=["https://fast/rss", "https://slow/rss"], fetcher=fetcher, db_name=temp_db
+    ))
+    assert "successfully" in message
+    # The fast feed was stored while the slow one was still downloading
+    assert stored_before_slow_feed == [2]
+    with sqlite3.connect(temp_db) as conn:
+        statuses = conn.execute("SELECT enrichment_status FROM parsed_articles").fetchall()
+    assert statuses == [("done",)] * 3
+
+    # The run is recorded with per-stage timings and counters, and served as JSON
+    import base64
+    from frontend.app import create_app
+    monkeypatch.setattr(Config, "ADMIN_USERNAME", "admin")
+    monkeypatch.setattr(Config, "ADMIN_PASSWORD", "secret")
+    headers = {"Authorization": "Basic " + base64.b64encode(b"admin:secret").decode()}
+    with create_app(db_path=temp_db).test_client() as client:
+        runs = client.get("/api/pipeline_runs", headers=headers).get_json()
+        assert len(runs) == 1
+        run = runs[0]
+        assert run["status"] == "ok" and run["trigger"] == "refresh"
+        assert (run["entries"], run["articles_parsed"], run["articles_stored"], run["articles_enriched"]) == (3, 3, 3, 3)
+        assert run["enrich_seconds"] >= 0.2 and run["duration_seconds"] >= 0.3
+        assert client.get(f"/api/pipeline_runs/{run['id']}", headers=headers).get_json()["feeds"] == []
+        assert client.get("/admin", headers=headers).status_code == 200
+        assert client.get("/api/pipeline_runs").status_code == 401
+
+def test_refresh_links_the_same_story_from_two_feeds(temp_db):
+    import sqlite3
+    from enrichment.job_queue import EnrichmentQueue
+    from pipeline.rss_manager import refresh_rss_feeds
+    story = {"title": "Storm closes the harbour for the weekend",
+             "summary": "Ferries are cancelled and ships wait offshore as the storm passes the coast"}
+
+    async def fetcher(rss_sources, db_name=None, stats=None, entry_limit=None, on_feed=None):
+        # Both feeds are parsed before either copy is stored
+        await asyncio.gather(*(on_feed(source, [{**story, "link": f"{source}/storm"}]) for source in rss_sources))
+        return []
+
+    asyncio.run(refresh_rss_feeds(None, rss_sources=["https://a/rss", "https://b/rss"], fetcher=fetcher,
+                                  db_name=temp_db))
+    with sqlite3.connect(temp_db) as conn:
+        rows = conn.execute("SELECT id, canonical_id FROM parsed_articles ORDER BY id").fetchall()
+    assert rows == [(rows[0][0], None), (rows[1][0], rows[0][0])]
+    assert [job["article_id"] for job in EnrichmentQueue(temp_db).lease("w1", limit=10)] == [rows[0][0]]
+
+def test_refresh_cancels_stages_when_one_fails(temp_db, monkeypatch):
+    from config.settings import Config
+    from enrichment.llm_enrichment import LLMEnricher
+    import pipeline.rss_manager as rss_manager
+    monkeypatch.setattr(Config, "PIPELINE_QUEUE_SIZE", 1)
+    monkeypatch.setattr(Config, "STORE_BATCH_SIZE", 1)
+
+    async def failing_store(articles, db_name=None):
+        raise RuntimeError("disk full")
+    monkeypatch.setattr(rss_manager, "store_parsed_articles", failing_store)
+
+    async def fetcher(rss_sources, db_name=None, stats=None, entry_limit=None, on_feed=None):
+        for i in range(10):
+            await on_feed(f"https://feed{i}/rss", [{"title": f"Story {i}", "link": f"http://x/{i}"}])
+        return []
+
+    class IdleEnricher(LLMEnricher):
+        async def enrich_content(self, title, description, max_words=None):
+            return "tech", "high", title
+
+    async def run():
+        message = await asyncio.wait_for(rss_manager.refresh_rss_feeds(
+            IdleEnricher(), rss_sources=["https://feed0/rss"], fetcher=fetcher, db_name=temp_db
+        ), timeout=5)
+        return message, [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+
+    message, leftover = asyncio.run(run())
+    assert "disk full" in message
+    assert leftover == []
+
 # Run the test function
 if __name__ == "__main__":
     asyncio.run(test_fetch_rss_error())
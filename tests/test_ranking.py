@@ -51,3 +51,20 @@ def test_calculate_importance_score(ranker):
 def test_calculate_rank(ranker):
     assert ranker.calculate_rank("2024-01-01 12:00", "high") > ranker.calculate_rank("2023-12-31 12:00", "medium"), "Rank should reflect time and importance"
     assert ranker.calculate_rank("2023-12-31 12:00", None) == ranker.calculate_rank("2023-12-31 12:00", "uncategorized"), "None importance should be treated as uncategorized"
+
+def test_calculate_time_score_epoch(ranker):
+    import time
+    now = time.time()
+    assert ranker.calculate_time_score(now - 2 * 24 * 3600) > 0.7
+    assert ranker.calculate_time_score(now - 10 * 24 * 3600) == 0.0
+    assert ranker.calculate_time_score(now + 3600) == 1.0
+
+def test_rank_articles_prefers_published_ts(ranker):
+    import time
+    articles = [
+        {"title": "Stale string", "published_date": "garbage", "published_ts": time.time(), "importance": "low"},
+        {"title": "No timestamp", "published_date": "garbage", "published_ts": None, "importance": "low"},
+    ]
+    ranked = ranker.rank_articles(articles)
+    assert ranked[0]["title"] == "Stale string"
+    assert ranked[0]["rank"] > ranked[1]["rank"]
@@ -0,0 +1,32 @@
+import sqlite3
+from db.raw_archive import archive_feed_body, iter_archived_feeds, prune_raw_archive, get_archive_stats
+
+def test_identical_bodies_stored_once(temp_db):
+    body = b"<rss><channel>" + b"<item><title>Same</title></item>" * 200 + b"</channel></rss>"
+    for _ in range(3):
+        archive_feed_body("http://feed", body, db_name=temp_db)
+    archive_feed_body("http://other", body, db_name=temp_db)
+
+    stats = get_archive_stats(temp_db)
+    assert stats["events"] == 4
+    assert stats["blobs"] == 1
+    assert stats["stored_bytes"] * 10 < len(body)
+
+    archived = list(iter_archived_feeds(feed_url="http://feed", db_name=temp_db))
+    assert len(archived) == 3
+    assert all(item[2] == body for item in archived)
+    assert len(list(iter_archived_feeds(latest_only=True, db_name=temp_db))) == 2
+
+def test_prune_removes_old_events_and_orphaned_blobs(temp_db):
+    for i in range(5):
+        archive_feed_body("http://feed", f"<rss>{i}</rss>".encode(), db_name=temp_db)
+
+    result = prune_raw_archive(max_age_days=30, max_per_feed=2, db_name=temp_db)
+    assert result == {"events": 3, "blobs": 3}
+    bodies = [body for _, _, body in iter_archived_feeds(db_name=temp_db)]
+    assert bodies == [b"<rss>3</rss>", b"<rss>4</rss>"]
+
+def test_legacy_inline_rows_are_readable(temp_db):
+    with sqlite3.connect(temp_db) as conn:
+        conn.execute("INSERT INTO raw_feed (feed_url, fetched_data) VALUES (?, ?)", ("http://old", "<rss/>"))
+    assert [body for _, _, body in iter_archived_feeds(db_name=temp_db)] == [b"<rss/>"]
@@ -0,0 +1,50 @@
+import asyncio
+import sqlite3
+import types
+from db.raw_archive import archive_feed_body
+from pipeline.replay import (
+    load_directory_documents, load_archive_documents, split_into_cycles, replay
+)
+
+def _rss(prefix, count):
+    items = "".join(
+        f"<item><title>{prefix} {i}</title><link>http://example.com/{prefix}/{i}</link>"
+        f"<description>Story {i}</description><pubDate>Mon, 16 Dec 2024 10:0{i}:00 GMT</pubDate></item>"
+        for i in range(count)
+    )
+    return f"<rss version='2.0'><channel>{items}</channel></rss>".encode()
+
+def test_split_into_cycles():
+    docs = [("a", 1, b""), ("b", 2, b""), ("a", 3, b""), ("b", 4, b""), ("c", 5, b"")]
+    assert [[d[0] for d in cycle] for cycle in split_into_cycles(docs)] == [["a", "b"], ["a", "b", "c"]]
+
+def test_replay_directory(tmp_path):
+    corpus = tmp_path / "corpus"
+    corpus.mkdir()
+    (corpus / "one.xml").write_bytes(_rss("One", 3))
+    (corpus / "two.rss").write_bytes(_rss("Two", 4))
+    (corpus / "notes.txt").write_text("ignored")
+
+    documents = load_directory_documents(str(corpus))
+    assert len(documents) == 2
+
+    db_file = str(tmp_path / "replay.sqlite")
+    results = asyncio.run(replay(documents, None, db_name=db_file, concurrency=2))
+    assert results["documents"] == 2
+    assert results["articles_stored"] == 7
+
+    # Replaying the same corpus again stores nothing new
+    results = asyncio.run(replay(documents, None, db_name=db_file))
+    assert results["articles_stored"] == 0
+    with sqlite3.connect(db_file) as conn:
+        sources = {row[0] for row in conn.execute("SELECT DISTINCT source FROM parsed_articles")}
+    assert all(source.startswith("file://") for source in sources)
+
+def test_replay_streams_the_archive(temp_db, tmp_path):
+    for prefix, count in (("One", 2), ("Two", 3), ("One", 4)):
+        archive_feed_body(f"http://{prefix.lower()}/rss", _rss(prefix, count), db_name=temp_db)
+
+    documents = load_archive_documents(temp_db)
+    assert isinstance(documents, types.GeneratorType)
+    results = asyncio.run(replay(documents, None, db_name=str(tmp_path / "replay.sqlite")))
+    assert (results["documents"], results["cycles"], results["articles_stored"]) == (3, 2, 7)
@@ -0,0 +1,100 @@
+import asyncio
+import os
+import sqlite3
+import time
+from db.connection import connect
+from db.retention import archive_old_articles, get_archived_articles, compact_database, archive_path
+from parsing.parse_data import store_parsed_articles
+from ranking.rank import get_ranked_articles
+
+DAY = 24 * 3600
+
+def _store(db_file, ages_in_days):
+    now = int(time.time())
+    articles = [
+        {"title": f"Story {i}", "description": "Body " * 200, "source": "https://a/rss", "link": f"http://a/{i}",
+         "published_ts": now - age * DAY, "keywords": "news", "importance": "high", "derived_summary": "S"}
+        for i, age in enumerate(ages_in_days)
+    ]
+    asyncio.run(store_parsed_articles(articles, db_name=db_file))
+
+def test_old_articles_move_to_monthly_archives(temp_db, tmp_path):
+    _store(temp_db, [1, 2, 100, 400, 401])
+    archive_dir = str(tmp_path / "archive")
+
+    archived = archive_old_articles(90, db_name=temp_db, archive_dir=archive_dir, batch_size=2)
+    assert sum(archived.values()) == 3
+    with sqlite3.connect(temp_db) as conn:
+        assert sorted(row[0] for row in conn.execute("SELECT title FROM parsed_articles")) == ["Story 0", "Story 1"]
+        assert conn.execute("SELECT COUNT(*) FROM enrichment_jobs WHERE article_id NOT IN "
+                            "(SELECT id FROM parsed_articles)").fetchone()[0] == 0
+    for month in archived:
+        assert os.path.exists(archive_path(month, archive_dir))
+
+    # Still queryable, newest first; running again moves nothing
+    old = get_archived_articles(db_name=temp_db, archive_dir=archive_dir)
+    assert [article["title"] for article in old] == ["Story 2", "Story 3", "Story 4"]
+    since = int(time.time()) - 200 * DAY
+    assert [a["title"] for a in get_archived_articles(since, int(time.time()), db_name=temp_db,
+                                                       archive_dir=archive_dir)] == ["Story 2"]
+    assert archive_old_articles(90, db_name=temp_db, archive_dir=archive_dir) == {}
+
+def test_ranker_skips_articles_past_max_age(temp_db):
+    _store(temp_db, [1, 3, 30])
+    assert [a["title"] for a in get_ranked_articles(max_age_days=7, db_name=temp_db)] == ["Story 0", "Story 1"]
+    assert len(get_ranked_articles(max_age_days=7, db_name=temp_db, since_ts=0)) == 3
+
+def test_undated_articles_age_by_parse_time(temp_db, tmp_path):
+    def parsed_days_ago(days):
+        return time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(time.time() - days * DAY))
+
+    undated = [{"title": f"Undated {age}", "description": "Body", "source": "https://a/rss", "link": f"http://u/{age}",
+                "parsed_at": parsed_days_ago(age)} for age in (1, 100)]
+    asyncio.run(store_parsed_articles(undated, db_name=temp_db))
+    assert [a["title"] for a in get_ranked_articles(max_age_days=7, db_name=temp_db)] == ["Undated 1"]
+
+    archive_old_articles(90, db_name=temp_db, archive_dir=str(tmp_path / "archive"))
+    with sqlite3.connect(temp_db) as conn:
+        assert [row[0] for row in conn.execute("SELECT title FROM parsed_articles")] == ["Undated 1"]
+
+def test_duplicates_of_archived_stories_get_their_own_job(temp_db, tmp_path):
+    now = int(time.time())
+    story = {"title": "Storm hits coast", "description": "Body", "source": "https://a/rss",
+             "published_ts": now - 100 * DAY}
+    asyncio.run(store_parsed_articles([story], db_name=temp_db))
+    with sqlite3.connect(temp_db) as conn:
+        canonical_id = conn.execute("SELECT id FROM parsed_articles").fetchone()[0]
+    # A recent repeat waits to inherit the story's enrichment, so it has no job yet
+    repeat = {"title": "Storm hits the coast", "description": "Body", "source": "https://b/rss",
+              "published_ts": now, "canonical_id": canonical_id}
+    asyncio.run(store_parsed_articles([repeat], db_name=temp_db))
+
+    archive_old_articles(90, db_name=temp_db, archive_dir=str(tmp_path / "archive"))
+    with sqlite3.connect(temp_db) as conn:
+        rows = conn.execute("SELECT p.title, p.canonical_id, p.enrichment_status, j.status FROM parsed_articles p "
+                            "LEFT JOIN enrichment_jobs j ON j.article_id = p.id").fetchall()
+    assert rows == [("Storm hits the coast", None, "pending", "queued")]
+
+def test_archive_files_are_closed_after_use(temp_db, tmp_path):
+    _store(temp_db, [100, 400])
+    archive_dir = str(tmp_path / "archive")
+    archive_old_articles(90, db_name=temp_db, archive_dir=archive_dir)
+    assert len(get_archived_articles(db_name=temp_db, archive_dir=archive_dir)) == 2
+    # A closed WAL database leaves no -wal or -shm file behind
+    assert all(name.endswith(".db") for name in os.listdir(archive_dir))
+
+def test_compaction_frees_pages_in_steps(temp_db, tmp_path):
+    _store(temp_db, range(200, 600))
+    with sqlite3.connect(temp_db) as conn:
+        assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2  # INCREMENTAL on new databases
+
+    archive_old_articles(90, db_name=temp_db, archive_dir=str(tmp_path / "archive"))
+    conn = connect(temp_db)
+    pages_before = conn.execute("PRAGMA page_count").fetchone()[0]
+    assert conn.execute("PRAGMA freelist_count").fetchone()[0] > 0
+
+    assert compact_database(temp_db, step_pages=8, max_steps=1, pause_seconds=0) <= 8
+    freed = compact_database(temp_db, step_pages=8, pause_seconds=0)
+    assert freed > 0
+    assert conn.execute("PRAGMA freelist_count").fetchone()[0] == 0
+    assert conn.execute("PRAGMA page_count").fetchone()[0] < pages_before
@@ -0,0 +1,53 @@
+import sqlite3
+from datetime import datetime, timedelta
+import pytest
+from scheduler.poll_scheduler import (
+    estimate_publish_interval, next_poll_interval, record_poll, defer_unpolled, PollScheduler,
+    MIN_POLL_MINUTES, MAX_POLL_MINUTES
+)
+
+@pytest.fixture
+def temp_db(temp_db):
+    with sqlite3.connect(temp_db) as conn:
+        conn.executemany(
+            "INSERT INTO rss_sources (feed_url, source_name) VALUES (?, ?)",
+            [("http://busy", "Busy"), ("http://quiet", "Quiet")]
+        )
+    return temp_db
+
+def test_estimate_publish_interval():
+    base = datetime(2024, 1, 1, 12, 0)
+    times = [base, base + timedelta(minutes=10), base + timedelta(minutes=30), base]
+    assert estimate_publish_interval(times) == 15
+    assert estimate_publish_interval([base]) is None
+
+def test_next_poll_interval_bounds():
+    assert next_poll_interval(30, 60, True) == 30
+    assert next_poll_interval(30, 2, True) == MIN_POLL_MINUTES
+    assert next_poll_interval(30, None, False) == 45
+    assert next_poll_interval(MAX_POLL_MINUTES, None, False) == MAX_POLL_MINUTES
+
+def test_record_poll_adapts_and_schedules(temp_db):
+    busy_entries = [
+        {"published": "Mon, 16 Dec 2024 10:00:00 GMT"},
+        {"published": "Mon, 16 Dec 2024 10:10:00 GMT"},
+    ]
+    assert record_poll("http://busy", busy_entries, temp_db) == MIN_POLL_MINUTES
+    assert record_poll("http://quiet", [], temp_db) == 45  # Backs off from the 30 minute default
+
+    scheduler = PollScheduler(temp_db)
+    scheduler.refresh()
+    assert scheduler.pop_due() == []
+    due = scheduler.pop_due(now=datetime.utcnow() + timedelta(minutes=10))
+    assert due == ["http://busy"]
+    assert 0 < scheduler.seconds_until_next() <= 45 * 60
+
+def test_failed_polls_are_deferred_not_retried_immediately(temp_db):
+    # The busy feed's poll succeeded; the quiet one's fetch failed before record_poll
+    record_poll("http://busy", [{"published": "Mon, 16 Dec 2024 10:00:00 GMT"}], temp_db)
+    assert defer_unpolled(["http://busy", "http://quiet"], db_name=temp_db) == 1
+
+    scheduler = PollScheduler(temp_db)
+    scheduler.refresh()
+    assert scheduler.pop_due() == []
+    assert scheduler.seconds_until_next() <= MIN_POLL_MINUTES * 60
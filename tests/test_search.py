@@ -0,0 +1,88 @@
+import asyncio
+import sqlite3
+import time
+from db.connection import connect
+from db.retention import archive_old_articles
+from frontend.app import create_app
+from parsing.parse_data import store_parsed_articles
+from ranking.search import search_articles
+
+DAY = 24 * 3600
+
+def _article(title, description="", age_days=0, **extra):
+    return {"title": title, "description": description, "source": "https://a/rss", "link": f"http://a/{title}",
+            "published_ts": int(time.time()) - age_days * DAY, **extra}
+
+def _titles(result):
+    return [article["title"] for article in result["results"]]
+
+def test_index_follows_inserts_updates_and_retention(temp_db, tmp_path):
+    asyncio.run(store_parsed_articles([
+        _article("Harbour storm closes port", "Ships wait offshore"),
+        _article("Budget vote delayed", "Parliament adjourns", age_days=200),
+    ], db_name=temp_db))
+    assert _titles(search_articles("storms", db_name=temp_db)) == ["Harbour storm closes port"]
+
+    # Upserted content and enrichment writes are searchable; the old text is not
+    asyncio.run(store_parsed_articles([_article("Harbour storm closes port", "Ferries cancelled")],
+                                      db_name=temp_db))
+    with connect(temp_db) as conn:
+        conn.execute("UPDATE parsed_articles SET keywords = 'shipping, weather' WHERE title LIKE 'Harbour%'")
+    assert _titles(search_articles("ferries weather", db_name=temp_db)) == ["Harbour storm closes port"]
+    assert search_articles("offshore", db_name=temp_db)["results"] == []
+
+    # Archived articles leave the index with the row
+    assert _titles(search_articles("parliament", db_name=temp_db)) == ["Budget vote delayed"]
+    archive_old_articles(90, db_name=temp_db, archive_dir=str(tmp_path / "archive"))
+    assert search_articles("parliament", db_name=temp_db)["results"] == []
+    with sqlite3.connect(temp_db) as conn:
+        # Raises if the index and the table disagree
+        conn.execute("INSERT INTO articles_fts (articles_fts) VALUES ('integrity-check')")
+
+def test_ranking_prefers_title_matches_and_recent_articles(temp_db):
+    asyncio.run(store_parsed_articles([
+        _article("Council meeting", "The election date was discussed"),
+        _article("Election results announced", "Counting finished overnight", age_days=1),
+        _article("Election recount ordered", "Counting resumes", age_days=60),
+    ], db_name=temp_db))
+    # A title match beats a body match; two months of age outweighs both
+    result = search_articles("election", db_name=temp_db)
+    assert _titles(result) == ["Election results announced", "Council meeting", "Election recount ordered"]
+    assert result["results"][-1]["score"] > 0
+
+    # Operators and punctuation in the query are treated as plain words
+    assert _titles(search_articles('election" OR NEAR(', db_name=temp_db)) == []
+    assert search_articles("  --  ", db_name=temp_db)["results"] == []
+
+def test_every_match_is_ranked(temp_db):
+    # The best match is the oldest row, behind hundreds of newer, weaker ones
+    asyncio.run(store_parsed_articles([_article("Volcano erupts", "Ash cloud")], db_name=temp_db))
+    asyncio.run(store_parsed_articles(
+        [_article(f"Update {i}", "Flights diverted around the volcano") for i in range(300)], db_name=temp_db))
+    assert _titles(search_articles("volcano", per_page=1, db_name=temp_db)) == ["Volcano erupts"]
+    last = search_articles("volcano", page=31, per_page=10, db_name=temp_db)
+    assert len(last["results"]) == 1 and not last["has_more"]
+
+def test_search_widens_past_recent_articles_to_fill_a_page(temp_db):
+    asyncio.run(store_parsed_articles(
+        [_article("Glacier retreats", "Ice", age_days=400), _article("Glacier survey", "Ice", age_days=90)]
+        + [_article(f"Update {i}", "Glacier melt continues", age_days=i) for i in range(3)], db_name=temp_db))
+    assert len(search_articles("glacier", per_page=10, db_name=temp_db)["results"]) == 5
+    since = int(time.time()) - 100 * DAY
+    assert len(search_articles("glacier", per_page=10, since_ts=since, db_name=temp_db)["results"]) == 4
+    # A page filled by recent articles is not held up by older ones
+    first = search_articles("glacier", per_page=2, db_name=temp_db)
+    assert _titles(first) == ["Update 0", "Update 1"] and first["has_more"]
+
+def test_search_api_pages_results(temp_db):
+    asyncio.run(store_parsed_articles(
+        [_article(f"Flood warning {i}", "River levels rising", age_days=i) for i in range(25)], db_name=temp_db))
+    client = create_app(temp_db).test_client()
+
+    first = client.get("/api/search?q=flood&per_page=10").get_json()
+    assert len(first["results"]) == 10 and first["has_more"]
+    last = client.get("/api/search?q=flood&per_page=10&page=3").get_json()
+    assert len(last["results"]) == 5 and not last["has_more"]
+    seen = {article["id"] for page in (1, 2, 3)
+            for article in client.get(f"/api/search?q=flood&per_page=10&page={page}").get_json()["results"]}
+    assert len(seen) == 25
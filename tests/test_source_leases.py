@@ -0,0 +1,85 @@
+import asyncio
+import sqlite3
+import time
+import pytest
+from scheduler.poll_scheduler import record_poll
+from scheduler.source_leases import claim_due_sources, renew_leases, release_leases, seconds_until_next_due
+from scheduler.ingest_worker import run_worker
+
+@pytest.fixture
+def temp_db(temp_db):
+    with sqlite3.connect(temp_db) as conn:
+        conn.executemany(
+            "INSERT INTO rss_sources (feed_url, source_name) VALUES (?, ?)",
+            [(f"https://feed{i}/rss", f"Feed {i}") for i in range(5)]
+        )
+    return temp_db
+
+def test_workers_claim_disjoint_batches(temp_db):
+    first = claim_due_sources("w1", 3, 60, temp_db)
+    second = claim_due_sources("w2", 3, 60, temp_db)
+    assert len(first) == 3 and len(second) == 2
+    assert not set(first) & set(second)
+    assert claim_due_sources("w3", 3, 60, temp_db) == []
+
+    # Released sources that are still due can be claimed again
+    release_leases("w1", first, temp_db)
+    assert sorted(claim_due_sources("w3", 5, 60, temp_db)) == sorted(first)
+
+def test_expired_leases_are_reclaimed(temp_db):
+    crashed = claim_due_sources("crashed", 5, 60, temp_db)
+    assert renew_leases("crashed", crashed, 60, temp_db) == 5
+    with sqlite3.connect(temp_db) as conn:
+        conn.execute("UPDATE rss_sources SET lease_expires_at = ?", (int(time.time()) - 1,))
+
+    assert sorted(claim_due_sources("w2", 5, 60, temp_db)) == sorted(crashed)
+    # The crashed worker no longer holds anything
+    assert renew_leases("crashed", crashed, 60, temp_db) == 0
+
+def test_sources_not_due_are_skipped(temp_db):
+    record_poll("https://feed0/rss", [], temp_db)
+    claimed = claim_due_sources("w1", 5, 60, temp_db)
+    assert "https://feed0/rss" not in claimed and len(claimed) == 4
+    assert seconds_until_next_due(temp_db) == 0.0
+
+def test_worker_fetches_each_due_source_once(temp_db):
+    fetched = []
+
+    async def fetcher(rss_sources, db_name=None, stats=None, entry_limit=None, on_feed=None):
+        for url in rss_sources:
+            fetched.append(url)
+            entries = [{"title": f"Story from {url}", "link": f"{url}/1", "description": "Body"}]
+            record_poll(url, entries, db_name)
+            await on_feed(url, entries)
+
+    async def run_two():
+        return await asyncio.gather(
+            run_worker(temp_db, batch_size=2, fetcher=fetcher, stop_when_idle=True, owner="w1"),
+            run_worker(temp_db, batch_size=2, fetcher=fetcher, stop_when_idle=True, owner="w2"),
+        )
+
+    counts = asyncio.run(run_two())
+    assert sum(c["sources"] for c in counts) == 5
+    assert sorted(fetched) == sorted(f"https://feed{i}/rss" for i in range(5))
+
+    with sqlite3.connect(temp_db) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM parsed_articles").fetchone()[0] == 5
+        assert conn.execute("SELECT COUNT(*) FROM rss_sources WHERE lease_owner IS NOT NULL").fetchone()[0] == 0
+        triggers = {row[0] for row in conn.execute("SELECT trigger FROM pipeline_runs")}
+    assert triggers <= {"worker:w1", "worker:w2"}
+    assert seconds_until_next_due(temp_db) > 0
+
+def test_worker_backs_off_sources_whose_fetch_failed(temp_db):
+    calls = []
+
+    async def fetcher(rss_sources, db_name=None, stats=None, entry_limit=None, on_feed=None):
+        calls.append(list(rss_sources))
+        raise RuntimeError("resolver down")  # Fails before any poll is recorded
+
+    counts = asyncio.run(asyncio.wait_for(
+        run_worker(temp_db, batch_size=5, fetcher=fetcher, stop_when_idle=True, owner="w1"), timeout=5
+    ))
+    # Released but no longer due, so the worker does not reclaim them in a loop
+    assert (counts["batches"], len(calls)) == (1, 1)
+    assert claim_due_sources("w2", 5, 60, temp_db) == []
+    assert seconds_until_next_due(temp_db) > 0